@@ -1,8 +1,11 @@
-import { ListEmbeddingsResponse, CreateOrUpdateEmbeddingsResponse } from "aifoundry-vscode-shared/dist/api/types/embeddings";
+import { ListEmbeddingsResponse, CreateOrUpdateEmbeddingsResponse, IngestionJobResponse } from "aifoundry-vscode-shared/dist/api/types/embeddings";
 import { ADMIN_CTRL_PREFIX, HEADER_AIF_BASEMODEL_URI, HEADER_AIF_EMBEDDING_ASSET_ID } from "aifoundry-vscode-shared/dist/consts/misc";
 import { Config } from "./config";
 import ApiUtils from "./ApiUtils";
 
+const INGESTION_JOB_POLL_INTERVAL = 2000;     // 2 seconds
+const INGESTION_JOB_POLL_ATTEMPTS = 1800;     // 1 hour
+
 namespace EmbeddingsAPI {
     export async function getEmbeddings(): Promise<ListEmbeddingsResponse> {
         const endpoint = `${Config.getApiEndpoint()}${ADMIN_CTRL_PREFIX}/embeddings`;
@@ -19,7 +22,7 @@ namespace EmbeddingsAPI {
         aifBasemodelUri: string,
         files: File[],
         name?: string,
-    ): Promise<CreateOrUpdateEmbeddingsResponse> {
+    ): Promise<CreateOrUpdateEmbeddingsResponse | IngestionJobResponse> {
         return _createOrUpdateEmbedding(true, aifBasemodelUri, files, name);
     }
 
@@ -28,10 +31,35 @@ namespace EmbeddingsAPI {
         files: File[],
         name?: string,
         searchTopK?: number,
-    ): Promise<CreateOrUpdateEmbeddingsResponse> {
+    ): Promise<CreateOrUpdateEmbeddingsResponse | IngestionJobResponse> {
         return _createOrUpdateEmbedding(false, aifEmbeddingAssetId, files, name, searchTopK);
     }
 
+    export async function getIngestionJob(jobId: string): Promise<IngestionJobResponse> {
+        const endpoint = `${Config.getApiEndpoint()}${ADMIN_CTRL_PREFIX}/embeddings/jobs/${jobId}`;
+        return fetch(endpoint, {
+            method: "GET",
+            headers: {
+                "Content-Type": "application/json",
+            },
+        })
+            .then(ApiUtils.processApiResponse<IngestionJobResponse>);
+    }
+
+    export function isIngestionJob(response: CreateOrUpdateEmbeddingsResponse | IngestionJobResponse): response is IngestionJobResponse {
+        return "job_id" in response;
+    }
+
+    // Resolves with the job once it's finished, check its status for the failed and cancelled jobs
+    export async function waitForIngestionJob(jobId: string): Promise<IngestionJobResponse> {
+        return ApiUtils.apiPoller(
+            () => getIngestionJob(jobId),
+            (job) => job.status !== "queued" && job.status !== "running",
+            INGESTION_JOB_POLL_INTERVAL,
+            INGESTION_JOB_POLL_ATTEMPTS,
+        );
+    }
+
     export async function deleteEmbedding(
         aifEmbeddingAssetId: string,
     ): Promise<void> {
@@ -49,7 +77,7 @@ namespace EmbeddingsAPI {
         files: File[],
         name?: string,
         searchTopK?: number,
-    ): Promise<CreateOrUpdateEmbeddingsResponse> {
+    ): Promise<CreateOrUpdateEmbeddingsResponse | IngestionJobResponse> {
         const endpoint = `${Config.getApiEndpoint()}${ADMIN_CTRL_PREFIX}/embeddings/`;
 
         const formData = new FormData() as any;
@@ -78,7 +106,7 @@ namespace EmbeddingsAPI {
             headers: headers,
             body: formData,
         })
-            .then(ApiUtils.processApiResponse<CreateOrUpdateEmbeddingsResponse>);
+            .then(ApiUtils.processApiResponse<CreateOrUpdateEmbeddingsResponse | IngestionJobResponse>);
     }
 }
 
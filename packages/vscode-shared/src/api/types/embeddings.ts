@@ -26,6 +26,28 @@ export type CreateOrUpdateEmbeddingsResponse = {
 	name: string,
 };
 
+export type IngestionJobStatus = "queued" | "running" | "succeeded" | "failed" | "cancelled";
+
+// The Python server ingests the uploaded files in a background job, create and update return the job
+export type IngestionJobResponse = {
+	job_id: string,
+	status: IngestionJobStatus,
+	asset_id: string | null,	// null until a new embedding is created
+	chunks_embedded: number,
+	bytes_read: number,
+	total_bytes: number,
+	progress: number,			// fraction of the uploaded bytes read
+	chunks_per_second: number | null,
+	eta_seconds: number | null,
+	result: {
+		asset_id: string,
+		name: string,
+		added_chunks: number | null,
+		removed_chunks: number | null,
+	} | null,
+	error: string | null,
+};
+
 export type DeleteEmbeddingResponse = {
 	id: string,
 }
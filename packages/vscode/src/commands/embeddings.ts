@@ -138,7 +138,13 @@ function _createOrUpdateEmbedding(isCreate: boolean, embeddingsViewProvider: IVi
 				? apiClient.EmbeddingsAPI.createEmbedding(aifBasemodelUriOrAifEmbeddingAssetId, files, name)
 				: apiClient.EmbeddingsAPI.updateEmbedding(aifBasemodelUriOrAifEmbeddingAssetId, files, name);
 		})
-		.then((response: api.CreateOrUpdateEmbeddingsResponse) => {
+		.then((response: api.CreateOrUpdateEmbeddingsResponse | api.IngestionJobResponse) => {
+			// The files are ingested in the background, the embedding is only created or updated once the job is finished
+			return apiClient.EmbeddingsAPI.isIngestionJob(response)
+				? _waitForIngestionJob(isCreate, response.job_id)
+				: undefined;
+		})
+		.then(() => {
 			embeddingsViewProvider.refresh(isCreate ? undefined : aifBasemodelUriOrAifEmbeddingAssetId);
 			vscode.window.showInformationMessage(isCreate ? 'Embedding is created' : 'Embedding is updated');
 		}, (error) => {
@@ -146,4 +152,17 @@ function _createOrUpdateEmbedding(isCreate: boolean, embeddingsViewProvider: IVi
 		});
 }	
 
+function _waitForIngestionJob(isCreate: boolean, jobId: string): Thenable<void> {
+	return vscode.window.withProgress({
+		location: vscode.ProgressLocation.Notification,
+		title: isCreate ? 'Creating embedding' : 'Updating embedding',
+	}, () => apiClient.EmbeddingsAPI.waitForIngestionJob(jobId).then((job) => {
+		if (job.status === 'failed') {
+			throw new Error(job.error ?? 'Embedding job failed');
+		} else if (job.status === 'cancelled') {
+			throw new Error('Embedding job was cancelled');
+		}
+	}));
+}
+
 export default EmbeddingsCommands;
@@ -5,12 +5,15 @@ from sqlmodel import Field, SQLModel, JSON, Column
 
 class AgentEntity(SQLModel, table=True):
     id: str = Field(primary_key=True)
-    agent_uri: str
+    agent_uri: str = Field(index=True)
     name: str | None = None
     base_model_uri: str
     system_prompt: str | None = None
     rag_asset_ids: List[str] = Field(sa_column=Column(JSON))
     function_asset_ids: List[str] = Field(sa_column=Column(JSON))
+    prompt_token_budget: int | None = None      # Max tokens of the prompt, the oldest chat history is dropped to fit
+    response_cache_enabled: bool | None = None  # Reuse the responses of the identical prompts, see ResponseCache
+    semantic_cache_embedding_model_uri: str | None = None   # Reuse the answers of the similar questions, see SemanticCache
 
 class CreateAgentRequest(BaseModel):
     base_model_uri: str
@@ -18,6 +21,9 @@ class CreateAgentRequest(BaseModel):
     system_prompt: str | None = None
     rag_asset_ids: List[str] | None = None
     function_asset_ids: List[str] | None = None
+    prompt_token_budget: int | None = None
+    response_cache_enabled: bool | None = None
+    semantic_cache_embedding_model_uri: str | None = None
 
 class UpdateAgentRequest(BaseModel):
     # agent_uri: str
@@ -26,6 +32,9 @@ class UpdateAgentRequest(BaseModel):
     system_prompt: str | None = None
     rag_asset_ids: List[str] | None = None
     function_asset_ids: List[str] | None = None
+    prompt_token_budget: int | None = None
+    response_cache_enabled: bool | None = None
+    semantic_cache_embedding_model_uri: str | None = None
 
 class CreateOrUpdateAgentResponse(BaseModel):
     agent_uri: str
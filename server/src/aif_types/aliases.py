@@ -0,0 +1,23 @@
+from typing import List
+from pydantic import BaseModel
+from sqlmodel import Field, SQLModel, JSON, Column
+
+
+class ModelAliasEntity(SQLModel, table=True):
+    id: str = Field(primary_key=True)
+    name: str = Field(index=True, unique=True)
+    alias_uri: str = Field(index=True)                  # aif://aliases/{name}
+    basemodel_uris: List[str] = Field(sa_column=Column(JSON))   # Backends of the alias, e.g. the same model on different providers
+
+class CreateModelAliasRequest(BaseModel):
+    name: str
+    basemodel_uris: List[str]
+
+class UpdateModelAliasRequest(BaseModel):
+    basemodel_uris: List[str] | None = None
+
+class CreateOrUpdateModelAliasResponse(BaseModel):
+    alias_uri: str
+
+class ListModelAliasesResponse(BaseModel):
+    aliases: List[ModelAliasEntity]
@@ -1,7 +1,7 @@
 from enum import Enum
 from typing import List
 from pydantic import BaseModel
-from sqlmodel import Field, SQLModel
+from sqlmodel import Field, SQLModel, JSON, Column
 from aif_types.common import RequestFileInfo
 
 
@@ -36,4 +36,18 @@ class ChatHistoryMessage(BaseModel):
 class ChatHistoryEntity(SQLModel, table=True):
     id: str = Field(primary_key=True)
     aif_agent_uri: str
-    messages: str
+    messages: str = "[]"    # Deprecated, the messages are in ChatMessageEntity, kept for migrating the existing sessions
+
+class ChatMessageEntity(SQLModel, table=True):
+    session_id: str = Field(primary_key=True)
+    seq: int = Field(primary_key=True)      # Order of the message in the session, starts from 0
+    role: str
+    content: str
+    files: List[dict] = Field(sa_column=Column(JSON))
+    token_count: int | None = None          # Estimated when the message is written, None for the migrated messages
+
+class ChatSummaryEntity(SQLModel, table=True):
+    session_id: str = Field(primary_key=True)
+    summary: str
+    last_seq: int                           # The messages up to this sequence number are in the summary
+    token_count: int
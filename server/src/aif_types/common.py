@@ -3,4 +3,5 @@ from pydantic import BaseModel
 class RequestFileInfo(BaseModel):
     file_name: str
     mine_type: str
-    file_buffer: str
+    blob_id: str | None = None         # Id of the file content in the blob store
+    file_buffer: str | None = None     # Deprecated, base64 content of the file, only in the existing chat history
@@ -1,3 +1,4 @@
+from enum import Enum
 from typing import List
 from pydantic import BaseModel
 from sqlmodel import Field, SQLModel
@@ -9,6 +10,18 @@ class EmbeddingEntity(SQLModel, table=True):
     vectorStoreProvider: str
     basemodel_uri: str
 
+class EmbeddingCacheEntity(SQLModel, table=True):
+    model_uri: str = Field(primary_key=True)
+    text_hash: str = Field(primary_key=True)    # SHA-256 of the embedded text
+    vector: bytes                               # float32 array
+
+class EmbeddingChunkEntity(SQLModel, table=True):
+    # Manifest of the chunks of an asset, an update only embeds the chunks which are not in it
+    asset_id: str = Field(primary_key=True)
+    doc_id: str = Field(primary_key=True)       # Id of the document in the vector store
+    source: str = Field(index=True)             # File name
+    chunk_hash: str                             # SHA-256 of the chunk text
+
 class CreateEmbeddingsRequest(BaseModel):
     input: str | List[str]
     name: str | None = None
@@ -16,9 +29,35 @@ class CreateEmbeddingsRequest(BaseModel):
 class CreateOrUpdateEmbeddingsResponse(BaseModel):
     asset_id: str
     name: str
+    added_chunks: int | None = None
+    removed_chunks: int | None = None
+    unchanged_chunks: int | None = None
 
 class ListEmbeddingsResponse(BaseModel):
     embeddings: List[EmbeddingEntity]
 
 class UpdateEmbeddingMetadataRequest(BaseModel):
     name: str
+
+class IngestionJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    status: IngestionJobStatus
+    asset_id: str | None = None                 # None until a new asset is created
+    chunks_embedded: int = 0
+    bytes_read: int = 0
+    total_bytes: int = 0
+    progress: float = 0                         # Fraction of the uploaded bytes read
+    chunks_per_second: float | None = None
+    eta_seconds: float | None = None
+    result: CreateOrUpdateEmbeddingsResponse | None = None
+    error: str | None = None
+
+class ListIngestionJobsResponse(BaseModel):
+    jobs: List[IngestionJobResponse]
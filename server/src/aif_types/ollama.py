@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, List
 from pydantic import BaseModel
 
 class OllamaModelInfo(BaseModel):
@@ -7,3 +7,15 @@ class OllamaModelInfo(BaseModel):
 	size: int
 	modified_at: str
 	version: str | None = None
+
+
+class OllamaPullJobInfo(BaseModel):
+	model_name: str
+	status: str				# Ollama status while pulling, "success" or "error" when done
+	completed: int = 0		# Downloaded bytes of the current layer
+	total: int = 0			# Total bytes of the current layer
+	error: str | None = None
+
+
+class ListOllamaPullJobsResponse(BaseModel):
+	jobs: List[OllamaPullJobInfo]
@@ -13,6 +13,7 @@ AIFOUNDRY_LOCAL_SERVER_FOLDER_NAME = ".aifoundry"
 ASSETS_FOLDER_NAME = "assets"
 FUNCTIONS_FOLDER_NAME = "functions"
 EMBEDDINGS_FOLDER_NAME = "embeddings"
+BLOBS_FOLDER_NAME = "blobs"
 
 # Linkbreak for the response, not sure why "\n" is not working
 RESPONSE_LINEBREAK = "<br />"
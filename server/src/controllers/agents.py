@@ -10,7 +10,7 @@ def create_admin_routers(llm_manager: LlmManager):
 
 
     @router.get(ADMIN_CTRL_PREFIX + "/agents/", tags=["agents"])
-    async def list_agents():
+    def list_agents():
         return exceptionHandler(llm_manager.list_agents)
 
     # @router.get(f"{ADMIN_CTRL_PREFIX}/agents/{id}")
@@ -18,12 +18,12 @@ def create_admin_routers(llm_manager: LlmManager):
     #     raise NotImplementedError("Not implemented yet")
 
     @router.post(ADMIN_CTRL_PREFIX + "/agents/", tags=["agents"])
-    async def create_agent(request: CreateAgentRequest) -> CreateOrUpdateAgentResponse:
+    def create_agent(request: CreateAgentRequest) -> CreateOrUpdateAgentResponse:
         return exceptionHandler(lambda: llm_manager.create_agent(request))
     
 
     @router.put(ADMIN_CTRL_PREFIX + "/agents/{id}", tags=["agents"])
-    async def update_agent(
+    def update_agent(
         id: str,
         request: UpdateAgentRequest,
     ) -> CreateOrUpdateAgentResponse:
@@ -31,7 +31,7 @@ def create_admin_routers(llm_manager: LlmManager):
 
 
     @router.delete(ADMIN_CTRL_PREFIX + "/agents/{id}", tags=["agents"])
-    async def delete_agent(id: str):
+    def delete_agent(id: str):
         return exceptionHandler(lambda: llm_manager.delete_agent(id))
 
 
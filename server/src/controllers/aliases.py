@@ -0,0 +1,35 @@
+from fastapi import APIRouter
+from aif_types.aliases import CreateModelAliasRequest, CreateOrUpdateModelAliasResponse, UpdateModelAliasRequest
+from llm.llm_manager import LlmManager
+from consts import ADMIN_CTRL_PREFIX
+from utils.exception_utils import exceptionHandler
+
+
+def create_admin_routers(llm_manager: LlmManager):
+    router = APIRouter()
+
+
+    @router.get(ADMIN_CTRL_PREFIX + "/aliases/", tags=["aliases"])
+    def list_model_aliases():
+        return exceptionHandler(llm_manager.list_model_aliases)
+
+
+    @router.post(ADMIN_CTRL_PREFIX + "/aliases/", tags=["aliases"])
+    def create_model_alias(request: CreateModelAliasRequest) -> CreateOrUpdateModelAliasResponse:
+        return exceptionHandler(lambda: llm_manager.create_model_alias(request))
+
+
+    @router.put(ADMIN_CTRL_PREFIX + "/aliases/{id}", tags=["aliases"])
+    def update_model_alias(
+        id: str,
+        request: UpdateModelAliasRequest,
+    ) -> CreateOrUpdateModelAliasResponse:
+        return exceptionHandler(lambda: llm_manager.update_model_alias(id, request))
+
+
+    @router.delete(ADMIN_CTRL_PREFIX + "/aliases/{id}", tags=["aliases"])
+    def delete_model_alias(id: str):
+        return exceptionHandler(lambda: llm_manager.delete_model_alias(id))
+
+
+    return router
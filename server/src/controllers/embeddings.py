@@ -1,5 +1,5 @@
 from typing import Any, List
-from fastapi import APIRouter, File, Header, UploadFile, HTTPException
+from fastapi import APIRouter, File, Header, Query, UploadFile, HTTPException
 from aif_types.embeddings import CreateEmbeddingsRequest, UpdateEmbeddingMetadataRequest
 from llm.llm_manager import LlmManager
 from consts import HEADER_AIF_BASEMODEL_URI, HEADER_AIF_EMBEDDING_ASSET_ID
@@ -11,7 +11,7 @@ def create_admin_routers(llm_manager: LlmManager):
     router = APIRouter()
 
     @router.get(ADMIN_CTRL_PREFIX + "/embeddings/", tags=["embeddings"])
-    async def list_embeddings():
+    def list_embeddings():
         return exceptionHandler(llm_manager.list_embeddings)
 
 
@@ -21,37 +21,55 @@ def create_admin_routers(llm_manager: LlmManager):
 
 
     @router.post(ADMIN_CTRL_PREFIX + "/embeddings/", tags=["embeddings"])
-    async def create_embedding(
+    def create_embedding(
         files: List[UploadFile],
         aif_basemodel_uri: str | None = Header(None, alias=HEADER_AIF_BASEMODEL_URI),
         name: str | List[str] | None = None,
     ):
         def handler():
-            # Key: file name; Value: file content
-            file_dict = { file.filename: file.file.read() for file in files }
+            # Key: file name; Value: file object, spooled to disk by starlette when it's large, the job copies it
+            file_dict = { file.filename: file.file for file in files }
             _name = name if type(name) == str else name[0] if name else None
             return llm_manager.create_embedding(file_dict, aif_basemodel_uri, _name)
         return exceptionHandler(handler)
 
 
     @router.put(ADMIN_CTRL_PREFIX + "/embeddings/", tags=["embeddings"])
-    async def update_embedding(
+    def update_embedding(
         files: List[UploadFile] | None = None,
         aif_embedding_asset_id: str | None = Header(None, alias=HEADER_AIF_EMBEDDING_ASSET_ID),
         name: str | List[str] | None = None,
+        # File names whose chunks are removed from the asset
+        remove_sources: List[str] = Query([]),
     ):
         def handler():
-            # Key: file name; Value: file content
+            # Key: file name; Value: file object, spooled to disk by starlette when it's large, the job copies it
             _files = files if files else []
-            file_dict = { file.filename: file.file.read() for file in _files }
+            file_dict = { file.filename: file.file for file in _files }
 
             _name = name if type(name) == str else name[0] if name else None
-            return llm_manager.update_embedding(file_dict, aif_embedding_asset_id, _name)
+            return llm_manager.update_embedding(file_dict, aif_embedding_asset_id, _name, remove_sources)
         return exceptionHandler(handler)
 
 
+    # The uploads are ingested by background jobs, the create and update routes return the job
+    @router.get(ADMIN_CTRL_PREFIX + "/embeddings/jobs/", tags=["embeddings"])
+    def list_ingestion_jobs():
+        return exceptionHandler(llm_manager.list_ingestion_jobs)
+
+
+    @router.get(ADMIN_CTRL_PREFIX + "/embeddings/jobs/{job_id}", tags=["embeddings"])
+    def get_ingestion_job(job_id: str):
+        return exceptionHandler(lambda: llm_manager.get_ingestion_job(job_id))
+
+
+    @router.delete(ADMIN_CTRL_PREFIX + "/embeddings/jobs/{job_id}", tags=["embeddings"])
+    def cancel_ingestion_job(job_id: str):
+        return exceptionHandler(lambda: llm_manager.cancel_ingestion_job(job_id))
+
+
     @router.delete(ADMIN_CTRL_PREFIX + "/embeddings/{aif_embedding_asset_id}", tags=["embeddings"])
-    async def delete_embedding(
+    def delete_embedding(
         aif_embedding_asset_id: str,
     ):
         return exceptionHandler(lambda: llm_manager.delete_embedding(aif_embedding_asset_id))
@@ -79,7 +97,7 @@ def create_debug_routers(llm_manager: LlmManager):
 
 
     @router.post("/embeddings/content/", tags=["embeddings", "debug_only"])
-    async def create_embedding_by_content(
+    def create_embedding_by_content(
         request: CreateEmbeddingsRequest,
         aif_basemodel_uri: str | None = Header(None, alias=HEADER_AIF_BASEMODEL_URI),
     ):
@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from llm.llm_manager import LlmManager
-from controllers import agents, embeddings, chat, languagemodels, functions, system
+from controllers import agents, aliases, embeddings, chat, languagemodels, functions, system
 
 
 def setup_controllers(app: FastAPI, llm_manager: LlmManager, debug: bool, authoring: bool):
@@ -11,6 +11,7 @@ def setup_controllers(app: FastAPI, llm_manager: LlmManager, debug: bool, author
 		app.include_router(embeddings.create_admin_routers(llm_manager))
 		app.include_router(languagemodels.create_admin_routers(llm_manager))
 		app.include_router(agents.create_admin_routers(llm_manager))
+		app.include_router(aliases.create_admin_routers(llm_manager))
 		app.include_router(functions.create_admin_routers(llm_manager))
 
 	if debug:
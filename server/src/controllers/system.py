@@ -11,6 +11,10 @@ def create_routers(llm_manager: LlmManager):
     async def get_status():
         return { "status": "ok" }
 
+    @router.get("/metrics/", tags=["system"])
+    async def get_metrics():
+        return exceptionHandler(llm_manager.get_metrics)
+
     return router
 
 
@@ -0,0 +1,111 @@
+import os
+import asyncio
+from typing import Any, Callable, Dict, List, Set
+from aif_types.chat import ChatHistoryMessage
+from database.database_manager import DatabaseManager
+
+
+DEFAULT_DB_WRITE_BATCH_SIZE = 64
+DEFAULT_DB_WRITE_BATCH_WINDOW_MS = 20
+
+
+class AsyncDatabaseManager:
+    """
+    Non-blocking access to DatabaseManager for the coroutines: the queries run on worker threads, and the chat messages
+    are written behind by a queue which commits several turns in one transaction.
+    """
+    def __init__(self, database_manager: DatabaseManager):
+        self.database_manager = database_manager
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._worker: asyncio.Task | None = None
+        self._pendingWrites: Dict[str, Set[asyncio.Future]] = {}   # Key: session id
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    def enqueue_chat_messages(self, aif_agent_uri: str, id: str, messages: List[ChatHistoryMessage]) -> asyncio.Future:
+        """
+        Queue the messages without waiting for the commit, the returned future is done after the commit
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._pendingWrites.setdefault(id, set()).add(future)
+        future.add_done_callback(lambda _: self._remove_pending_write(id, future))
+        self._queue.put_nowait((aif_agent_uri, id, messages, future))
+        return future
+
+    async def flush_session(self, id: str):
+        """
+        Wait for the queued messages of the session, e.g. before reading its history
+        """
+        pendingWrites = list(self._pendingWrites.get(id, []))
+        if len(pendingWrites) > 0:
+            await asyncio.gather(*pendingWrites, return_exceptions=True)
+
+    async def start(self):
+        self._ensure_worker()
+
+    async def stop(self):
+        if self._worker is not None:
+            await self._queue.join()
+            self._worker.cancel()
+            self._worker = None
+
+    def _ensure_worker(self):
+        # A restarted worker continues with the items already in the queue, unless their event loop is gone
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._queue = asyncio.Queue()
+            self._loop = loop
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run_writer())
+
+    async def _run_writer(self):
+        while True:
+            items = [await self._queue.get()]
+
+            # Give the other turns a moment to join the same transaction
+            deadline = asyncio.get_running_loop().time() + _get_env_int("DB_WRITE_BATCH_WINDOW_MS", DEFAULT_DB_WRITE_BATCH_WINDOW_MS) / 1000
+            batch_size = _get_env_int("DB_WRITE_BATCH_SIZE", DEFAULT_DB_WRITE_BATCH_SIZE)
+            while len(items) < batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                batch = [(aif_agent_uri, id, messages) for aif_agent_uri, id, messages, _ in items]
+                errors = await asyncio.to_thread(self.database_manager.add_chat_messages_batch, batch)
+                for (_, id, _, future), error in zip(items, errors):
+                    if error is not None:
+                        print(f"Failed to save chat messages of {id}: {error}")
+                    if future.done():
+                        continue
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+            except Exception as e:
+                print(f"Failed to save chat messages: {e}")
+                for _, _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _remove_pending_write(self, id: str, future: asyncio.Future):
+        pendingWrites = self._pendingWrites.get(id)
+        if pendingWrites is not None:
+            pendingWrites.discard(future)
+            if len(pendingWrites) == 0:
+                del self._pendingWrites[id]
+
+
+def _get_env_int(envVarName: str, default: int) -> int:
+    value = os.environ.get(envVarName)
+    return int(value) if value else default
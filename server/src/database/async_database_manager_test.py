@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from aif_types.chat import ChatHistoryMessage, ChatRole
+from database.async_database_manager import AsyncDatabaseManager
+
+
+class FakeDatabaseManager:
+    def __init__(self):
+        self.batches = []
+        self.thread_ids = set()
+
+    def add_chat_messages_batch(self, batch):
+        self.thread_ids.add(threading.get_ident())
+        self.batches.append(batch)
+        return [RuntimeError("invalid session") if id == "invalid" else None for _, id, _ in batch]
+
+
+def _create_messages(content: str):
+    return [ChatHistoryMessage(role=ChatRole.USER.name, content=content, files=[])]
+
+
+def describe_async_database_manager():
+    def test_writes_the_queued_turns_in_one_batch_off_the_loop():
+        database_manager = FakeDatabaseManager()
+        async_database_manager = AsyncDatabaseManager(database_manager)
+
+        async def run():
+            futures = [async_database_manager.enqueue_chat_messages("aif://agents/a", f"session-{i}", _create_messages(str(i))) for i in range(3)]
+            await asyncio.gather(*futures)
+            await async_database_manager.stop()
+
+        asyncio.run(run())
+        assert len(database_manager.batches) == 1
+        assert [id for _, id, _ in database_manager.batches[0]] == ["session-0", "session-1", "session-2"]
+        assert threading.get_ident() not in database_manager.thread_ids
+
+    def test_flush_session_waits_for_the_pending_writes():
+        database_manager = FakeDatabaseManager()
+        async_database_manager = AsyncDatabaseManager(database_manager)
+
+        async def run():
+            async_database_manager.enqueue_chat_messages("aif://agents/a", "session", _create_messages("hello"))
+            await async_database_manager.flush_session("session")
+            assert len(database_manager.batches) == 1
+            # Nothing pending anymore
+            await async_database_manager.flush_session("session")
+            await async_database_manager.stop()
+
+        asyncio.run(run())
+
+    def test_failed_write_is_reported_to_the_futures():
+        database_manager = FakeDatabaseManager()
+        database_manager.add_chat_messages_batch = lambda batch: (_ for _ in ()).throw(RuntimeError("disk full"))
+        async_database_manager = AsyncDatabaseManager(database_manager)
+
+        async def run():
+            future = async_database_manager.enqueue_chat_messages("aif://agents/a", "session", _create_messages("hello"))
+            try:
+                await future
+                assert False
+            except RuntimeError as e:
+                assert str(e) == "disk full"
+            await async_database_manager.stop()
+
+        asyncio.run(run())
+
+    def test_failed_session_does_not_fail_the_others():
+        database_manager = FakeDatabaseManager()
+        async_database_manager = AsyncDatabaseManager(database_manager)
+
+        async def run():
+            future = async_database_manager.enqueue_chat_messages("aif://agents/a", "session", _create_messages("hello"))
+            invalid_future = async_database_manager.enqueue_chat_messages("aif://agents/a", "invalid", _create_messages("hello"))
+            results = await asyncio.gather(future, invalid_future, return_exceptions=True)
+            assert results[0] is None
+            assert str(results[1]) == "invalid session"
+            await async_database_manager.stop()
+
+        asyncio.run(run())
+
+    def test_restarted_worker_keeps_the_queued_turns():
+        database_manager = FakeDatabaseManager()
+        async_database_manager = AsyncDatabaseManager(database_manager)
+
+        async def run():
+            await async_database_manager.start()
+            async_database_manager._worker.cancel()
+            future = async_database_manager.enqueue_chat_messages("aif://agents/a", "session-0", _create_messages("0"))
+            # The cancelled worker is replaced on the next write
+            await asyncio.sleep(0)
+            async_database_manager.enqueue_chat_messages("aif://agents/a", "session-1", _create_messages("1"))
+            await asyncio.wait_for(future, timeout=5)
+            await async_database_manager.stop()
+
+        asyncio.run(run())
+        assert [id for batch in database_manager.batches for _, id, _ in batch] == ["session-0", "session-1"]
+
+    def test_writes_from_another_event_loop():
+        database_manager = FakeDatabaseManager()
+        async_database_manager = AsyncDatabaseManager(database_manager)
+
+        async def run(id):
+            await asyncio.wait_for(async_database_manager.enqueue_chat_messages("aif://agents/a", id, _create_messages(id)), timeout=5)
+
+        asyncio.run(run("session-0"))
+        asyncio.run(run("session-1"))
+        assert [id for batch in database_manager.batches for _, id, _ in batch] == ["session-0", "session-1"]
@@ -0,0 +1,69 @@
+import os
+import base64
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from utils.assets_utils import get_blobs_asset_path
+
+
+DEFAULT_BLOB_BASE64_CACHE_MAX_MB = 64
+
+
+class BlobStore:
+    """
+    Content-addressed store for the raw bytes of the chat attachments, the blob id is the SHA-256 of the content.
+    The base64 encoding is only produced when a prompt is built, and kept in a small LRU cache for the following turns.
+    """
+    def __init__(self):
+        self._base64_cache: OrderedDict[str, str] = OrderedDict()
+        self._base64_cache_bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes) -> str:
+        blob_id = hashlib.sha256(data).hexdigest()
+        blob_path = self._get_blob_path(blob_id)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            # Write to a temporary file first, a blob file is either complete or missing
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(blob_path), delete=False) as f:
+                f.write(data)
+            os.replace(f.name, blob_path)
+        return blob_id
+
+    def get(self, blob_id: str) -> bytes:
+        with open(self._get_blob_path(blob_id), "rb") as f:
+            return f.read()
+
+    def get_base64(self, blob_id: str) -> str:
+        with self._lock:
+            content = self._base64_cache.get(blob_id)
+            if content is not None:
+                self._base64_cache.move_to_end(blob_id)
+                return content
+
+        content = base64.b64encode(self.get(blob_id)).decode("utf-8")
+
+        max_bytes = _get_base64_cache_max_bytes()
+        with self._lock:
+            if blob_id not in self._base64_cache and len(content) <= max_bytes:
+                self._base64_cache[blob_id] = content
+                self._base64_cache_bytes += len(content)
+                while self._base64_cache_bytes > max_bytes:
+                    _, oldest_content = self._base64_cache.popitem(last=False)
+                    self._base64_cache_bytes -= len(oldest_content)
+        return content
+
+    def _get_blob_path(self, blob_id: str) -> str:
+        if len(blob_id) != 64 or any(c not in "0123456789abcdef" for c in blob_id):
+            raise Exception("Invalid blob id")
+        # Spread the blobs to sub folders by the first 2 characters
+        return os.path.join(get_blobs_asset_path(), blob_id[:2], blob_id)
+
+
+def _get_base64_cache_max_bytes() -> int:
+    max_mb = os.environ.get("BLOB_BASE64_CACHE_MAX_MB")
+    return int(max_mb if max_mb else DEFAULT_BLOB_BASE64_CACHE_MAX_MB) * 1024 * 1024
+
+
+blobStore = BlobStore()
@@ -0,0 +1,28 @@
+import base64
+import hashlib
+import pytest
+from database.blob_store import BlobStore
+
+
+def describe_blob_store():
+    @pytest.fixture
+    def blob_store(tmp_path, monkeypatch):
+        monkeypatch.setattr("database.blob_store.get_blobs_asset_path", lambda: str(tmp_path))
+        return BlobStore()
+
+    def test_put_and_get(blob_store):
+        blob_id = blob_store.put(b"image-content")
+        assert blob_id == hashlib.sha256(b"image-content").hexdigest()
+        assert blob_store.get(blob_id) == b"image-content"
+
+    def test_same_content_is_stored_once(blob_store, tmp_path):
+        assert blob_store.put(b"image-content") == blob_store.put(b"image-content")
+        assert len(list(tmp_path.rglob("*"))) == 2     # 1 sub folder and 1 blob
+
+    def test_get_base64(blob_store):
+        blob_id = blob_store.put(b"image-content")
+        assert blob_store.get_base64(blob_id) == base64.b64encode(b"image-content").decode("utf-8")
+
+    def test_invalid_blob_id(blob_store):
+        with pytest.raises(Exception):
+            blob_store.get("../../etc/passwd")
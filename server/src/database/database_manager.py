@@ -1,17 +1,28 @@
 import os
 import json
-from typing import List
+from typing import Callable, Dict, List, Tuple
 from fastapi import HTTPException
 from sqlmodel import SQLModel, create_engine
+from sqlalchemy import event, func, inspect, text
 from sqlalchemy.engine.base import Engine
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert
 
 from utils.assets_utils import get_assets_path
+from utils.token_utils import estimate_message_tokens, CHARS_PER_TOKEN
 from aif_types.common import RequestFileInfo
-from aif_types.embeddings import EmbeddingEntity
+from aif_types.embeddings import EmbeddingCacheEntity, EmbeddingChunkEntity, EmbeddingEntity
 from aif_types.agents import AgentEntity, UpdateAgentRequest, CreateOrUpdateAgentResponse
+from aif_types.aliases import ModelAliasEntity, UpdateModelAliasRequest, CreateOrUpdateModelAliasResponse
 from aif_types.functions import FunctionEntity, UpdateFunctionRequest, CreateOrUpdateFunctionResponse, DeleteFunctionResponse
-from aif_types.chat import ChatHistoryEntity, ChatHistoryMessage, ChatRole
+from aif_types.chat import ChatHistoryEntity, ChatHistoryMessage, ChatMessageEntity, ChatSummaryEntity, ChatRole
+
+
+CHAT_MESSAGE_INSERT_RETRIES = 3
+CHAT_MESSAGE_QUERY_BATCH_SIZE = 50
+# Below the max number of the SQLite query parameters
+EMBEDDING_QUERY_BATCH_SIZE = 500
 
 
 class DatabaseManager:
@@ -21,8 +32,49 @@ class DatabaseManager:
         file_name = os.environ.get("SQLITE_FILE_NAME")
         assets_path = get_assets_path()
         database_uri = f"sqlite:///{assets_path}/{file_name}"
-        self._engine = create_engine(database_uri)
+        # The sessions are used from the worker threads of AsyncDatabaseManager
+        self._engine = create_engine(database_uri, connect_args={ "check_same_thread": False })
+        event.listen(self._engine, "connect", _set_sqlite_pragmas)
         SQLModel.metadata.create_all(self._engine)
+        self._add_missing_columns()
+        self._create_missing_indexes()
+        self._migrate_chat_history_messages()
+
+    def _add_missing_columns(self):
+        # `create_all` skips the tables which already exist, add the nullable columns introduced later
+        inspector = inspect(self._engine)
+        with self._engine.begin() as connection:
+            for table in SQLModel.metadata.tables.values():
+                existing_columns = [column["name"] for column in inspector.get_columns(table.name)]
+                for column in table.columns:
+                    if column.name not in existing_columns and column.nullable:
+                        column_type = column.type.compile(dialect=self._engine.dialect)
+                        connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+
+    def _create_missing_indexes(self):
+        # `create_all` skips the tables which already exist, add the indexes introduced later
+        for table in SQLModel.metadata.tables.values():
+            for index in table.indexes:
+                index.create(self._engine, checkfirst=True)
+
+    def _migrate_chat_history_messages(self):
+        # Move the messages stored as a JSON blob in ChatHistoryEntity to ChatMessageEntity
+        with Session(self._engine) as session:
+            chat_histories = session.query(ChatHistoryEntity).filter(ChatHistoryEntity.messages != "[]").all()
+            for chat_history in chat_histories:
+                messages_json = json.loads(chat_history.messages) if chat_history.messages else []
+                for seq, message in enumerate(messages_json):
+                    chatHistoryMessageJson = json.loads(message)
+                    session.add(ChatMessageEntity(
+                        session_id=chat_history.id,
+                        seq=seq,
+                        role=chatHistoryMessageJson["role"],
+                        content=chatHistoryMessageJson["content"],
+                        files=chatHistoryMessageJson["files"],
+                        token_count=estimate_message_tokens(chatHistoryMessageJson["content"], chatHistoryMessageJson["files"]),
+                    ))
+                chat_history.messages = "[]"
+            session.commit()
 
     def save_db_model(self, db_model: SQLModel):
         with Session(self._engine) as session:
@@ -49,12 +101,73 @@ class DatabaseManager:
         with Session(self._engine) as session:
             embedding_metadata = session.get(EmbeddingEntity, asset_id)
             session.delete(embedding_metadata)
+            session.query(EmbeddingChunkEntity).filter(EmbeddingChunkEntity.asset_id == asset_id).delete()
+            session.commit()
+
+    def list_embedding_chunks(self, asset_id: str, sources: List[str]) -> List[EmbeddingChunkEntity]:
+        with Session(self._engine) as session:
+            return session.query(EmbeddingChunkEntity).filter(
+                EmbeddingChunkEntity.asset_id == asset_id,
+                EmbeddingChunkEntity.source.in_(sources),
+            ).all()
+
+    def update_embedding_chunks(
+        self,
+        asset_id: str,
+        added_chunks: List[EmbeddingChunkEntity],
+        removed_doc_ids: List[str],
+        embedding: EmbeddingEntity | None = None,
+        before_commit: Callable[[], None] | None = None,
+    ):
+        """
+        Update the manifest of the asset, and add the metadata of a new asset. before_commit runs once the changes are
+        written, e.g. to replace the index files: if it raises, nothing is committed
+        """
+        with Session(self._engine) as session:
+            for index in range(0, len(removed_doc_ids), EMBEDDING_QUERY_BATCH_SIZE):
+                session.query(EmbeddingChunkEntity).filter(
+                    EmbeddingChunkEntity.asset_id == asset_id,
+                    EmbeddingChunkEntity.doc_id.in_(removed_doc_ids[index:index + EMBEDDING_QUERY_BATCH_SIZE]),
+                ).delete()
+            if embedding is not None:
+                session.add(embedding)
+            session.add_all(added_chunks)
+            session.flush()
+            if before_commit is not None:
+                before_commit()
+            session.commit()
+
+    def get_cached_embeddings(self, model_uri: str, text_hashes: List[str]) -> Dict[str, bytes]:
+        # Key: text hash; Value: vector
+        cached_embeddings = {}
+        with Session(self._engine) as session:
+            for index in range(0, len(text_hashes), EMBEDDING_QUERY_BATCH_SIZE):
+                rows = session.query(EmbeddingCacheEntity.text_hash, EmbeddingCacheEntity.vector).filter(
+                    EmbeddingCacheEntity.model_uri == model_uri,
+                    EmbeddingCacheEntity.text_hash.in_(text_hashes[index:index + EMBEDDING_QUERY_BATCH_SIZE]),
+                ).all()
+                cached_embeddings.update({ text_hash: vector for text_hash, vector in rows })
+        return cached_embeddings
+
+    def save_cached_embeddings(self, model_uri: str, vectors: Dict[str, bytes]):
+        if len(vectors) == 0:
+            return
+        with Session(self._engine) as session:
+            # Another ingestion may have cached the same text meanwhile
+            statement = insert(EmbeddingCacheEntity).values([
+                { "model_uri": model_uri, "text_hash": text_hash, "vector": vector } for text_hash, vector in vectors.items()
+            ]).on_conflict_do_nothing()
+            session.execute(statement)
             session.commit()
 
     def list_agents(self) -> List[AgentEntity]:
         with Session(self._engine) as session:
             return session.query(AgentEntity).all()
 
+    def get_agent_by_uri(self, agent_uri: str) -> AgentEntity | None:
+        with Session(self._engine) as session:
+            return session.query(AgentEntity).filter(AgentEntity.agent_uri == agent_uri).first()
+
     # def load_model(self, id: str) -> AgentEntity | None:
     #     with Session(self._engine) as session:
     #         return session.get(AgentEntity, id)
@@ -71,6 +184,9 @@ class DatabaseManager:
             agent.system_prompt = request.system_prompt if request.system_prompt is not None else agent.system_prompt
             agent.rag_asset_ids = request.rag_asset_ids if request.rag_asset_ids else agent.rag_asset_ids
             agent.function_asset_ids = request.function_asset_ids if request.function_asset_ids else agent.function_asset_ids
+            agent.prompt_token_budget = request.prompt_token_budget if request.prompt_token_budget is not None else agent.prompt_token_budget
+            agent.response_cache_enabled = request.response_cache_enabled if request.response_cache_enabled is not None else agent.response_cache_enabled
+            agent.semantic_cache_embedding_model_uri = request.semantic_cache_embedding_model_uri if request.semantic_cache_embedding_model_uri is not None else agent.semantic_cache_embedding_model_uri
 
             session.commit()
             return CreateOrUpdateAgentResponse(agent_uri=agent.agent_uri)
@@ -84,23 +200,116 @@ class DatabaseManager:
             session.commit()
 
 
-    def add_chat_message(self, aif_agent_uri: str, id: str, role: ChatRole, content: str, files: List[RequestFileInfo] = []):
+    def list_model_aliases(self) -> List[ModelAliasEntity]:
         with Session(self._engine) as session:
-            chat_history = session.get(ChatHistoryEntity, id)
-            if chat_history is None:
-                chat_history = ChatHistoryEntity(id=id, aif_agent_uri=aif_agent_uri, messages="[]")
-                session.add(chat_history)
+            return session.query(ModelAliasEntity).all()
+
+    def get_model_alias_by_uri(self, alias_uri: str) -> ModelAliasEntity | None:
+        with Session(self._engine) as session:
+            return session.query(ModelAliasEntity).filter(ModelAliasEntity.alias_uri == alias_uri).first()
+
+    def update_model_alias(self, id: str, request: UpdateModelAliasRequest) -> CreateOrUpdateModelAliasResponse:
+        with Session(self._engine) as session:
+            model_alias = session.get(ModelAliasEntity, id)
+            if model_alias is None:
+                raise HTTPException(status_code=404, detail=f"Model alias with id {id} not found")
 
-            chatHistoryMessage = ChatHistoryMessage(role=role.name, content=content, files=files)
-            messages_json = json.loads(chat_history.messages)
-            messages_json.append(chatHistoryMessage.model_dump_json())
-            chat_history.messages = json.dumps(messages_json)
+            model_alias.basemodel_uris = request.basemodel_uris if request.basemodel_uris else model_alias.basemodel_uris
+
+            session.commit()
+            return CreateOrUpdateModelAliasResponse(alias_uri=model_alias.alias_uri)
+
+    def delete_model_alias(self, id: str) -> ModelAliasEntity:
+        with Session(self._engine) as session:
+            model_alias = session.get(ModelAliasEntity, id)
+            if model_alias is None:
+                raise HTTPException(status_code=404, detail=f"Model alias with id {id} not found")
+            session.delete(model_alias)
             session.commit()
+            return model_alias
 
 
-    def get_chat_history(self, id: str) -> List[ChatHistoryMessage] | None:
+    def add_chat_message(self, aif_agent_uri: str, id: str, role: ChatRole, content: str, files: List[RequestFileInfo] = []):
+        self.add_chat_messages(aif_agent_uri=aif_agent_uri, id=id, messages=[ChatHistoryMessage(role=role.name, content=content, files=files)])
+
+
+    def add_chat_messages(self, aif_agent_uri: str, id: str, messages: List[ChatHistoryMessage]):
+        """
+        Append the messages to the session in one transaction, e.g. the user message and the assistant message of a turn
+        """
+        error = self.add_chat_messages_batch([(aif_agent_uri, id, messages)])[0]
+        if error is not None:
+            raise error
+
+
+    def add_chat_messages_batch(self, batch: List[Tuple[str, str, List[ChatHistoryMessage]]]) -> List[Exception | None]:
+        """
+        Append the messages of several sessions in one transaction, each item is (aif_agent_uri, id, messages).
+        If the transaction fails, each session is committed on its own so a failed session doesn't lose the others.
+        Returns the error of each item, None when it's saved
+        """
+        try:
+            self._commit_chat_messages(batch)
+            return [None] * len(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                return [e]
+
+        errors = []
+        for item in batch:
+            try:
+                self._commit_chat_messages([item])
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+
+    def _commit_chat_messages(self, batch: List[Tuple[str, str, List[ChatHistoryMessage]]]):
+        for retry in range(CHAT_MESSAGE_INSERT_RETRIES):
+            try:
+                with Session(self._engine) as session:
+                    for aif_agent_uri, id, messages in batch:
+                        self._add_chat_messages(session, aif_agent_uri, id, messages)
+                    session.commit()
+                    return
+            except IntegrityError:
+                # Another request appended to the same session at the same time, retry with the new sequence number
+                if retry == CHAT_MESSAGE_INSERT_RETRIES - 1:
+                    raise
+
+
+    def _add_chat_messages(self, session: Session, aif_agent_uri: str, id: str, messages: List[ChatHistoryMessage]):
+        if session.get(ChatHistoryEntity, id) is None:
+            session.add(ChatHistoryEntity(id=id, aif_agent_uri=aif_agent_uri))
+
+        # Autoflush includes the messages added earlier in the same transaction
+        max_seq = session.query(func.max(ChatMessageEntity.seq)).filter(ChatMessageEntity.session_id == id).scalar()
+        next_seq = 0 if max_seq is None else max_seq + 1
+        for index, message in enumerate(messages):
+            session.add(ChatMessageEntity(
+                session_id=id,
+                seq=next_seq + index,
+                role=message.role,
+                content=message.content,
+                files=[file.model_dump() for file in message.files],
+                token_count=estimate_message_tokens(message.content, message.files),
+            ))
+
+
+    def get_chat_history(self, id: str) -> ChatHistoryEntity | None:
+        """
+        The session with its messages in the legacy `messages` format: a JSON list of the JSON messages
+        """
         with Session(self._engine) as session:
-            return session.get(ChatHistoryEntity, id)
+            chat_history = session.get(ChatHistoryEntity, id)
+            if chat_history is None:
+                return None
+            aif_agent_uri = chat_history.aif_agent_uri
+
+        messages = self.get_chat_history_messages(id) or []
+        # A detached copy, the stored blob stays empty
+        return ChatHistoryEntity(id=id, aif_agent_uri=aif_agent_uri, messages=json.dumps([message.model_dump_json() for message in messages]))
 
 
     def get_chat_history_messages(self, id: str) -> List[ChatHistoryMessage] | None:
@@ -109,20 +318,87 @@ class DatabaseManager:
             if chat_history is None:
                 return None
 
-            messages_json = json.loads(chat_history.messages) if chat_history.messages else []
+            chat_messages = session.query(ChatMessageEntity).filter(ChatMessageEntity.session_id == id).order_by(ChatMessageEntity.seq).all()
+            messages = []
+            for chat_message in chat_messages:
+                files = [RequestFileInfo(**file) for file in chat_message.files]
+                messages.append(ChatHistoryMessage(role=chat_message.role, content=chat_message.content, files=files))
+            return messages
+
+
+    def get_recent_chat_history_messages(self, id: str, token_budget: int, after_seq: int = -1) -> List[ChatHistoryMessage]:
+        """
+        Get the most recent messages after `after_seq` which fit into the token budget, from the oldest to the newest
+        """
+        with Session(self._engine) as session:
+            query = session.query(ChatMessageEntity) \
+                .filter(ChatMessageEntity.session_id == id, ChatMessageEntity.seq > after_seq) \
+                .order_by(ChatMessageEntity.seq.desc())
+            chat_messages: List[ChatMessageEntity] = []
+            used_tokens = 0
+            for chat_message in query.yield_per(CHAT_MESSAGE_QUERY_BATCH_SIZE):
+                token_count = chat_message.token_count if chat_message.token_count is not None else estimate_message_tokens(chat_message.content, chat_message.files)
+                if used_tokens + token_count > token_budget:
+                    break
+                used_tokens += token_count
+                chat_messages.append(chat_message)
+
+            # Start the window with a user message, an assistant message without its question is confusing
+            while len(chat_messages) > 0 and chat_messages[-1].role != ChatRole.USER.name:
+                chat_messages.pop()
+
             messages = []
-            for message in messages_json:
-                chatHistoryMessageJson = json.loads(message)
-                files = [RequestFileInfo(**file) for file in chatHistoryMessageJson["files"]]
-                chatHistoryMessage = ChatHistoryMessage(role=chatHistoryMessageJson["role"], content=chatHistoryMessageJson["content"], files=files)
-                messages.append(chatHistoryMessage)
+            for chat_message in reversed(chat_messages):
+                files = [RequestFileInfo(**file) for file in chat_message.files]
+                messages.append(ChatHistoryMessage(role=chat_message.role, content=chat_message.content, files=files))
             return messages
 
 
+    def get_chat_messages(self, id: str, after_seq: int = -1) -> List[ChatMessageEntity]:
+        with Session(self._engine) as session:
+            return session.query(ChatMessageEntity) \
+                .filter(ChatMessageEntity.session_id == id, ChatMessageEntity.seq > after_seq) \
+                .order_by(ChatMessageEntity.seq) \
+                .all()
+
+
+    def has_chat_messages(self, id: str) -> bool:
+        with Session(self._engine) as session:
+            return session.query(ChatMessageEntity.seq).filter(ChatMessageEntity.session_id == id).first() is not None
+
+
+    def get_chat_messages_token_count(self, id: str, after_seq: int = -1) -> int:
+        with Session(self._engine) as session:
+            token_count = session.query(func.sum(func.coalesce(ChatMessageEntity.token_count, func.length(ChatMessageEntity.content) / CHARS_PER_TOKEN))) \
+                .filter(ChatMessageEntity.session_id == id, ChatMessageEntity.seq > after_seq) \
+                .scalar()
+            return int(token_count) if token_count else 0
+
+
+    def get_chat_summary(self, id: str) -> ChatSummaryEntity | None:
+        with Session(self._engine) as session:
+            return session.get(ChatSummaryEntity, id)
+
+
+    def save_chat_summary(self, id: str, summary: str, last_seq: int, token_count: int):
+        with Session(self._engine) as session:
+            chat_summary = session.get(ChatSummaryEntity, id)
+            if chat_summary is None:
+                chat_summary = ChatSummaryEntity(session_id=id, summary=summary, last_seq=last_seq, token_count=token_count)
+                session.add(chat_summary)
+            else:
+                chat_summary.summary = summary
+                chat_summary.last_seq = last_seq
+                chat_summary.token_count = token_count
+            session.commit()
+
+
     def delete_chat_history(self, id: str):
         with Session(self._engine) as session:
             chat_history = session.get(ChatHistoryEntity, id)
             if chat_history is not None:
+                session.query(ChatMessageEntity).filter(ChatMessageEntity.session_id == id).delete()
+                session.query(ChatSummaryEntity).filter(ChatSummaryEntity.session_id == id).delete()
                 session.delete(chat_history)
                 session.commit()
 
@@ -163,3 +439,14 @@ class DatabaseManager:
             session.delete(function)
             session.commit()
             return DeleteFunctionResponse(id=id)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets the readers run while a write is in progress, NORMAL is durable enough with WAL and much faster
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")
+    cursor.close()
@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import pytest
+from sqlalchemy.orm import Session
+from aif_types.agents import AgentEntity
+from aif_types.chat import ChatHistoryEntity, ChatHistoryMessage, ChatRole
+from database.database_manager import DatabaseManager
+
+
+def _create_messages(*contents: str):
+    return [ChatHistoryMessage(role=ChatRole.USER.name, content=content, files=[]) for content in contents]
+
+
+def _create_turns(*contents: str):
+    # A user message followed by the assistant answer with the same content
+    messages = []
+    for content in contents:
+        messages.append(ChatHistoryMessage(role=ChatRole.USER.name, content=content, files=[]))
+        messages.append(ChatHistoryMessage(role=ChatRole.ASSISTANT.name, content=content, files=[]))
+    return messages
+
+
+def describe_database_manager():
+    @pytest.fixture
+    def create_database_manager(tmp_path, monkeypatch):
+        monkeypatch.setattr("database.database_manager.get_assets_path", lambda: str(tmp_path))
+        monkeypatch.setenv("SQLITE_FILE_NAME", "test.db")
+        return DatabaseManager
+
+    def describe_chat_history():
+        def test_get_chat_history_has_the_messages(create_database_manager):
+            database_manager = create_database_manager()
+            database_manager.add_chat_messages("aif://agents/a", "session-1", _create_messages("Hello", "World"))
+
+            chat_history = database_manager.get_chat_history("session-1")
+            assert chat_history.aif_agent_uri == "aif://agents/a"
+            assert [json.loads(message)["content"] for message in json.loads(chat_history.messages)] == ["Hello", "World"]
+            assert database_manager.get_chat_history("unknown") is None
+
+        def test_migrates_legacy_messages(create_database_manager):
+            database_manager = create_database_manager()
+            legacy_messages = [message.model_dump_json() for message in _create_messages("Hello", "World")]
+            with Session(database_manager._engine) as session:
+                session.add(ChatHistoryEntity(id="session-1", aif_agent_uri="aif://agents/a", messages=json.dumps(legacy_messages)))
+                session.commit()
+
+            # The migration runs when the server starts
+            database_manager = create_database_manager()
+            assert [message.content for message in database_manager.get_chat_history_messages("session-1")] == ["Hello", "World"]
+            with Session(database_manager._engine) as session:
+                assert session.get(ChatHistoryEntity, "session-1").messages == "[]"
+
+            # New messages continue the sequence
+            database_manager.add_chat_messages("aif://agents/a", "session-1", _create_messages("Again"))
+            assert [message.content for message in database_manager.get_chat_history_messages("session-1")] == ["Hello", "World", "Again"]
+
+        def test_has_chat_messages(create_database_manager):
+            database_manager = create_database_manager()
+            assert not database_manager.has_chat_messages("session-1")
+            database_manager.add_chat_messages("aif://agents/a", "session-1", _create_messages("Hello"))
+            assert database_manager.has_chat_messages("session-1")
+
+        def test_batch_saves_the_other_sessions_when_one_fails(create_database_manager, monkeypatch):
+            database_manager = create_database_manager()
+            add_chat_messages = database_manager._add_chat_messages
+
+            def add_chat_messages_or_fail(session, aif_agent_uri, id, messages):
+                if id == "invalid":
+                    raise RuntimeError("invalid session")
+                add_chat_messages(session, aif_agent_uri, id, messages)
+            monkeypatch.setattr(database_manager, "_add_chat_messages", add_chat_messages_or_fail)
+
+            errors = database_manager.add_chat_messages_batch([
+                ("aif://agents/a", "session-1", _create_messages("Hello")),
+                ("aif://agents/a", "invalid", _create_messages("Hello")),
+                ("aif://agents/a", "session-2", _create_messages("World")),
+            ])
+            assert [str(error) if error else None for error in errors] == [None, "invalid session", None]
+            assert [message.content for message in database_manager.get_chat_history_messages("session-1")] == ["Hello"]
+            assert [message.content for message in database_manager.get_chat_history_messages("session-2")] == ["World"]
+
+    def describe_get_recent_chat_history_messages():
+        def test_keeps_the_newest_messages_within_budget(create_database_manager):
+            database_manager = create_database_manager()
+            # 4 overhead + 10 content tokens per message
+            database_manager.add_chat_messages("aif://agents/a", "session-1", _create_turns("a" * 40, "b" * 40, "c" * 40))
+
+            messages = database_manager.get_recent_chat_history_messages("session-1", token_budget=14 * 4)
+            assert [message.content[0] for message in messages] == ["b", "b", "c", "c"]
+
+        def test_starts_with_a_user_message(create_database_manager):
+            database_manager = create_database_manager()
+            database_manager.add_chat_messages("aif://agents/a", "session-1", _create_turns("a" * 40, "b" * 40))
+
+            # 3 messages fit, the assistant message without its question is dropped
+            messages = database_manager.get_recent_chat_history_messages("session-1", token_budget=14 * 3)
+            assert [(message.role, message.content[0]) for message in messages] == [(ChatRole.USER.name, "b"), (ChatRole.ASSISTANT.name, "b")]
+
+        def test_after_seq(create_database_manager):
+            database_manager = create_database_manager()
+            database_manager.add_chat_messages("aif://agents/a", "session-1", _create_turns("a", "b"))
+            messages = database_manager.get_recent_chat_history_messages("session-1", token_budget=1000, after_seq=1)
+            assert [message.content for message in messages] == ["b", "b"]
+
+        def test_nothing_fits(create_database_manager):
+            database_manager = create_database_manager()
+            database_manager.add_chat_messages("aif://agents/a", "session-1", _create_turns("a" * 400))
+            assert database_manager.get_recent_chat_history_messages("session-1", token_budget=10) == []
+
+    def describe_add_missing_columns():
+        def test_adds_the_nullable_columns_to_existing_tables(create_database_manager, tmp_path):
+            # The agent table of an older version
+            connection = sqlite3.connect(tmp_path / "test.db")
+            connection.execute("CREATE TABLE agententity (id VARCHAR PRIMARY KEY, agent_uri VARCHAR, name VARCHAR, base_model_uri VARCHAR, system_prompt VARCHAR, rag_asset_ids JSON, function_asset_ids JSON)")
+            connection.execute("""INSERT INTO agententity VALUES ('a', 'aif://agents/a', 'a', 'aif://model/a', NULL, '[]', '[]')""")
+            connection.commit()
+            connection.close()
+
+            database_manager = create_database_manager()
+            agent = database_manager.get_agent_by_uri("aif://agents/a")
+            assert agent.id == "a"
+            assert agent.prompt_token_budget is None
+
+            database_manager.save_db_model(AgentEntity(id="b", agent_uri="aif://agents/b", base_model_uri="aif://model/a", rag_asset_ids=[], function_asset_ids=[], prompt_token_budget=100))
+            assert database_manager.get_agent_by_uri("aif://agents/b").prompt_token_budget == 100
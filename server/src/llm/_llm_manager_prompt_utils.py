@@ -11,6 +11,8 @@ from langchain_core.vectorstores import VectorStoreRetriever
 from database.database_manager import DatabaseManager
 from aif_types.chat import ChatRole, TextFormatPrompts
 from aif_types.common import RequestFileInfo
+from database.blob_store import blobStore
+from utils.token_utils import estimate_tokens, estimate_message_tokens, get_rag_context_token_reserve
 
 
 def get_prompt_template(
@@ -21,12 +23,20 @@ def get_prompt_template(
     outputFormat: str,
     input: str,
     requestFileInfoList: List[RequestFileInfo],
+    token_budget: int,
 ):
     system_prompt_template = system_prompt_str if system_prompt_str else ""
     if len(system_prompt_template) > 0 and TextFormatPrompts[outputFormat]:
         system_prompt_template += "\n"
         system_prompt_template += TextFormatPrompts[outputFormat]
 
+    # Summary of the older messages, see ChatSummarizer
+    chat_summary = database_manager.get_chat_summary(aif_session_id)
+    if chat_summary is not None:
+        if len(system_prompt_template) > 0:
+            system_prompt_template += "\n"
+        system_prompt_template += "Summary of the earlier conversation: " + _escape_template(chat_summary.summary)
+
     input_variables = []
     for index, retriever in enumerate(ragRetrieverList):
         context_id = f"context-{index}"
@@ -40,7 +50,13 @@ def get_prompt_template(
     )
     messages = [system_prompt] if len(system_prompt_template) > 0 else []
 
-    history_messages = database_manager.get_chat_history_messages(aif_session_id)
+    # The system prompt, the RAG context and the input are always kept, the most recent history fills the rest
+    history_token_budget = token_budget \
+        - estimate_tokens(system_prompt_template) \
+        - get_rag_context_token_reserve() * len(ragRetrieverList) \
+        - estimate_message_tokens(input, requestFileInfoList)
+    history_after_seq = chat_summary.last_seq if chat_summary is not None else -1
+    history_messages = database_manager.get_recent_chat_history_messages(aif_session_id, history_token_budget, history_after_seq) if history_token_budget > 0 else []
     if history_messages is not None:
         for message in history_messages:
             if message.role == ChatRole.USER.name:
@@ -71,10 +87,11 @@ def _createInputMessage(
     content_parts = []
 
     for requestFileInfo in requestFileInfoList:
+        file_buffer = requestFileInfo.file_buffer if requestFileInfo.file_buffer else blobStore.get_base64(requestFileInfo.blob_id)
         file_part = {
             "type": "image_url",
             "image_url": {
-                "url": f"data:{requestFileInfo.mine_type};base64,{requestFileInfo.file_buffer}",
+                "url": f"data:{requestFileInfo.mine_type};base64,{file_buffer}",
                 "detail": "high",
             },
         }
@@ -84,3 +101,7 @@ def _createInputMessage(
     content_parts.append(text_part)
 
     return content_parts
+
+
+def _escape_template(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
@@ -0,0 +1,45 @@
+import threading
+from typing import Dict
+from aif_types.agents import AgentEntity
+from database.database_manager import DatabaseManager
+
+
+class AgentRegistry:
+    """
+    Resolve agents by `agent_uri` with the indexed lookup and keep the resolved agents in memory.
+    The entries must be invalidated when the agent is updated or deleted.
+    """
+    def __init__(self, database_manager: DatabaseManager):
+        self.database_manager = database_manager
+        self._agents: Dict[str, AgentEntity] = {}   # Key: agent_uri
+        self._agent_uris: Dict[str, str] = {}       # Key: agent id; Value: agent_uri
+        self._lock = threading.Lock()
+        # Bumped by invalidate and clear, an agent read before them is not cached
+        self._generation = 0
+
+    def get_agent(self, agent_uri: str) -> AgentEntity | None:
+        agent = self._agents.get(agent_uri)
+        if agent is not None:
+            return agent
+
+        generation = self._generation
+        agent = self.database_manager.get_agent_by_uri(agent_uri)
+        if agent is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._agents[agent_uri] = agent
+                    self._agent_uris[agent.id] = agent_uri
+        return agent
+
+    def invalidate(self, id: str):
+        with self._lock:
+            self._generation += 1
+            agent_uri = self._agent_uris.pop(id, None)
+            if agent_uri is not None:
+                self._agents.pop(agent_uri, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._agents.clear()
+            self._agent_uris.clear()
@@ -0,0 +1,68 @@
+from aif_types.agents import AgentEntity
+from llm.agent_registry import AgentRegistry
+
+
+class FakeDatabaseManager:
+    def __init__(self, agents):
+        self.agents = { agent.agent_uri: agent for agent in agents }
+        self.lookups = 0
+
+    def get_agent_by_uri(self, agent_uri):
+        self.lookups += 1
+        return self.agents.get(agent_uri)
+
+
+def _create_agent(id: str) -> AgentEntity:
+    return AgentEntity(id=id, agent_uri=f"aif://agents/{id}", name=id, base_model_uri="aif://model/a")
+
+
+def describe_agent_registry():
+    def test_caches_resolved_agents():
+        database_manager = FakeDatabaseManager([_create_agent("a")])
+        agent_registry = AgentRegistry(database_manager)
+        assert agent_registry.get_agent("aif://agents/a").id == "a"
+        assert agent_registry.get_agent("aif://agents/a").id == "a"
+        assert database_manager.lookups == 1
+
+    def test_does_not_cache_unknown_agents():
+        database_manager = FakeDatabaseManager([])
+        agent_registry = AgentRegistry(database_manager)
+        assert agent_registry.get_agent("aif://agents/a") is None
+        database_manager.agents["aif://agents/a"] = _create_agent("a")
+        assert agent_registry.get_agent("aif://agents/a").id == "a"
+
+    def test_invalidate_by_id():
+        database_manager = FakeDatabaseManager([_create_agent("a"), _create_agent("b")])
+        agent_registry = AgentRegistry(database_manager)
+        agent_registry.get_agent("aif://agents/a")
+        agent_registry.get_agent("aif://agents/b")
+
+        agent_registry.invalidate("a")
+        agent_registry.get_agent("aif://agents/a")
+        agent_registry.get_agent("aif://agents/b")
+        assert database_manager.lookups == 3
+
+    def test_clear():
+        database_manager = FakeDatabaseManager([_create_agent("a")])
+        agent_registry = AgentRegistry(database_manager)
+        agent_registry.get_agent("aif://agents/a")
+        agent_registry.clear()
+        agent_registry.get_agent("aif://agents/a")
+        assert database_manager.lookups == 2
+
+    def test_does_not_cache_an_agent_read_before_invalidate():
+        database_manager = FakeDatabaseManager([_create_agent("a")])
+        agent_registry = AgentRegistry(database_manager)
+        get_agent_by_uri = database_manager.get_agent_by_uri
+
+        def get_agent_by_uri_and_update(agent_uri):
+            agent = get_agent_by_uri(agent_uri)
+            # The agent is updated before the read returns
+            database_manager.agents[agent_uri] = AgentEntity(id="a", agent_uri=agent_uri, name="updated", base_model_uri="aif://model/b")
+            agent_registry.invalidate("a")
+            return agent
+        database_manager.get_agent_by_uri = get_agent_by_uri_and_update
+        assert agent_registry.get_agent("aif://agents/a").name == "a"
+
+        database_manager.get_agent_by_uri = get_agent_by_uri
+        assert agent_registry.get_agent("aif://agents/a").name == "updated"
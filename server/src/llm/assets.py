@@ -1,36 +1,109 @@
 import os, uuid
-from typing import Any, Callable, List
+from typing import Any, Callable, Iterable, List
+from fastapi import HTTPException
 from langchain_community.vectorstores import VectorStore
 from langchain_community.vectorstores.faiss import FAISS
 from langchain_community.vectorstores.chroma import Chroma
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
-from aif_types.embeddings import CreateOrUpdateEmbeddingsResponse, EmbeddingEntity
+from aif_types.embeddings import CreateOrUpdateEmbeddingsResponse, EmbeddingChunkEntity, EmbeddingEntity
 from utils.assets_utils import get_embeddings_asset_path
 from database.database_manager import DatabaseManager
+from llm.vector_store_cache import vectorStoreCache
+from llm.embedding_batcher import EmbeddingBatcher
+from llm.embedding_cache import EmbeddingCache, is_embedding_cache_enabled
+from llm.embedding_manifest import EmbeddingManifestDiff
+from llm.ingestion_utils import hash_text
+from utils.aif_utils import is_aif_alias_uri
 
 
-def create_or_update_embeddings(asset_id: str | None, name: str, basemodel_uri: str, llm: Embeddings, documents: List[Document] | None, database_manager: DatabaseManager) -> CreateOrUpdateEmbeddingsResponse:
+def create_or_update_embeddings(
+    asset_id: str | None,
+    name: str,
+    basemodel_uri: str,
+    llm: Embeddings,
+    documents: Iterable[Document] | None,
+    database_manager: DatabaseManager,
+    key_prefix: str | None = None,
+    remove_sources: List[str] = [],
+    on_progress: Callable[[int], None] | None = None,
+) -> CreateOrUpdateEmbeddingsResponse:
+    """
+    The documents may be a generator, they are embedded batch by batch so only the batches in flight are in memory.
+    key_prefix is the one of the provider of the embedding model, for its batch limits.
+    An update replaces the sources of the documents and removes the `remove_sources`, only the chunks which are not in
+    the asset yet are embedded.
+    on_progress is called with the number of chunks of each embedded batch, it may raise to abort before anything is saved
+    """
     is_update = asset_id is not None
+    vector_store = None
 
     if asset_id is None:
         asset_id = uuid.uuid4().hex
     else:
-        vector_store = load_embeddings(asset_id, llm, None, database_manager)
+        # Load a private copy, the cached instance may be in use by chat requests
+        vector_store = load_embeddings(asset_id, llm, None, database_manager, use_cache=False)
 
     assets_path = get_embeddings_asset_path()
     aif_vs_provider = os.environ.get("VECTOR_STORE_PROVIDER")
     metadata = EmbeddingEntity(name=name, vectorStoreProvider=aif_vs_provider, basemodel_uri=basemodel_uri, id=asset_id)
 
-    if documents is not None:
+    if documents is not None or len(remove_sources) > 0:
         if aif_vs_provider == "faiss":
-            if not is_update:
-                embeddings = FAISS.from_documents(documents, llm)
-                FAISS.save_local(embeddings, assets_path, asset_id)
-                database_manager.save_db_model(metadata)
-            else:
-                vector_store.add_documents(documents)
-                FAISS.save_local(vector_store, assets_path, asset_id)
+            manifest_diff = EmbeddingManifestDiff(database_manager, asset_id)
+            if is_update:
+                documents = manifest_diff.filter_new_documents(documents if documents is not None else [])
+                manifest_diff.remove_sources(remove_sources)
+
+            added_chunks: List[EmbeddingChunkEntity] = []
+            # The backends of an alias may be different models, their vectors can't be shared
+            embedding_cache = EmbeddingCache(database_manager, basemodel_uri) if is_embedding_cache_enabled() and not is_aif_alias_uri(basemodel_uri) else None
+            for batch, embeddings in EmbeddingBatcher(llm, key_prefix, embedding_cache).embed(documents):
+                text_embeddings = [(document.page_content, embedding) for document, embedding in zip(batch, embeddings)]
+                metadatas = [document.metadata for document in batch]
+                doc_ids = [uuid.uuid4().hex for _ in batch]
+                if vector_store is None:
+                    vector_store = FAISS.from_embeddings(text_embeddings, llm, metadatas=metadatas, ids=doc_ids)
+                else:
+                    vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=doc_ids)
+                added_chunks.extend([
+                    EmbeddingChunkEntity(asset_id=asset_id, doc_id=doc_id, source=document.metadata.get("source", ""), chunk_hash=hash_text(document.page_content))
+                    for document, doc_id in zip(batch, doc_ids)
+                ])
+                if on_progress is not None:
+                    on_progress(len(batch))
+
+            if vector_store is None:
+                raise HTTPException(status_code=400, detail="No content to embed")
+
+            # The documents added before the manifest existed are not in it
+            removed_doc_ids = list(set(manifest_diff.removed_doc_ids) & set(vector_store.index_to_docstore_id.values()))
+            if len(removed_doc_ids) > 0:
+                vector_store.delete(removed_doc_ids)
+
+            # The index is written next to the current one and only replaces it with the manifest transaction,
+            # a failed save or commit leaves both of them as they were
+            temp_index_name = f"{asset_id}.{uuid.uuid4().hex}.tmp"
+            FAISS.save_local(vector_store, assets_path, temp_index_name)
+            try:
+                database_manager.update_embedding_chunks(
+                    asset_id,
+                    added_chunks,
+                    list(set(manifest_diff.removed_doc_ids)),
+                    embedding=None if is_update else metadata,
+                    before_commit=lambda: _replace_faiss_files(assets_path, temp_index_name, asset_id),
+                )
+            finally:
+                _remove_faiss_files(assets_path, temp_index_name)
+            vectorStoreCache.invalidate(asset_id)
+
+            return CreateOrUpdateEmbeddingsResponse(
+                asset_id=asset_id,
+                name=name,
+                added_chunks=len(added_chunks),
+                removed_chunks=len(removed_doc_ids),
+                unchanged_chunks=manifest_diff.unchanged_chunks,
+            )
         elif aif_vs_provider == "chroma":
             # embeddings = Chroma.from_documents(documents, llm)
             # Chroma.save_local(embeddings, assets_path, asset_id)
@@ -43,10 +116,15 @@ def create_or_update_embeddings(asset_id: str | None, name: str, basemodel_uri:
     return CreateOrUpdateEmbeddingsResponse(asset_id=asset_id, name=name)
 
 
-def load_embeddings(asset_id: str, llm: Embeddings | None, get_llm: Callable[[str], str ] | None, database_manager: DatabaseManager) -> VectorStore:
+def load_embeddings(asset_id: str, llm: Embeddings | None, get_llm: Callable[[str], str ] | None, database_manager: DatabaseManager, use_cache: bool = True) -> VectorStore:
     if llm is None and get_llm is None:
         raise Exception("llm and llm_model_uri cannot be both None")
-    
+
+    if use_cache:
+        vector_store = vectorStoreCache.get(asset_id)
+        if vector_store is not None:
+            return vector_store
+
     embedding_metadata = database_manager.load_embeddings_metadata(asset_id=asset_id)
 
     if llm is None:
@@ -56,7 +134,10 @@ def load_embeddings(asset_id: str, llm: Embeddings | None, get_llm: Callable[[st
 
     vectorStoreProvider = embedding_metadata.vectorStoreProvider
     if vectorStoreProvider == "faiss":
-        return FAISS.load_local(folder_path=assets_path, embeddings=llm, index_name=asset_id, allow_dangerous_deserialization=True)
+        loader = lambda: FAISS.load_local(folder_path=assets_path, embeddings=llm, index_name=asset_id, allow_dangerous_deserialization=True)
+        if not use_cache:
+            return loader()
+        return vectorStoreCache.get_or_load(asset_id, _get_faiss_asset_size(assets_path, asset_id), loader)
     elif vectorStoreProvider == "chroma":
         # return Chroma.load_local(assets_path, asset_id)
         raise Exception("Not implemented")
@@ -65,6 +146,7 @@ def load_embeddings(asset_id: str, llm: Embeddings | None, get_llm: Callable[[st
 
 
 def delete_embedding(asset_id: str, database_manager: DatabaseManager):
+    vectorStoreCache.invalidate(asset_id)
     assets_path = get_embeddings_asset_path()
     embedding_metadata = database_manager.load_embeddings_metadata(asset_id=asset_id)
     vectorStoreProvider = embedding_metadata.vectorStoreProvider
@@ -79,3 +161,27 @@ def delete_embedding(asset_id: str, database_manager: DatabaseManager):
         raise Exception("Invalid vector store provider")
 
     database_manager.delete_embeddings_metadata(asset_id)
+
+
+def _replace_faiss_files(assets_path: str, source_index_name: str, index_name: str):
+    for file_ext in ["faiss", "pkl"]:
+        os.replace(f"{assets_path}/{source_index_name}.{file_ext}", f"{assets_path}/{index_name}.{file_ext}")
+
+
+def _remove_faiss_files(assets_path: str, index_name: str):
+    for file_ext in ["faiss", "pkl"]:
+        file_path = f"{assets_path}/{index_name}.{file_ext}"
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def _get_faiss_asset_size(assets_path: str, asset_id: str) -> int:
+    """
+    The loaded index takes roughly the same memory as the index and the docstore on disk
+    """
+    size = 0
+    for file_ext in ["faiss", "pkl"]:
+        file_path = f"{assets_path}/{asset_id}.{file_ext}"
+        if os.path.exists(file_path):
+            size += os.path.getsize(file_path)
+    return size
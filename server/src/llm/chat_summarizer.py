@@ -0,0 +1,112 @@
+import os
+import asyncio
+from typing import Callable, List, Set
+from langchain_core.messages import HumanMessage, SystemMessage
+from aif_types.chat import ChatMessageEntity, ChatRole
+from database.database_manager import DatabaseManager
+from utils.token_utils import estimate_tokens
+
+
+DEFAULT_CHAT_SUMMARY_TRIGGER_TOKENS = 6000
+DEFAULT_CHAT_SUMMARY_KEEP_RECENT_MESSAGES = 6
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a summary of a conversation between a user and an assistant.
+Update the existing summary with the new messages. Keep the facts, decisions, names and open questions, drop the small talk.
+Reply with the updated summary only."""
+
+
+class ChatSummarizer:
+    """
+    Compact the long chat sessions in the background: when the messages which are not summarized yet exceed
+    `CHAT_SUMMARY_TRIGGER_TOKENS`, the older ones are folded into a rolling summary by the model `CHAT_SUMMARY_MODEL_URI`
+    (the model of the agent if it's not set), and only the most recent messages are kept as they are.
+    """
+    def __init__(self, database_manager: DatabaseManager, get_llm: Callable):
+        self.database_manager = database_manager
+        self.get_llm = get_llm
+        self._summarizing_session_ids: Set[str] = set()
+        # The event loop only keeps weak references to the tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, aif_session_id: str, model_uri: str, after: asyncio.Future | None = None):
+        """
+        Summarize the session in the background if needed, it never blocks the chat request. If `after` is set, e.g. the
+        pending write of the latest turn, it's awaited first
+        """
+        if aif_session_id in self._summarizing_session_ids:
+            return
+
+        self._summarizing_session_ids.add(aif_session_id)
+        task = asyncio.create_task(self._summarize(aif_session_id, model_uri, after))
+        self._tasks.add(task)
+
+        def on_done(task: asyncio.Task):
+            self._tasks.discard(task)
+            self._summarizing_session_ids.discard(aif_session_id)
+        task.add_done_callback(on_done)
+
+    async def _summarize(self, aif_session_id: str, model_uri: str, after: asyncio.Future | None):
+        try:
+            if after is not None:
+                await after
+            await asyncio.to_thread(self._summarize_sync, aif_session_id, model_uri)
+        except Exception as e:
+            print(f"Failed to summarize chat session {aif_session_id}: {e}")
+
+    def _summarize_sync(self, aif_session_id: str, model_uri: str):
+        chat_summary = self.database_manager.get_chat_summary(aif_session_id)
+        last_seq = chat_summary.last_seq if chat_summary else -1
+        if self.database_manager.get_chat_messages_token_count(aif_session_id, last_seq) <= _get_trigger_tokens():
+            return
+
+        chat_messages = self.database_manager.get_chat_messages(aif_session_id, last_seq)
+        chat_messages_to_summarize = _get_messages_to_summarize(chat_messages, _get_keep_recent_messages())
+        if len(chat_messages_to_summarize) == 0:
+            return
+
+        summary_model_uri = os.environ.get("CHAT_SUMMARY_MODEL_URI")
+        llm = self.get_llm(summary_model_uri if summary_model_uri else model_uri)
+        response = llm.invoke([
+            SystemMessage(content=SUMMARY_SYSTEM_PROMPT),
+            HumanMessage(content=_format_summary_input(chat_summary.summary if chat_summary else None, chat_messages_to_summarize)),
+        ])
+        summary = response.content if isinstance(response.content, str) else "".join([part["text"] for part in response.content if "text" in part])
+
+        self.database_manager.save_chat_summary(
+            id=aif_session_id,
+            summary=summary,
+            last_seq=chat_messages_to_summarize[-1].seq,
+            token_count=estimate_tokens(summary),
+        )
+
+
+def _get_messages_to_summarize(chat_messages: List[ChatMessageEntity], keep_recent_messages: int) -> List[ChatMessageEntity]:
+    """
+    All the messages except the most recent ones, the kept messages start with a user message
+    """
+    end = len(chat_messages) - keep_recent_messages
+    if end >= len(chat_messages):
+        # Nothing is kept
+        return chat_messages
+    while end > 0 and chat_messages[end].role != ChatRole.USER.name:
+        end -= 1
+    return chat_messages[:max(end, 0)]
+
+
+def _format_summary_input(summary: str | None, chat_messages: List[ChatMessageEntity]) -> str:
+    lines = [f"Existing summary:\n{summary if summary else '(empty)'}", "", "New messages:"]
+    for chat_message in chat_messages:
+        role = "User" if chat_message.role == ChatRole.USER.name else "Assistant"
+        attachments = f" [{len(chat_message.files)} image(s)]" if chat_message.files else ""
+        lines.append(f"{role}:{attachments} {chat_message.content}")
+    return "\n".join(lines)
+
+
+def _get_trigger_tokens() -> int:
+    value = os.environ.get("CHAT_SUMMARY_TRIGGER_TOKENS")
+    return int(value) if value else DEFAULT_CHAT_SUMMARY_TRIGGER_TOKENS
+
+
+def _get_keep_recent_messages() -> int:
+    value = os.environ.get("CHAT_SUMMARY_KEEP_RECENT_MESSAGES")
+    return int(value) if value else DEFAULT_CHAT_SUMMARY_KEEP_RECENT_MESSAGES
@@ -0,0 +1,87 @@
+import asyncio
+from langchain_core.messages import AIMessage
+from aif_types.chat import ChatMessageEntity, ChatRole, ChatSummaryEntity
+from llm.chat_summarizer import ChatSummarizer, _get_messages_to_summarize
+
+
+def _create_chat_messages(*roles: ChatRole):
+    return [ChatMessageEntity(session_id="session-1", seq=seq, role=role.name, content=f"message {seq}", files=[]) for seq, role in enumerate(roles)]
+
+
+class FakeDatabaseManager:
+    def __init__(self, chat_messages):
+        self.chat_messages = chat_messages
+        self.chat_summary: ChatSummaryEntity | None = None
+
+    def get_chat_summary(self, id):
+        return self.chat_summary
+
+    def get_chat_messages_token_count(self, id, after_seq=-1):
+        return sum(len(chat_message.content) for chat_message in self.chat_messages if chat_message.seq > after_seq)
+
+    def get_chat_messages(self, id, after_seq=-1):
+        return [chat_message for chat_message in self.chat_messages if chat_message.seq > after_seq]
+
+    def save_chat_summary(self, id, summary, last_seq, token_count):
+        self.chat_summary = ChatSummaryEntity(session_id=id, summary=summary, last_seq=last_seq, token_count=token_count)
+
+
+class FakeLlm:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=f"summary {self.calls}")
+
+
+def describe_get_messages_to_summarize():
+    def test_keeps_the_recent_messages_from_a_user_message():
+        chat_messages = _create_chat_messages(ChatRole.USER, ChatRole.ASSISTANT, ChatRole.USER, ChatRole.ASSISTANT, ChatRole.ASSISTANT)
+        # The last 2 messages start with an assistant message, the split moves back to the user message
+        assert [chat_message.seq for chat_message in _get_messages_to_summarize(chat_messages, 2)] == [0, 1]
+
+    def test_keep_nothing():
+        chat_messages = _create_chat_messages(ChatRole.USER, ChatRole.ASSISTANT)
+        assert [chat_message.seq for chat_message in _get_messages_to_summarize(chat_messages, 0)] == [0, 1]
+
+    def test_keep_more_than_all():
+        chat_messages = _create_chat_messages(ChatRole.USER, ChatRole.ASSISTANT)
+        assert _get_messages_to_summarize(chat_messages, 6) == []
+        assert _get_messages_to_summarize([], 0) == []
+
+
+def describe_chat_summarizer():
+    def test_summarizes_older_messages(monkeypatch):
+        monkeypatch.setenv("CHAT_SUMMARY_TRIGGER_TOKENS", "10")
+        monkeypatch.setenv("CHAT_SUMMARY_KEEP_RECENT_MESSAGES", "2")
+        database_manager = FakeDatabaseManager(_create_chat_messages(ChatRole.USER, ChatRole.ASSISTANT, ChatRole.USER, ChatRole.ASSISTANT))
+        llm = FakeLlm()
+        summarizer = ChatSummarizer(database_manager, lambda model_uri: llm)
+
+        async def run():
+            summarizer.schedule("session-1", "aif://model/a")
+            await asyncio.gather(*summarizer._tasks)
+        asyncio.run(run())
+
+        assert database_manager.chat_summary.summary == "summary 1"
+        assert database_manager.chat_summary.last_seq == 1
+
+    def test_schedules_one_summary_per_session(monkeypatch):
+        monkeypatch.setenv("CHAT_SUMMARY_TRIGGER_TOKENS", "10")
+        database_manager = FakeDatabaseManager(_create_chat_messages(*[ChatRole.USER, ChatRole.ASSISTANT] * 8))
+        llm = FakeLlm()
+        summarizer = ChatSummarizer(database_manager, lambda model_uri: llm)
+
+        async def run():
+            after = asyncio.get_running_loop().create_future()
+            summarizer.schedule("session-1", "aif://model/a", after=after)
+            summarizer.schedule("session-1", "aif://model/a", after=after)
+            assert len(summarizer._tasks) == 1
+            after.set_result(None)
+            await asyncio.gather(*summarizer._tasks)
+            # The session can be scheduled again once the summary is done
+            assert summarizer._tasks == set() and summarizer._summarizing_session_ids == set()
+        asyncio.run(run())
+
+        assert llm.calls == 1
@@ -0,0 +1,104 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from utils.token_utils import estimate_tokens
+from llm.embedding_cache import EmbeddingCache
+
+
+DEFAULT_EMBEDDING_BATCH_MAX_TOKENS = 8000
+DEFAULT_EMBEDDING_BATCH_MAX_TEXTS = 64
+DEFAULT_EMBEDDING_MAX_CONCURRENCY = 4
+DEFAULT_EMBEDDING_BATCH_MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 1
+
+
+class EmbeddingBatcher:
+    """
+    Embed the documents in batches of up to `{PREFIX}EMBEDDING_BATCH_MAX_TOKENS` tokens and
+    `{PREFIX}EMBEDDING_BATCH_MAX_TEXTS` texts, where PREFIX is the key prefix of the provider, e.g. "OPENAI_". The
+    unprefixed variables are the defaults of all the providers. Up to `{PREFIX}EMBEDDING_MAX_CONCURRENCY` batches are
+    embedded concurrently, and a failed batch is retried on its own up to `EMBEDDING_BATCH_MAX_RETRIES` times.
+    The texts found in the embedding cache are not sent to the provider.
+    """
+    def __init__(self, llm: Embeddings, key_prefix: str | None, embedding_cache: EmbeddingCache | None = None):
+        self.llm = llm
+        self.embedding_cache = embedding_cache
+        self.max_tokens = _get_provider_env_int(key_prefix, "EMBEDDING_BATCH_MAX_TOKENS", DEFAULT_EMBEDDING_BATCH_MAX_TOKENS)
+        self.max_texts = _get_provider_env_int(key_prefix, "EMBEDDING_BATCH_MAX_TEXTS", DEFAULT_EMBEDDING_BATCH_MAX_TEXTS)
+        self.max_concurrency = max(_get_provider_env_int(key_prefix, "EMBEDDING_MAX_CONCURRENCY", DEFAULT_EMBEDDING_MAX_CONCURRENCY), 1)
+        self.max_retries = _get_provider_env_int(None, "EMBEDDING_BATCH_MAX_RETRIES", DEFAULT_EMBEDDING_BATCH_MAX_RETRIES)
+
+    def embed(self, documents: Iterable[Document]) -> Iterator[Tuple[List[Document], List[List[float]]]]:
+        """
+        Yield the batches with their embeddings in the order of the documents. The documents are consumed only as far
+        as the batches in flight, so a generator is never read ahead further than that.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embedding")
+        pending: Deque[Tuple[List[Document], Future]] = deque()
+        try:
+            for batch in self._iter_batches(documents):
+                pending.append((batch, executor.submit(self._embed_batch, [document.page_content for document in batch])))
+                if len(pending) >= self.max_concurrency:
+                    batch, future = pending.popleft()
+                    yield batch, future.result()
+
+            while len(pending) > 0:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        finally:
+            # e.g. a batch failed for good, the remaining ones are not needed anymore
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _iter_batches(self, documents: Iterable[Document]) -> Iterator[List[Document]]:
+        batch = []
+        batch_tokens = 0
+        for document in documents:
+            tokens = estimate_tokens(document.page_content)
+            # A document larger than the limit is sent alone
+            if len(batch) > 0 and (batch_tokens + tokens > self.max_tokens or len(batch) >= self.max_texts):
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append(document)
+            batch_tokens += tokens
+        if len(batch) > 0:
+            yield batch
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if self.embedding_cache is None:
+            return self._embed_texts(texts)
+
+        embeddings = self.embedding_cache.get(texts)
+        missing_indexes = [index for index, embedding in enumerate(embeddings) if embedding is None]
+        if len(missing_indexes) > 0:
+            missing_texts = [texts[index] for index in missing_indexes]
+            missing_embeddings = self._embed_texts(missing_texts)
+            self.embedding_cache.put(missing_texts, missing_embeddings)
+            for index, embedding in zip(missing_indexes, missing_embeddings):
+                embeddings[index] = embedding
+        return embeddings
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                return self.llm.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise e
+                print(f"Embedding a batch of {len(texts)} texts failed, retrying: {e}")
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+                attempt += 1
+
+
+def _get_provider_env_int(key_prefix: str | None, envVarName: str, default: int) -> int:
+    value = os.environ.get(key_prefix + envVarName) if key_prefix else None
+    if not value:
+        value = os.environ.get(envVarName)
+    return int(value) if value else default
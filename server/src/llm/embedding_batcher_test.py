@@ -0,0 +1,90 @@
+import threading
+from typing import List
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+import llm.embedding_batcher as embedding_batcher
+from llm.embedding_batcher import EmbeddingBatcher
+
+
+class LengthEmbeddings(Embeddings):
+    def __init__(self, failures: int = 0):
+        self.calls: List[List[str]] = []
+        self.failures = failures
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls.append(texts)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.failures > 0
+            if fail:
+                self.failures -= 1
+        try:
+            if fail:
+                raise Exception("Rate limited")
+            return [[float(len(text))] for text in texts]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(len(text))]
+
+
+def _create_documents(count: int, length: int = 40) -> List[Document]:
+    return [Document(page_content=str(i).ljust(length, "x"), metadata={ "chunk": i }) for i in range(count)]
+
+
+def describe_embedding_batcher():
+    def test_batches_by_tokens_and_texts(monkeypatch):
+        monkeypatch.setenv("EMBEDDING_BATCH_MAX_TOKENS", "25")    # 40 chars = 10 tokens, 2 documents per batch
+        monkeypatch.setenv("EMBEDDING_BATCH_MAX_TEXTS", "3")
+        llm = LengthEmbeddings()
+        batches = list(EmbeddingBatcher(llm, None).embed(_create_documents(5)))
+
+        assert [[document.metadata["chunk"] for document in batch] for batch, _ in batches] == [[0, 1], [2, 3], [4]]
+        assert all(embeddings == [[40.0]] * len(batch) for batch, embeddings in batches)
+
+    def test_provider_limits_override_defaults(monkeypatch):
+        monkeypatch.setenv("EMBEDDING_BATCH_MAX_TEXTS", "3")
+        monkeypatch.setenv("OPENAI_EMBEDDING_BATCH_MAX_TEXTS", "1")
+        assert EmbeddingBatcher(LengthEmbeddings(), "OPENAI_").max_texts == 1
+        assert EmbeddingBatcher(LengthEmbeddings(), "OLLAMA_").max_texts == 3
+
+    def test_large_document_is_sent_alone(monkeypatch):
+        monkeypatch.setenv("EMBEDDING_BATCH_MAX_TOKENS", "5")
+        llm = LengthEmbeddings()
+        batches = list(EmbeddingBatcher(llm, None).embed(_create_documents(2)))
+        assert [len(batch) for batch, _ in batches] == [1, 1]
+
+    def test_bounded_concurrency(monkeypatch):
+        monkeypatch.setenv("EMBEDDING_BATCH_MAX_TEXTS", "1")
+        monkeypatch.setenv("EMBEDDING_MAX_CONCURRENCY", "3")
+        llm = LengthEmbeddings()
+        batches = list(EmbeddingBatcher(llm, None).embed(_create_documents(20)))
+        assert [batch[0].metadata["chunk"] for batch, _ in batches] == list(range(20))
+        assert llm.max_in_flight <= 3
+
+    def test_retries_failed_batch(monkeypatch):
+        monkeypatch.setattr(embedding_batcher, "RETRY_BACKOFF_SECONDS", 0)
+        monkeypatch.setenv("EMBEDDING_BATCH_MAX_TEXTS", "1")
+        monkeypatch.setenv("EMBEDDING_MAX_CONCURRENCY", "1")
+        llm = LengthEmbeddings(failures=2)
+        batches = list(EmbeddingBatcher(llm, None).embed(_create_documents(2)))
+        assert len(batches) == 2
+        # The first batch failed twice, the second one was sent once
+        assert [texts[0][0] for texts in llm.calls] == ["0", "0", "0", "1"]
+
+    def test_gives_up_after_retries(monkeypatch):
+        monkeypatch.setattr(embedding_batcher, "RETRY_BACKOFF_SECONDS", 0)
+        monkeypatch.setenv("EMBEDDING_BATCH_MAX_RETRIES", "1")
+        llm = LengthEmbeddings(failures=10)
+        try:
+            list(EmbeddingBatcher(llm, None).embed(_create_documents(1)))
+            assert False
+        except Exception as e:
+            assert str(e) == "Rate limited"
+        assert len(llm.calls) == 2
@@ -0,0 +1,32 @@
+import os
+import numpy as np
+from typing import List
+from database.database_manager import DatabaseManager
+from llm.ingestion_utils import hash_text
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of the vectors of an embedding model, keyed by the SHA-256 of the text. The vectors are stored as
+    float32 bytes in the database, so the same text is embedded only once across all the assets.
+    """
+    def __init__(self, database_manager: DatabaseManager, model_uri: str):
+        self.database_manager = database_manager
+        self.model_uri = model_uri
+
+    def get(self, texts: List[str]) -> List[List[float] | None]:
+        text_hashes = [hash_text(text) for text in texts]
+        cached_embeddings = self.database_manager.get_cached_embeddings(self.model_uri, list(set(text_hashes)))
+        return [
+            np.frombuffer(cached_embeddings[text_hash], dtype=np.float32).tolist() if text_hash in cached_embeddings else None
+            for text_hash in text_hashes
+        ]
+
+    def put(self, texts: List[str], embeddings: List[List[float]]):
+        vectors = { hash_text(text): np.asarray(embedding, dtype=np.float32).tobytes() for text, embedding in zip(texts, embeddings) }
+        self.database_manager.save_cached_embeddings(self.model_uri, vectors)
+
+
+def is_embedding_cache_enabled() -> bool:
+    # Enabled unless it's turned off explicitly
+    return os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() in ["1", "true", "yes"]
@@ -0,0 +1,43 @@
+import pytest
+from database.database_manager import DatabaseManager
+from llm.embedding_cache import EmbeddingCache
+from llm.embedding_batcher import EmbeddingBatcher
+from llm.embedding_batcher_test import LengthEmbeddings, _create_documents
+
+
+def describe_embedding_cache():
+    @pytest.fixture
+    def database_manager(tmp_path, monkeypatch):
+        monkeypatch.setattr("database.database_manager.get_assets_path", lambda: str(tmp_path))
+        monkeypatch.setenv("SQLITE_FILE_NAME", "test.db")
+        return DatabaseManager()
+
+    def test_get_and_put(database_manager):
+        cache = EmbeddingCache(database_manager, "aif://model/a")
+        assert cache.get(["a", "b"]) == [None, None]
+        cache.put(["a"], [[0.5, 1.0]])
+        assert cache.get(["a", "b", "a"]) == [[0.5, 1.0], None, [0.5, 1.0]]
+
+    def test_keyed_by_model(database_manager):
+        EmbeddingCache(database_manager, "aif://model/a").put(["a"], [[0.5]])
+        assert EmbeddingCache(database_manager, "aif://model/b").get(["a"]) == [None]
+
+    def test_put_twice(database_manager):
+        cache = EmbeddingCache(database_manager, "aif://model/a")
+        cache.put(["a"], [[0.5]])
+        cache.put(["a", "b"], [[0.5], [0.25]])
+        assert cache.get(["a", "b"]) == [[0.5], [0.25]]
+
+    def test_batcher_embeds_only_new_texts(database_manager, monkeypatch):
+        monkeypatch.setenv("EMBEDDING_BATCH_MAX_TEXTS", "2")
+        cache = EmbeddingCache(database_manager, "aif://model/a")
+        documents = _create_documents(3)
+
+        llm = LengthEmbeddings()
+        list(EmbeddingBatcher(llm, None, cache).embed(documents[:2]))
+        assert sum(len(texts) for texts in llm.calls) == 2
+
+        llm = LengthEmbeddings()
+        batches = list(EmbeddingBatcher(llm, None, cache).embed(documents))
+        assert llm.calls == [[documents[2].page_content]]
+        assert [embeddings for _, embeddings in batches] == [[[40.0], [40.0]], [[40.0]]]
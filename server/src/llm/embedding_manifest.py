@@ -0,0 +1,52 @@
+from typing import Dict, Iterable, Iterator, List
+from langchain_core.documents import Document
+from database.database_manager import DatabaseManager
+from llm.ingestion_utils import hash_text
+
+
+class EmbeddingManifestDiff:
+    """
+    Diff the chunks of the uploaded files against the manifest of an asset. The sources which are uploaded again are
+    replaced: their chunks which are already in the asset are kept, the new ones are embedded, and the ones which are
+    gone are removed. The other sources are not changed unless they are removed explicitly.
+    """
+    def __init__(self, database_manager: DatabaseManager, asset_id: str):
+        self.database_manager = database_manager
+        self.asset_id = asset_id
+        self.removed_doc_ids: List[str] = []
+        self.unchanged_chunks = 0
+
+    def filter_new_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Yield only the documents which are not in the manifest yet, the documents of a source must be consecutive
+        """
+        current_source = None
+        # Key: chunk hash; Value: doc ids, a file may contain the same chunk more than once
+        existing_doc_ids: Dict[str, List[str]] = {}
+        for document in documents:
+            source = document.metadata.get("source")
+            if source != current_source:
+                self._remove_remaining(existing_doc_ids)
+                existing_doc_ids = self._get_existing_doc_ids(source)
+                current_source = source
+
+            doc_ids = existing_doc_ids.get(hash_text(document.page_content))
+            if doc_ids:
+                doc_ids.pop()
+                self.unchanged_chunks += 1
+            else:
+                yield document
+        self._remove_remaining(existing_doc_ids)
+
+    def remove_sources(self, sources: List[str]):
+        self.removed_doc_ids.extend([chunk.doc_id for chunk in self.database_manager.list_embedding_chunks(self.asset_id, sources)])
+
+    def _get_existing_doc_ids(self, source: str) -> Dict[str, List[str]]:
+        existing_doc_ids = {}
+        for chunk in self.database_manager.list_embedding_chunks(self.asset_id, [source]):
+            existing_doc_ids.setdefault(chunk.chunk_hash, []).append(chunk.doc_id)
+        return existing_doc_ids
+
+    def _remove_remaining(self, existing_doc_ids: Dict[str, List[str]]):
+        for doc_ids in existing_doc_ids.values():
+            self.removed_doc_ids.extend(doc_ids)
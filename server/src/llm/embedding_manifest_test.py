@@ -0,0 +1,81 @@
+import io
+import os
+import pytest
+from database.database_manager import DatabaseManager
+from llm.assets import create_or_update_embeddings, load_embeddings
+from llm.ingestion_utils import iter_documents
+from llm.embedding_batcher_test import LengthEmbeddings
+
+
+def _sources(vector_store):
+    return sorted(document.metadata["source"] + ":" + document.page_content for document in vector_store.docstore._dict.values())
+
+
+def describe_create_or_update_embeddings():
+    @pytest.fixture
+    def database_manager(tmp_path, monkeypatch):
+        monkeypatch.setattr("database.database_manager.get_assets_path", lambda: str(tmp_path))
+        monkeypatch.setattr("llm.assets.get_embeddings_asset_path", lambda: str(tmp_path))
+        monkeypatch.setenv("SQLITE_FILE_NAME", "test.db")
+        monkeypatch.setenv("VECTOR_STORE_PROVIDER", "faiss")
+        monkeypatch.setenv("EMBEDDING_CHUNK_SIZE", "10")
+        monkeypatch.setenv("EMBEDDING_CHUNK_OVERLAP", "0")
+        monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+        return DatabaseManager()
+
+    def _update(database_manager, asset_id, file_dict, remove_sources=[]):
+        llm = LengthEmbeddings()
+        response = create_or_update_embeddings(asset_id, "test", "aif://model/a", llm, iter_documents(file_dict), database_manager, remove_sources=remove_sources)
+        return response, llm
+
+    def test_embeds_only_changed_chunks(database_manager):
+        response, _ = _update(database_manager, None, {
+            # One chunk per line
+            "a.txt": io.BytesIO(b"alpha123\nbeta1234\ngamma123"),
+            "b.txt": io.BytesIO(b"delta123"),
+        })
+        assert response.added_chunks == 4
+
+        response, llm = _update(database_manager, response.asset_id, { "a.txt": io.BytesIO(b"alpha123\nepsilon1\ngamma123") })
+        assert (response.added_chunks, response.removed_chunks, response.unchanged_chunks) == (1, 1, 2)
+        assert llm.calls == [["epsilon1"]]
+
+        vector_store = load_embeddings(response.asset_id, LengthEmbeddings(), None, database_manager, use_cache=False)
+        assert _sources(vector_store) == ["a.txt:alpha123", "a.txt:epsilon1", "a.txt:gamma123", "b.txt:delta123"]
+
+    def test_reupload_adds_nothing(database_manager):
+        response, _ = _update(database_manager, None, { "a.txt": io.BytesIO(b"alpha beta") })
+        response, llm = _update(database_manager, response.asset_id, { "a.txt": io.BytesIO(b"alpha beta") })
+        assert (response.added_chunks, response.removed_chunks, response.unchanged_chunks) == (0, 0, 1)
+        assert llm.calls == []
+
+    def test_removes_sources(database_manager):
+        response, _ = _update(database_manager, None, {
+            "a.txt": io.BytesIO(b"alpha"),
+            "b.txt": io.BytesIO(b"beta"),
+        })
+        response = create_or_update_embeddings(response.asset_id, "test", "aif://model/a", LengthEmbeddings(), None, database_manager, remove_sources=["a.txt"])
+        assert response.removed_chunks == 1
+
+        vector_store = load_embeddings(response.asset_id, LengthEmbeddings(), None, database_manager, use_cache=False)
+        assert _sources(vector_store) == ["b.txt:beta"]
+        assert database_manager.list_embedding_chunks(response.asset_id, ["a.txt"]) == []
+
+    def test_failed_save_changes_nothing(database_manager, tmp_path, monkeypatch):
+        response, _ = _update(database_manager, None, { "a.txt": io.BytesIO(b"alpha") })
+        asset_id = response.asset_id
+
+        def fail(*args):
+            raise OSError("disk full")
+        monkeypatch.setattr("llm.assets._replace_faiss_files", fail)
+        with pytest.raises(OSError):
+            _update(database_manager, asset_id, { "a.txt": io.BytesIO(b"beta") })
+        with pytest.raises(OSError):
+            _update(database_manager, None, { "b.txt": io.BytesIO(b"gamma") })
+
+        # The index and the manifest still match, and there is no other asset
+        vector_store = load_embeddings(asset_id, LengthEmbeddings(), None, database_manager, use_cache=False)
+        assert _sources(vector_store) == ["a.txt:alpha"]
+        assert [chunk.doc_id for chunk in database_manager.list_embedding_chunks(asset_id, ["a.txt"])] == list(vector_store.index_to_docstore_id.values())
+        assert [embedding.id for embedding in database_manager.list_embeddings_metadata()] == [asset_id]
+        assert sorted(file_name for file_name in os.listdir(tmp_path) if not file_name.startswith("test.db")) == [f"{asset_id}.faiss", f"{asset_id}.pkl"]
@@ -0,0 +1,140 @@
+import os, sys, hashlib, importlib.util, threading
+from typing import Callable, Dict, List, Tuple
+from fastapi import HTTPException
+from database.database_manager import DatabaseManager
+from llm.llm_tools_utils import TOOLS_ATTRIBUTE, create_tools
+from llm.function_sandbox import FunctionSandbox, is_function_sandbox_enabled
+from utils.assets_utils import get_functions_asset_path
+
+
+class _LocalFunctionEntry:
+    def __init__(self, func: Callable, file_path: str, mtime: float, file_hash: str):
+        self.func = func
+        self.file_path = file_path
+        self.mtime = mtime
+        self.file_hash = file_hash
+
+
+class FunctionRegistry:
+    """
+    Load each local function module once and keep the callable together with its tool schema.
+    The module is reloaded only when the content of the file changes, the entry is evicted when the function is deleted.
+    With `FUNCTION_SANDBOX_ENABLED`, the returned functions are async and run in the worker processes of the sandbox.
+    """
+    def __init__(self, database_manager: DatabaseManager):
+        self.database_manager = database_manager
+        self._entries: Dict[str, _LocalFunctionEntry] = {}     # Key: function asset id
+        self._lock = threading.Lock()
+        self._sandbox = FunctionSandbox() if is_function_sandbox_enabled() else None
+
+    def get_function(self, function_asset_id: str) -> Callable:
+        entry = self._entries.get(function_asset_id)
+        if entry is not None:
+            entry = self._refresh(function_asset_id, entry)
+            if entry is not None:
+                return entry.func
+
+        function_metadata = self.database_manager.get_function(function_asset_id)
+        if function_metadata is None:
+            raise HTTPException(status_code=404, detail="Function not found")
+
+        function_file_path = os.path.join(get_functions_asset_path(), function_metadata.functions_path, function_metadata.functions_name + ".py")
+        entry = self._load(function_file_path, function_metadata.functions_name)
+        with self._lock:
+            self._entries[function_asset_id] = entry
+        return entry.func
+
+    async def start(self):
+        if self._sandbox is not None:
+            self._update_preload_functions()
+            await self._sandbox.start()
+
+    def invalidate(self, function_asset_id: str):
+        with self._lock:
+            self._entries.pop(function_asset_id, None)
+        self._update_preload_functions()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def shutdown(self):
+        if self._sandbox is not None:
+            self._sandbox.shutdown()
+
+    def _update_preload_functions(self):
+        """
+        Preload all the local functions with a file in the workers started from now on
+        """
+        if self._sandbox is None:
+            return
+
+        preload_functions: List[Tuple[str, str]] = []
+        for function_metadata in self.database_manager.list_functions():
+            if function_metadata.functions_path is None or function_metadata.functions_name is None:
+                continue
+            function_file_path = os.path.join(get_functions_asset_path(), function_metadata.functions_path, function_metadata.functions_name + ".py")
+            if os.path.exists(function_file_path):
+                preload_functions.append((function_file_path, function_metadata.functions_name))
+        self._sandbox.set_preload_functions(preload_functions)
+
+    def _refresh(self, function_asset_id: str, entry: _LocalFunctionEntry) -> _LocalFunctionEntry | None:
+        """
+        Return the entry if it's still valid, or the reloaded entry if the file changed, or None if the file is gone
+        """
+        try:
+            mtime = os.path.getmtime(entry.file_path)
+        except OSError:
+            self.invalidate(function_asset_id)
+            return None
+
+        if mtime == entry.mtime:
+            return entry
+
+        # The file was touched, only reload it when the content changed
+        if _get_file_hash(entry.file_path) == entry.file_hash:
+            entry.mtime = mtime
+            return entry
+
+        new_entry = self._load(entry.file_path, entry.func.__name__)
+        with self._lock:
+            self._entries[function_asset_id] = new_entry
+        return new_entry
+
+    def _load(self, function_file_path: str, functions_name: str) -> _LocalFunctionEntry:
+        if not os.path.exists(function_file_path):
+            raise HTTPException(status_code=404, detail="Function file not found")
+
+        mtime = os.path.getmtime(function_file_path)
+        file_hash = _get_file_hash(function_file_path)
+
+        if self._sandbox is not None:
+            # The module is only imported by the workers of the sandbox, they also create the tools
+            func_callable, tools = self._sandbox.load(function_file_path, functions_name, file_hash)
+            # The function may have been created after the workers started
+            self._update_preload_functions()
+        else:
+            # Allow the function to import the modules next to it
+            function_folder = os.path.dirname(function_file_path)
+            if function_folder not in sys.path:
+                sys.path.append(function_folder)
+
+            module_spec = importlib.util.spec_from_file_location(functions_name, function_file_path)
+            module = importlib.util.module_from_spec(module_spec)
+            module_spec.loader.exec_module(module)
+            func_callable = getattr(module, functions_name)
+            tools = create_tools(func_callable)
+        # create_tool uses them instead of parsing the docstring for every request
+        setattr(func_callable, TOOLS_ATTRIBUTE, tools)
+
+        return _LocalFunctionEntry(
+            func=func_callable,
+            file_path=function_file_path,
+            mtime=mtime,
+            file_hash=file_hash,
+        )
+
+
+def _get_file_hash(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
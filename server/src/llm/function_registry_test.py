@@ -0,0 +1,105 @@
+import os
+import asyncio
+import pytest
+from unittest import mock
+from aif_types.functions import FunctionEntity
+from llm.function_registry import FunctionRegistry
+from llm.llm_tools_utils import create_tool
+
+
+FUNCTION_TEMPLATE = '''def get_answer(question: str) -> str:
+    """
+    Answer the question
+
+    :param question: The question
+    :type question: str
+    """
+    return "{}"
+'''
+
+
+def describe_function_registry():
+    @pytest.fixture
+    def registry(tmp_path, monkeypatch):
+        monkeypatch.setattr("llm.function_registry.get_functions_asset_path", lambda: str(tmp_path))
+        os.makedirs(tmp_path / "folder1")
+        _write_function(tmp_path, "answer-1", 1000)
+
+        function_metadata = FunctionEntity(
+            id="func-1",
+            uri="aif://function/local/folder1/get_answer",
+            functions_path="folder1",
+            functions_name="get_answer",
+        )
+        database_manager = mock.MagicMock()
+        database_manager.get_function.return_value = function_metadata
+        database_manager.list_functions.return_value = [function_metadata]
+        return FunctionRegistry(database_manager)
+
+    def test_loads_function_once(registry, tmp_path):
+        func = registry.get_function("func-1")
+        assert func("question") == "answer-1"
+        assert registry.get_function("func-1") is func
+        registry.database_manager.get_function.assert_called_once()
+
+    def test_reloads_when_file_changes(registry, tmp_path):
+        func = registry.get_function("func-1")
+        _write_function(tmp_path, "answer-2", 2000)
+        new_func = registry.get_function("func-1")
+        assert new_func is not func
+        assert new_func("question") == "answer-2"
+
+    def test_keeps_function_when_only_mtime_changes(registry, tmp_path):
+        func = registry.get_function("func-1")
+        os.utime(tmp_path / "folder1" / "get_answer.py", (2000, 2000))
+        assert registry.get_function("func-1") is func
+
+    def test_invalidate(registry):
+        func = registry.get_function("func-1")
+        registry.invalidate("func-1")
+        assert registry.get_function("func-1") is not func
+        assert registry.database_manager.get_function.call_count == 2
+
+    def test_function_carries_its_tools(registry):
+        func = registry.get_function("func-1")
+        tool = create_tool(func)
+        assert tool["name"] == "get_answer"
+        assert tool["parameters"]["required"] == ["question"]
+        assert "question" in create_tool(func, "input_schema")["input_schema"]["properties"]
+
+        # The callers get a copy
+        tool["name"] = "changed"
+        assert create_tool(func)["name"] == "get_answer"
+
+    def test_sandboxed_function(registry, monkeypatch):
+        monkeypatch.setenv("FUNCTION_SANDBOX_ENABLED", "true")
+        monkeypatch.setenv("FUNCTION_SANDBOX_WORKERS", "1")
+        sandboxed_registry = FunctionRegistry(registry.database_manager)
+        try:
+            func = sandboxed_registry.get_function("func-1")
+            assert create_tool(func)["name"] == "get_answer"
+            assert asyncio.run(func(question="question")) == "answer-1"
+        finally:
+            sandboxed_registry.shutdown()
+
+    def test_sandbox_preloads_the_functions_of_the_database(registry, tmp_path, monkeypatch):
+        monkeypatch.setenv("FUNCTION_SANDBOX_ENABLED", "true")
+        monkeypatch.setenv("FUNCTION_SANDBOX_WORKERS", "1")
+        sandboxed_registry = FunctionRegistry(registry.database_manager)
+        try:
+            # None of the functions was loaded yet
+            asyncio.run(sandboxed_registry.start())
+            assert sandboxed_registry._sandbox._preload_functions == [(str(tmp_path / "folder1" / "get_answer.py"), "get_answer")]
+
+            os.remove(tmp_path / "folder1" / "get_answer.py")
+            sandboxed_registry.invalidate("func-1")
+            assert sandboxed_registry._sandbox._preload_functions == []
+        finally:
+            sandboxed_registry.shutdown()
+
+
+def _write_function(tmp_path, answer: str, mtime: int):
+    file_path = tmp_path / "folder1" / "get_answer.py"
+    with open(file_path, "w") as f:
+        f.write(FUNCTION_TEMPLATE.format(answer))
+    os.utime(file_path, (mtime, mtime))
@@ -0,0 +1,321 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import signal
+import asyncio
+import threading
+import importlib.util
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Tuple
+from fastapi import HTTPException
+from llm.llm_tools_utils import DEFAULT_FUNCTION_CALL_TIMEOUT_SECONDS, create_tools
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the functions run without the limits
+    resource = None
+
+
+DEFAULT_FUNCTION_SANDBOX_WORKERS = 2
+DEFAULT_FUNCTION_SANDBOX_MAX_TASKS_PER_CHILD = 100
+DEFAULT_FUNCTION_SANDBOX_CPU_SECONDS = 30
+DEFAULT_FUNCTION_SANDBOX_MEMORY_MB = 2048
+# Time left to a worker after its wall clock limit before it's killed
+KILL_GRACE_SECONDS = 1
+
+
+def is_function_sandbox_enabled() -> bool:
+    return os.environ.get("FUNCTION_SANDBOX_ENABLED", "").lower() in ["1", "true", "yes"]
+
+
+class FunctionSandboxCpuLimitError(Exception):
+    pass
+
+
+class FunctionSandboxTimeoutError(Exception):
+    pass
+
+
+class FunctionSandbox:
+    """
+    Run the local functions in a pool of worker processes instead of the server process.
+    The workers import the function modules when they start and keep them, so a call doesn't pay for the interpreter
+    startup or the import. Each call is limited by `FUNCTION_SANDBOX_CPU_SECONDS` of CPU time and
+    `FUNCTION_SANDBOX_MEMORY_MB` of address space (0 disables a limit) and `FUNCTION_CALL_TIMEOUT_SECONDS` of wall
+    clock time, a worker which doesn't stop at the time limit is killed. A worker is replaced after
+    `FUNCTION_SANDBOX_MAX_TASKS_PER_CHILD` calls. A crashed worker only fails its own call, the pool is recreated.
+    """
+    def __init__(self, preload_functions: List[Tuple[str, str]] = []):
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        # The workers read the functions to preload from the file when they start, so the replaced workers import the
+        # functions added since the pool was created
+        preload_file, self._preload_file_path = tempfile.mkstemp(prefix="aif-function-sandbox-", suffix=".json")
+        os.close(preload_file)
+        self.set_preload_functions(preload_functions)
+
+    def set_preload_functions(self, preload_functions: List[Tuple[str, str]]):
+        """
+        Set the (function file path, function name) imported by the workers started from now on
+        """
+        with self._lock:
+            self._preload_functions = list(preload_functions)
+            self._write_preload_file()
+
+    async def start(self):
+        """
+        Start the worker processes, so the first calls don't wait for the interpreter startup
+        """
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        try:
+            # The pool starts a worker for each submitted task until it has max_workers
+            await asyncio.gather(*[loop.run_in_executor(executor, _warm_worker) for _ in range(_get_env_int("FUNCTION_SANDBOX_WORKERS", DEFAULT_FUNCTION_SANDBOX_WORKERS))])
+        except BrokenProcessPool as e:
+            self._reset(executor)
+            print(f"Failed to start the function sandbox: {e}")
+
+    def load(self, function_file_path: str, functions_name: str, file_hash: str) -> Tuple[Callable, Dict[str, dict]]:
+        """
+        Import the function in a worker instead of the server process.
+        Returns an async function with the name and docstring of the function, which runs it in the sandbox, and its tools
+        """
+        executor = self._get_executor()
+        timeout_seconds = _get_timeout_seconds()
+        try:
+            doc, tools = executor.submit(_describe_function, function_file_path, functions_name, file_hash, timeout_seconds).result(timeout=timeout_seconds + KILL_GRACE_SECONDS)
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise HTTPException(status_code=500, detail=f"Function {functions_name} crashed")
+        except FutureTimeoutError:
+            self._kill(executor)
+            raise HTTPException(status_code=504, detail=f"Function {functions_name} timed out while loading")
+        except FunctionSandboxTimeoutError:
+            raise HTTPException(status_code=504, detail=f"Function {functions_name} timed out while loading")
+
+        async def sandboxed_func(**kwargs):
+            return await self.call(function_file_path, functions_name, file_hash, kwargs)
+        sandboxed_func.__name__ = functions_name
+        sandboxed_func.__qualname__ = functions_name
+        sandboxed_func.__doc__ = doc
+        return sandboxed_func, tools
+
+    async def call(self, function_file_path: str, functions_name: str, file_hash: str, arg_dict: Dict[str, Any]) -> Any:
+        executor = self._get_executor()
+        timeout_seconds = _get_timeout_seconds()
+        future = executor.submit(
+            _run_function,
+            function_file_path,
+            functions_name,
+            file_hash,
+            arg_dict,
+            _get_env_int("FUNCTION_SANDBOX_CPU_SECONDS", DEFAULT_FUNCTION_SANDBOX_CPU_SECONDS),
+            _get_env_int("FUNCTION_SANDBOX_MEMORY_MB", DEFAULT_FUNCTION_SANDBOX_MEMORY_MB),
+            timeout_seconds,
+        )
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # The caller stopped waiting, e.g. at its own timeout, the worker is killed if it's still busy with the call
+            # after the time limit, so it doesn't hold the pool
+            self._kill_when_stuck(executor, future, timeout_seconds + KILL_GRACE_SECONDS)
+            raise
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise HTTPException(status_code=500, detail=f"Function {functions_name} crashed")
+        except FunctionSandboxTimeoutError:
+            raise HTTPException(status_code=504, detail=f"Function {functions_name} timed out")
+        except FunctionSandboxCpuLimitError:
+            raise HTTPException(status_code=504, detail=f"Function {functions_name} exceeded the CPU time limit")
+        except MemoryError:
+            raise HTTPException(status_code=507, detail=f"Function {functions_name} exceeded the memory limit")
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if os.path.exists(self._preload_file_path):
+                os.remove(self._preload_file_path)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Recreated if the sandbox was shut down
+                if not os.path.exists(self._preload_file_path):
+                    self._write_preload_file()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=_get_env_int("FUNCTION_SANDBOX_WORKERS", DEFAULT_FUNCTION_SANDBOX_WORKERS),
+                    # "fork" is not compatible with max_tasks_per_child and not safe with the threads of the server
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self._preload_file_path, _get_timeout_seconds()),
+                    max_tasks_per_child=_get_env_int("FUNCTION_SANDBOX_MAX_TASKS_PER_CHILD", DEFAULT_FUNCTION_SANDBOX_MAX_TASKS_PER_CHILD),
+                )
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            # Another call may have replaced the broken pool already
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _kill(self, executor: ProcessPoolExecutor):
+        """
+        Kill the workers of the pool, the calls running in them fail as crashed
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # ProcessPoolExecutor has no API to stop a running task. The pool is broken by the killed workers, its pending
+        # calls fail as crashed instead of cancelled
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False)
+
+    def _kill_when_stuck(self, executor: ProcessPoolExecutor, future: Future, delay_seconds: float):
+        if future.cancel():
+            return
+
+        def kill_when_stuck():
+            if not future.done():
+                print(f"Killing the function sandbox workers, a call is still running after {delay_seconds}s")
+                self._kill(executor)
+        timer = threading.Timer(delay_seconds, kill_when_stuck)
+        timer.daemon = True
+        timer.start()
+
+    def _write_preload_file(self):
+        temp_file_path = self._preload_file_path + ".tmp"
+        with open(temp_file_path, "w") as f:
+            json.dump(self._preload_functions, f)
+        # A starting worker never reads a partial file
+        os.replace(temp_file_path, self._preload_file_path)
+
+
+# Functions running in the worker processes
+
+# Key: function file path; Value: (file hash, function)
+_worker_functions: Dict[str, Tuple[str, Callable]] = {}
+
+
+def _init_worker(preload_file_path: str, timeout_seconds: float):
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _raise_cpu_limit_error)
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _raise_timeout_error)
+
+    try:
+        with open(preload_file_path) as f:
+            preload_functions = json.load(f)
+    except Exception as e:
+        print(f"Failed to read the functions to preload: {e}")
+        preload_functions = []
+
+    for function_file_path, functions_name in preload_functions:
+        try:
+            with _wall_clock_limit(timeout_seconds):
+                _load_function(function_file_path, functions_name)
+        except Exception as e:
+            # It'll be reported when the function is called
+            print(f"Failed to preload function {functions_name}: {e}")
+
+
+def _warm_worker():
+    pass
+
+
+def _describe_function(function_file_path: str, functions_name: str, file_hash: str, timeout_seconds: float) -> Tuple[str | None, Dict[str, dict]]:
+    with _wall_clock_limit(timeout_seconds):
+        func = _get_function(function_file_path, functions_name, file_hash)
+    return func.__doc__, create_tools(func)
+
+
+def _run_function(function_file_path: str, functions_name: str, file_hash: str, arg_dict: Dict[str, Any], cpu_seconds: int, memory_mb: int, timeout_seconds: float) -> Any:
+    # The sleeping or blocked calls don't use CPU time, they're stopped by the wall clock limit
+    with _wall_clock_limit(timeout_seconds):
+        return _run_function_with_limits(function_file_path, functions_name, file_hash, arg_dict, cpu_seconds, memory_mb)
+
+
+def _run_function_with_limits(function_file_path: str, functions_name: str, file_hash: str, arg_dict: Dict[str, Any], cpu_seconds: int, memory_mb: int) -> Any:
+    func = _get_function(function_file_path, functions_name, file_hash)
+
+    if resource is None:
+        return func(**arg_dict)
+
+    cpu_limit = resource.getrlimit(resource.RLIMIT_CPU)
+    memory_limit = resource.getrlimit(resource.RLIMIT_AS)
+    try:
+        if cpu_seconds > 0:
+            # RLIMIT_CPU counts the whole life of the process, the limit of this call starts from the time used so far
+            used_seconds = int(sum(resource.getrusage(resource.RUSAGE_SELF)[:2])) + 1
+            resource.setrlimit(resource.RLIMIT_CPU, (used_seconds + cpu_seconds, cpu_limit[1]))
+        if memory_mb > 0:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024, memory_limit[1]))
+        return func(**arg_dict)
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, cpu_limit)
+        resource.setrlimit(resource.RLIMIT_AS, memory_limit)
+
+
+@contextmanager
+def _wall_clock_limit(timeout_seconds: float):
+    if timeout_seconds <= 0 or not hasattr(signal, "setitimer"):
+        yield
+        return
+
+    signal.setitimer(signal.ITIMER_REAL, timeout_seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _get_function(function_file_path: str, functions_name: str, file_hash: str) -> Callable:
+    cached = _worker_functions.get(function_file_path)
+    return cached[1] if cached is not None and cached[0] == file_hash else _load_function(function_file_path, functions_name)
+
+
+def _load_function(function_file_path: str, functions_name: str) -> Callable:
+    # Allow the function to import the modules next to it
+    function_folder = os.path.dirname(function_file_path)
+    if function_folder not in sys.path:
+        sys.path.append(function_folder)
+
+    file_hash = _get_file_hash(function_file_path)
+    module_spec = importlib.util.spec_from_file_location(functions_name, function_file_path)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    func = getattr(module, functions_name)
+    _worker_functions[function_file_path] = (file_hash, func)
+    return func
+
+
+def _get_file_hash(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _raise_cpu_limit_error(signum, frame):
+    raise FunctionSandboxCpuLimitError()
+
+
+def _raise_timeout_error(signum, frame):
+    raise FunctionSandboxTimeoutError()
+
+
+def _get_env_int(envVarName: str, default: int) -> int:
+    value = os.environ.get(envVarName)
+    return int(value) if value else default
+
+
+def _get_timeout_seconds() -> float:
+    timeout_seconds = os.environ.get("FUNCTION_CALL_TIMEOUT_SECONDS")
+    return float(timeout_seconds) if timeout_seconds else DEFAULT_FUNCTION_CALL_TIMEOUT_SECONDS
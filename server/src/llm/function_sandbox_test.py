@@ -0,0 +1,129 @@
+import os
+import time
+import asyncio
+import pytest
+from fastapi import HTTPException
+from llm.function_sandbox import KILL_GRACE_SECONDS, FunctionSandbox, _get_file_hash, _worker_functions
+
+
+FUNCTION_SOURCE = '''import os
+import time
+import signal
+import inspect
+
+# Whether the module was imported by the initializer of the worker, before any call
+PRELOADED = "_init_worker" in [frame.function for frame in inspect.stack()]
+
+def get_pid(mode: str = "pid"):
+    """
+    Get the process id of the worker
+
+    :param mode: "pid", "preloaded", "spin", "sleep", "hang" or "crash"
+    :type mode: str
+    """
+    if mode == "preloaded":
+        return PRELOADED
+    if mode == "spin":
+        while True:
+            pass
+    if mode == "sleep":
+        time.sleep(60)
+    if mode == "hang":
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)
+        time.sleep(60)
+    if mode == "crash":
+        os._exit(1)
+    return str(os.getpid())
+'''
+
+
+def describe_function_sandbox():
+    @pytest.fixture
+    def function_file_path(tmp_path, monkeypatch):
+        monkeypatch.setenv("FUNCTION_SANDBOX_WORKERS", "1")
+        monkeypatch.setenv("FUNCTION_SANDBOX_CPU_SECONDS", "1")
+        function_file_path = str(tmp_path / "get_pid.py")
+        with open(function_file_path, "w") as f:
+            f.write(FUNCTION_SOURCE)
+        return function_file_path
+
+    @pytest.fixture
+    def sandbox(function_file_path):
+        sandbox = FunctionSandbox([(function_file_path, "get_pid")])
+        yield sandbox
+        sandbox.shutdown()
+
+    @pytest.fixture
+    def sandbox_func(sandbox, function_file_path):
+        func, _ = sandbox.load(function_file_path, "get_pid", _get_file_hash(function_file_path))
+        return func
+
+    def test_loads_the_function_in_a_worker(sandbox, function_file_path):
+        func, tools = sandbox.load(function_file_path, "get_pid", _get_file_hash(function_file_path))
+        assert tools["parameters"]["name"] == "get_pid"
+        assert "mode" in tools["input_schema"]["input_schema"]["properties"]
+        # The server process doesn't import the module
+        assert function_file_path not in _worker_functions
+
+    def test_start_warms_the_workers(sandbox):
+        asyncio.run(sandbox.start())
+        assert len(sandbox._executor._processes) == 1
+
+    def test_runs_in_a_reused_worker_process(sandbox_func):
+        async def run():
+            return [await sandbox_func(mode="pid") for _ in range(2)]
+
+        pids = asyncio.run(run())
+        assert pids[0] != str(os.getpid())
+        assert pids[0] == pids[1]
+        assert sandbox_func.__name__ == "get_pid"
+        assert "process id" in sandbox_func.__doc__
+
+    def test_cpu_limit(sandbox_func):
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(sandbox_func(mode="spin"))
+        assert e.value.status_code == 504
+
+    def test_recovers_from_a_crashed_worker(sandbox_func):
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(sandbox_func(mode="crash"))
+        assert e.value.status_code == 500
+        assert asyncio.run(sandbox_func(mode="pid")) != str(os.getpid())
+
+    def test_wall_clock_limit(sandbox_func, monkeypatch):
+        monkeypatch.setenv("FUNCTION_CALL_TIMEOUT_SECONDS", "1")
+        # A sleeping function doesn't reach the CPU time limit
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(sandbox_func(mode="sleep"))
+        assert e.value.status_code == 504
+        assert asyncio.run(sandbox_func(mode="pid")) != str(os.getpid())
+
+    def test_kills_a_worker_which_ignores_the_wall_clock_limit(sandbox, sandbox_func, monkeypatch):
+        monkeypatch.setenv("FUNCTION_CALL_TIMEOUT_SECONDS", "1")
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(asyncio.wait_for(sandbox_func(mode="hang"), 1))
+        # The worker is killed after the time limit and the grace time, the pool is recreated
+        time.sleep(1 + KILL_GRACE_SECONDS + 1)
+        assert asyncio.run(asyncio.wait_for(sandbox_func(mode="pid"), 10)) != str(os.getpid())
+
+    def test_load_timeout(sandbox, function_file_path, monkeypatch):
+        monkeypatch.setenv("FUNCTION_CALL_TIMEOUT_SECONDS", "1")
+        with open(function_file_path, "a") as f:
+            f.write("time.sleep(60)\n")
+        with pytest.raises(HTTPException) as e:
+            sandbox.load(function_file_path, "get_pid", _get_file_hash(function_file_path))
+        assert e.value.status_code == 504
+
+    def test_recycled_workers_preload_the_functions_added_later(function_file_path, monkeypatch):
+        monkeypatch.setenv("FUNCTION_SANDBOX_MAX_TASKS_PER_CHILD", "1")
+        sandbox = FunctionSandbox()
+        try:
+            # The pool is created before the function
+            asyncio.run(sandbox.start())
+            sandbox.set_preload_functions([(function_file_path, "get_pid")])
+            file_hash = _get_file_hash(function_file_path)
+            # The worker of this call may have started before the function was added, the next one starts after
+            asyncio.run(sandbox.call(function_file_path, "get_pid", file_hash, { "mode": "pid" }))
+            assert asyncio.run(sandbox.call(function_file_path, "get_pid", file_hash, { "mode": "preloaded" })) is True
+        finally:
+            sandbox.shutdown()
@@ -22,6 +22,20 @@ class ILmProvider(metaclass=ABCMeta):
         """
         pass
 
+    @abstractmethod
+    def getKeyPrefix(self) -> str:
+        """
+        Get the prefix of the environment variables of the provider, e.g. "OPENAI_"
+        """
+        pass
+
+    @abstractmethod
+    def getWeight(self) -> int:
+        """
+        Get the weight of the provider, the traffic of the model aliases is distributed by weight
+        """
+        pass
+
     @abstractmethod
     def isHealthy(self) -> bool:
         """
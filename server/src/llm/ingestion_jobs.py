@@ -0,0 +1,263 @@
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Deque, Dict, List
+from fastapi import HTTPException
+from aif_types.embeddings import CreateOrUpdateEmbeddingsResponse, IngestionJobResponse, IngestionJobStatus
+
+
+DEFAULT_INGESTION_JOB_WORKERS = 2
+DEFAULT_INGESTION_JOB_MAX_FINISHED = 100
+# How long deleting an asset waits for its running job to stop
+CANCEL_WAIT_SECONDS = 30
+
+FINISHED_STATUSES = [IngestionJobStatus.SUCCEEDED, IngestionJobStatus.FAILED, IngestionJobStatus.CANCELLED]
+
+
+class IngestionJobCancelledError(Exception):
+    pass
+
+
+IngestionRun = Callable[[Dict[str, BinaryIO], Callable[[int], None]], CreateOrUpdateEmbeddingsResponse]
+
+
+class IngestionJob:
+    def __init__(self, id: str, asset_id: str | None, file_dict: Dict[str, BinaryIO], run: IngestionRun):
+        self.id = id
+        self.asset_id = asset_id
+        self.run = run
+        self.status = IngestionJobStatus.QUEUED
+        self.file_dict = { file_name: _ProgressFile(file, self) for file_name, file in file_dict.items() }
+        self.total_bytes = sum(_get_size(file) for file in file_dict.values())
+        self.bytes_read = 0
+        self.chunks_embedded = 0
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.result: CreateOrUpdateEmbeddingsResponse | None = None
+        self.error: str | None = None
+        self.cancel_event = threading.Event()
+        self.finished_event = threading.Event()
+        self.future: Future | None = None
+
+    def on_progress(self, chunks: int):
+        """
+        Called after each embedded batch, a cancelled job stops before the asset is saved
+        """
+        self.chunks_embedded += chunks
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise IngestionJobCancelledError()
+
+    def close_files(self):
+        for file in self.file_dict.values():
+            file.close()
+
+    def to_response(self) -> IngestionJobResponse:
+        chunks_per_second = None
+        eta_seconds = None
+        if self.started_at is not None:
+            elapsed_seconds = (self.finished_at if self.finished_at is not None else time.monotonic()) - self.started_at
+            if elapsed_seconds > 0:
+                chunks_per_second = self.chunks_embedded / elapsed_seconds
+            if self.status == IngestionJobStatus.RUNNING and self.bytes_read > 0:
+                # Assume the rest of the files is read at the same pace
+                eta_seconds = elapsed_seconds * (self.total_bytes - self.bytes_read) / self.bytes_read
+
+        return IngestionJobResponse(
+            job_id=self.id,
+            status=self.status,
+            asset_id=self.asset_id,
+            chunks_embedded=self.chunks_embedded,
+            bytes_read=self.bytes_read,
+            total_bytes=self.total_bytes,
+            progress=self.bytes_read / self.total_bytes if self.total_bytes > 0 else 0,
+            chunks_per_second=chunks_per_second,
+            eta_seconds=eta_seconds,
+            result=self.result,
+            error=self.error,
+        )
+
+
+class IngestionJobManager:
+    """
+    Run the embedding ingestions in a pool of `INGESTION_JOB_WORKERS` threads instead of the admin requests. The uploaded
+    files are copied into temporary files owned by the job, since the uploads are closed when the request ends. The
+    jobs of the same asset run one after the other, each of them updates the version saved by the previous one. The
+    latest `INGESTION_JOB_MAX_FINISHED` finished jobs are kept for their status.
+    """
+    def __init__(self):
+        self._jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        # Key: asset id; Value: the unfinished jobs of the asset, the first one is submitted to the executor
+        self._asset_jobs: Dict[str, Deque[IngestionJob]] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        file_dict: Dict[str, BinaryIO],
+        asset_id: str | None,
+        run: IngestionRun,
+    ) -> IngestionJobResponse:
+        """
+        run(file_dict, on_progress) ingests the files and calls on_progress with the number of chunks of each batch
+        """
+        job = IngestionJob(uuid.uuid4().hex, asset_id, _copy_to_temp_files(file_dict), run)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._remove_finished_jobs()
+            if asset_id is not None:
+                asset_jobs = self._asset_jobs.setdefault(asset_id, deque())
+                asset_jobs.append(job)
+                if len(asset_jobs) > 1:
+                    # Submitted once the previous job of the asset is finished
+                    return job.to_response()
+            job.future = self._get_executor().submit(self._run, job)
+        return job.to_response()
+
+    def get(self, job_id: str) -> IngestionJobResponse:
+        return self._get_job(job_id).to_response()
+
+    def list(self) -> List[IngestionJobResponse]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_response() for job in jobs]
+
+    def cancel(self, job_id: str) -> IngestionJobResponse:
+        job = self._get_job(job_id)
+        self._cancel(job)
+        return job.to_response()
+
+    def cancel_asset_jobs(self, asset_id: str):
+        """
+        Cancel the jobs of the asset and wait for the running one to stop, e.g. before the asset is deleted
+        """
+        with self._lock:
+            jobs = list(self._asset_jobs.get(asset_id, []))
+        for job in jobs:
+            self._cancel(job)
+        for job in jobs:
+            if not job.finished_event.wait(timeout=CANCEL_WAIT_SECONDS):
+                raise HTTPException(status_code=409, detail=f"Ingestion job {job.id} of the embedding is still running")
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_event.set()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _cancel(self, job: IngestionJob):
+        job.cancel_event.set()
+        with self._lock:
+            # Not submitted yet, or still queued in the executor
+            is_queued = job.status == IngestionJobStatus.QUEUED and (job.future is None or job.future.cancel())
+        if is_queued:
+            job.status = IngestionJobStatus.CANCELLED
+            self._finish(job)
+
+    def _run(self, job: IngestionJob):
+        job.status = IngestionJobStatus.RUNNING
+        job.started_at = time.monotonic()
+        try:
+            job.check_cancelled()
+            job.result = job.run(job.file_dict, job.on_progress)
+            job.asset_id = job.result.asset_id
+            job.status = IngestionJobStatus.SUCCEEDED
+        except IngestionJobCancelledError:
+            job.status = IngestionJobStatus.CANCELLED
+        except HTTPException as e:
+            job.error = e.detail
+            job.status = IngestionJobStatus.FAILED
+        except Exception as e:
+            job.error = str(e)
+            job.status = IngestionJobStatus.FAILED
+        finally:
+            self._finish(job)
+
+    def _finish(self, job: IngestionJob):
+        job.finished_at = time.monotonic()
+        job.close_files()
+        with self._lock:
+            asset_jobs = self._asset_jobs.get(job.asset_id)
+            if asset_jobs is not None and job in asset_jobs:
+                is_first = asset_jobs[0] is job
+                asset_jobs.remove(job)
+                if len(asset_jobs) == 0:
+                    del self._asset_jobs[job.asset_id]
+                elif is_first and self._executor is not None:
+                    asset_jobs[0].future = self._executor.submit(self._run, asset_jobs[0])
+        job.finished_event.set()
+
+    def _get_job(self, job_id: str) -> IngestionJob:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Ingestion job not found")
+        return job
+
+    def _remove_finished_jobs(self):
+        finished_job_ids = [job.id for job in self._jobs.values() if job.status in FINISHED_STATUSES]
+        max_finished = _get_env_int("INGESTION_JOB_MAX_FINISHED", DEFAULT_INGESTION_JOB_MAX_FINISHED)
+        for job_id in finished_job_ids[:max(len(finished_job_ids) - max_finished, 0)]:
+            del self._jobs[job_id]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=_get_env_int("INGESTION_JOB_WORKERS", DEFAULT_INGESTION_JOB_WORKERS),
+                thread_name_prefix="ingestion",
+            )
+        return self._executor
+
+
+class _ProgressFile:
+    """
+    Count the bytes read by the ingestion, and stop reading once the job is cancelled
+    """
+    def __init__(self, file: BinaryIO, job: IngestionJob):
+        self.file = file
+        self.job = job
+
+    def read(self, size: int = -1) -> bytes:
+        self.job.check_cancelled()
+        data = self.file.read(size)
+        self.job.bytes_read += len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _copy_to_temp_files(file_dict: Dict[str, BinaryIO]) -> Dict[str, BinaryIO]:
+    temp_file_dict = {}
+    try:
+        for file_name, file in file_dict.items():
+            temp_file = tempfile.TemporaryFile()
+            temp_file_dict[file_name] = temp_file
+            shutil.copyfileobj(file, temp_file)
+            temp_file.seek(0)
+    except Exception as e:
+        for temp_file in temp_file_dict.values():
+            temp_file.close()
+        raise e
+    return temp_file_dict
+
+
+def _get_size(file: BinaryIO) -> int:
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return size
+
+
+def _get_env_int(envVarName: str, default: int) -> int:
+    value = os.environ.get(envVarName)
+    return int(value) if value else default
@@ -0,0 +1,146 @@
+import io
+import time
+import threading
+import pytest
+from fastapi import HTTPException
+from aif_types.embeddings import CreateOrUpdateEmbeddingsResponse, IngestionJobStatus
+from llm.ingestion_jobs import IngestionJobManager
+
+
+def _wait_until_finished(job_manager: IngestionJobManager, job_id: str):
+    for _ in range(200):
+        job = job_manager.get(job_id)
+        if job.status not in [IngestionJobStatus.QUEUED, IngestionJobStatus.RUNNING]:
+            return job
+        time.sleep(0.01)
+    raise Exception("The job did not finish")
+
+
+def describe_ingestion_job_manager():
+    def test_runs_job_with_copied_files():
+        job_manager = IngestionJobManager()
+        upload = io.BytesIO(b"hello world")
+
+        def run(file_dict, on_progress):
+            content = file_dict["a.txt"].read()
+            on_progress(2)
+            return CreateOrUpdateEmbeddingsResponse(asset_id="asset", name=content.decode())
+
+        job = job_manager.submit({ "a.txt": upload }, None, run)
+        # The request may close its upload right away
+        upload.close()
+        assert job.total_bytes == 11
+
+        job = _wait_until_finished(job_manager, job.job_id)
+        assert job.status == IngestionJobStatus.SUCCEEDED
+        assert job.asset_id == "asset"
+        assert job.result.name == "hello world"
+        assert (job.chunks_embedded, job.bytes_read, job.progress) == (2, 11, 1)
+        assert job.chunks_per_second > 0
+        job_manager.shutdown()
+
+    def test_reports_failure():
+        job_manager = IngestionJobManager()
+
+        def run(file_dict, on_progress):
+            raise HTTPException(status_code=400, detail="No content to embed")
+
+        job = _wait_until_finished(job_manager, job_manager.submit({}, None, run).job_id)
+        assert job.status == IngestionJobStatus.FAILED
+        assert job.error == "No content to embed"
+        job_manager.shutdown()
+
+    def test_cancels_running_job():
+        job_manager = IngestionJobManager()
+        started = threading.Event()
+
+        def run(file_dict, on_progress):
+            started.set()
+            while True:
+                on_progress(1)
+                time.sleep(0.01)
+
+        job = job_manager.submit({}, "asset", run)
+        started.wait(timeout=5)
+        job_manager.cancel(job.job_id)
+        job = _wait_until_finished(job_manager, job.job_id)
+        assert job.status == IngestionJobStatus.CANCELLED
+        assert job.result is None
+        job_manager.shutdown()
+
+    def test_cancels_queued_job(monkeypatch):
+        monkeypatch.setenv("INGESTION_JOB_WORKERS", "1")
+        job_manager = IngestionJobManager()
+        release = threading.Event()
+
+        def run(file_dict, on_progress):
+            release.wait(timeout=5)
+            return CreateOrUpdateEmbeddingsResponse(asset_id="asset", name="a")
+
+        blocking_job = job_manager.submit({}, None, run)
+        queued_job = job_manager.submit({ "a.txt": io.BytesIO(b"a") }, None, lambda file_dict, on_progress: None)
+        assert job_manager.cancel(queued_job.job_id).status == IngestionJobStatus.CANCELLED
+
+        release.set()
+        _wait_until_finished(job_manager, blocking_job.job_id)
+        assert job_manager.get(queued_job.job_id).status == IngestionJobStatus.CANCELLED
+        job_manager.shutdown()
+
+    def test_runs_the_jobs_of_an_asset_one_after_the_other():
+        job_manager = IngestionJobManager()
+        release = threading.Event()
+        runs = []
+
+        def create_run(name):
+            def run(file_dict, on_progress):
+                runs.append(name)
+                if name == "first":
+                    release.wait(timeout=5)
+                return CreateOrUpdateEmbeddingsResponse(asset_id="asset", name=name)
+            return run
+
+        first_job = job_manager.submit({}, "asset", create_run("first"))
+        second_job = job_manager.submit({}, "asset", create_run("second"))
+        other_job = job_manager.submit({}, "other", create_run("other"))
+        # The other asset doesn't wait
+        assert _wait_until_finished(job_manager, other_job.job_id).status == IngestionJobStatus.SUCCEEDED
+        assert job_manager.get(second_job.job_id).status == IngestionJobStatus.QUEUED
+
+        release.set()
+        assert _wait_until_finished(job_manager, second_job.job_id).status == IngestionJobStatus.SUCCEEDED
+        assert job_manager.get(first_job.job_id).status == IngestionJobStatus.SUCCEEDED
+        assert runs == ["first", "other", "second"]
+        job_manager.shutdown()
+
+    def test_cancel_asset_jobs_waits_for_the_running_job():
+        job_manager = IngestionJobManager()
+        started = threading.Event()
+        finished = []
+
+        def run(file_dict, on_progress):
+            started.set()
+            try:
+                while True:
+                    on_progress(1)
+                    time.sleep(0.01)
+            finally:
+                finished.append(1)
+
+        running_job = job_manager.submit({}, "asset", run)
+        queued_job = job_manager.submit({}, "asset", run)
+        started.wait(timeout=5)
+
+        job_manager.cancel_asset_jobs("asset")
+        assert finished == [1]
+        assert job_manager.get(running_job.job_id).status == IngestionJobStatus.CANCELLED
+        assert job_manager.get(queued_job.job_id).status == IngestionJobStatus.CANCELLED
+
+        # The asset takes new jobs again
+        job = job_manager.submit({}, "asset", lambda file_dict, on_progress: CreateOrUpdateEmbeddingsResponse(asset_id="asset", name="a"))
+        assert _wait_until_finished(job_manager, job.job_id).status == IngestionJobStatus.SUCCEEDED
+        job_manager.shutdown()
+
+    def test_unknown_job():
+        with pytest.raises(HTTPException) as e:
+            IngestionJobManager().get("unknown")
+        assert e.value.status_code == 404
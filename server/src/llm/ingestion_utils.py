@@ -0,0 +1,98 @@
+import os
+import codecs
+import hashlib
+from typing import BinaryIO, Dict, Iterable, Iterator, List, TypeVar
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+DEFAULT_EMBEDDING_CHUNK_SIZE = 1000
+DEFAULT_EMBEDDING_CHUNK_OVERLAP = 200
+READ_BLOCK_SIZE = 1024 * 1024
+# The splitter runs on a window of this many chunks, the text from the last chunk on is carried over to the next window
+SPLIT_WINDOW_CHUNKS = 16
+
+T = TypeVar("T")
+
+
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=_get_env_int("EMBEDDING_CHUNK_SIZE", DEFAULT_EMBEDDING_CHUNK_SIZE),
+        chunk_overlap=_get_env_int("EMBEDDING_CHUNK_OVERLAP", DEFAULT_EMBEDDING_CHUNK_OVERLAP),
+    )
+
+
+def iter_text(file: BinaryIO, block_size: int = READ_BLOCK_SIZE) -> Iterator[str]:
+    """
+    Decode the file as UTF-8 block by block, a character split between two blocks is kept for the next one
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        block = file.read(block_size)
+        if not block:
+            break
+        text = decoder.decode(block)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def iter_file_documents(file_name: str, file: BinaryIO, text_splitter: RecursiveCharacterTextSplitter | None = None, block_size: int = READ_BLOCK_SIZE) -> Iterator[Document]:
+    """
+    Split the file into overlapping chunks without reading it into memory
+    """
+    text_splitter = text_splitter if text_splitter else get_text_splitter()
+    window_size = text_splitter._chunk_size * SPLIT_WINDOW_CHUNKS
+    chunk_index = 0
+
+    buffer = ""
+    for text in iter_text(file, block_size):
+        buffer += text
+        while len(buffer) >= window_size:
+            window = buffer[:window_size]
+            chunks = text_splitter.split_text(window)
+            # The last chunk may continue after the window, the raw text from its start is split again with the rest.
+            # The chunks are stripped, so the last one is found from the end of the window
+            tail_start = window.rfind(chunks[-1]) if len(chunks) > 0 else window_size
+            if tail_start == 0:
+                # A single chunk followed by whitespace only, nothing continues after the window
+                tail_start = window_size
+            elif tail_start < window_size:
+                chunks = chunks[:-1]
+
+            for chunk in chunks:
+                yield Document(page_content=chunk, metadata={ "source": file_name, "chunk": chunk_index })
+                chunk_index += 1
+            buffer = buffer[tail_start:]
+
+    for chunk in text_splitter.split_text(buffer):
+        yield Document(page_content=chunk, metadata={ "source": file_name, "chunk": chunk_index })
+        chunk_index += 1
+
+
+def iter_documents(file_dict: Dict[str, BinaryIO]) -> Iterator[Document]:
+    text_splitter = get_text_splitter()
+    for file_name, file in file_dict.items():
+        yield from iter_file_documents(file_name, file, text_splitter)
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def iter_batches(items: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+def _get_env_int(envVarName: str, default: int) -> int:
+    value = os.environ.get(envVarName)
+    return int(value) if value else default
@@ -0,0 +1,76 @@
+import io
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from llm.ingestion_utils import SPLIT_WINDOW_CHUNKS, iter_batches, iter_documents, iter_file_documents, iter_text
+
+
+def describe_iter_text():
+    def test_keeps_characters_split_between_blocks():
+        content = "héllo wörld ✓"
+        assert "".join(iter_text(io.BytesIO(content.encode("utf-8")), block_size=3)) == content
+
+    def test_replaces_invalid_bytes():
+        assert "".join(iter_text(io.BytesIO(b"a\xffb"))) == "a�b"
+
+
+def describe_iter_file_documents():
+    def test_splits_into_chunks():
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=20, chunk_overlap=0)
+        content = " ".join(f"word{i}" for i in range(200))
+        documents = list(iter_file_documents("a.txt", io.BytesIO(content.encode("utf-8")), text_splitter))
+
+        assert len(documents) > 1
+        assert all(len(document.page_content) <= 20 for document in documents)
+        assert " ".join(document.page_content for document in documents) == content
+        assert [document.metadata["chunk"] for document in documents] == list(range(len(documents)))
+        assert all(document.metadata["source"] == "a.txt" for document in documents)
+
+    def test_carries_the_raw_text_over_the_blocks():
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=20, chunk_overlap=5)
+        content = "\n".join(" ".join(f"word{i}-{j}" for j in range(i % 7)) for i in range(2000))
+        documents = list(iter_file_documents("a.txt", io.BytesIO(content.encode("utf-8")), text_splitter, block_size=777))
+
+        # No word is glued to the next one or cut at the end of a block
+        words = set(content.split())
+        assert all(word in words for document in documents for word in document.page_content.split())
+        assert all(len(document.page_content) <= 20 for document in documents)
+        assert [document.metadata["chunk"] for document in documents] == list(range(len(documents)))
+
+    def test_splits_a_large_block_by_window():
+        split_lengths = []
+
+        class RecordingTextSplitter(RecursiveCharacterTextSplitter):
+            def split_text(self, text):
+                split_lengths.append(len(text))
+                return super().split_text(text)
+
+        text_splitter = RecordingTextSplitter(chunk_size=20, chunk_overlap=0)
+        content = " ".join(f"word{i}" for i in range(2000))
+        documents = list(iter_file_documents("a.txt", io.BytesIO(content.encode("utf-8")), text_splitter))
+
+        assert " ".join(document.page_content for document in documents) == content
+        assert max(split_lengths) <= 20 * SPLIT_WINDOW_CHUNKS
+
+    def test_empty_file():
+        assert list(iter_file_documents("a.txt", io.BytesIO(b""))) == []
+
+    def test_is_lazy():
+        class InfiniteFile:
+            def read(self, size: int) -> bytes:
+                return b"word " * (size // 5)
+
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=20, chunk_overlap=0)
+        documents = iter_file_documents("a.txt", InfiniteFile(), text_splitter)
+        assert next(documents).page_content.startswith("word")
+
+
+def describe_iter_documents():
+    def test_sources():
+        file_dict = { "a.txt": io.BytesIO(b"alpha"), "b.txt": io.BytesIO(b"beta") }
+        documents = list(iter_documents(file_dict))
+        assert [(document.metadata["source"], document.page_content) for document in documents] == [("a.txt", "alpha"), ("b.txt", "beta")]
+
+
+def describe_iter_batches():
+    def test_batches():
+        assert list(iter_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+        assert list(iter_batches([], 2)) == []
@@ -1,26 +1,47 @@
+import re
+import time
 import uuid
-from typing import Dict, List, Callable, AsyncIterable
+import asyncio
+from typing import BinaryIO, Dict, List, Callable, AsyncIterable
 from dotenv import load_dotenv
 from pydantic.v1.error_wrappers import ValidationError as PydanticV1ValidationError
 from fastapi import HTTPException
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.runnables import RunnablePassthrough
+from langchain_core.messages import BaseMessageChunk
+from langchain_core.prompt_values import PromptValue
 
 from llm.assets import create_or_update_embeddings, load_embeddings, delete_embedding
+from llm.ingestion_utils import iter_documents
+from llm.ingestion_jobs import IngestionJobManager
+from llm.vector_store_cache import vectorStoreCache
 from aif_types.llm import LlmProvider, LlmFeature
-from aif_types.chat import ChatHistoryEntity, ChatRole
+from aif_types.chat import ChatHistoryEntity, ChatHistoryMessage, ChatRole
 # from aif_types.chat import ChatRequest, ChatHistoryEntity, ChatRole
 from aif_types.agents import CreateAgentRequest, CreateOrUpdateAgentResponse, AgentEntity, ListAgentsResponse, UpdateAgentRequest
 from aif_types.embeddings import CreateEmbeddingsRequest, CreateOrUpdateEmbeddingsResponse, EmbeddingEntity, ListEmbeddingsResponse, UpdateEmbeddingMetadataRequest
+from aif_types.embeddings import IngestionJobResponse, ListIngestionJobsResponse
 from aif_types.languagemodels import ListLanguageModelsResponse, LanguageModelInfo, UpdateLmProviderRequest, ListLmProvidersResponse
+from aif_types.aliases import CreateModelAliasRequest, CreateOrUpdateModelAliasResponse, ListModelAliasesResponse, ModelAliasEntity, UpdateModelAliasRequest
 from aif_types.functions import AifFunctionType, ListFunctionsResponse, CreateFunctionRequest, UpdateFunctionRequest, CreateOrUpdateFunctionResponse, FunctionEntity
 from llm._llm_manager_prompt_utils import get_prompt_template
 from database.database_manager import DatabaseManager
-from utils.aif_utils import create_aif_agent_uri
+from database.async_database_manager import AsyncDatabaseManager
+from utils.aif_utils import create_aif_agent_uri, create_aif_alias_uri, is_aif_alias_uri
 from llm.llm_function_utils import build_local_function_uri, create_func_file, delete_func_file
 from llm.chat_utils import process_aif_agent_uri, ProcessAifAgentUriResponse
-from llm.llm_tools_utils import processToolsResponse
+from llm.agent_registry import AgentRegistry
+from llm.function_registry import FunctionRegistry
+from llm.lm_client_pool import LmClientPool
+from llm.lm_health_monitor import LmHealthMonitor
+from llm.chat_summarizer import ChatSummarizer
+from llm.llm_tools_utils import create_tool, processToolsResponse
+from llm.response_cache import ResponseCache, create_response_cache_key
+from llm.single_flight import SingleFlight
+from llm.lm_scheduler import LmScheduler
+from llm.lm_router import LmRouter
+from llm.semantic_cache import SemanticCache, SemanticCacheLookup, create_semantic_cache_fingerprint
 from llm.i_lm_provider import ILmProvider
 from llm.lm_provider_ollama import LmProviderOllama
 from llm.lm_provider_azureopenai import LmProviderAzureOpenAI
@@ -31,18 +52,32 @@ from llm.lm_provider_huggingface import LmProviderHuggingFace
 from llm.lm_provider_aws_bedrock import LmProviderAwsBedrock
 from aif_types.common import RequestFileInfo
 from aif_types.system import SystemConfig
+from aif_types.ollama import ListOllamaPullJobsResponse
 from llm.lm_rag_utils import create_context_id
 from consts import RESPONSE_LINEBREAK
 from utils.exception_utils import extraValidationErrorMessage
+from utils.token_utils import estimate_prompt_tokens, estimate_tokens, get_prompt_token_budget
 
 
 load_dotenv()  # take environment variables from .env.
 
+MODEL_ALIAS_NAME_PATTERN = re.compile(r"[A-Za-z0-9._-]+")
+
 
 class LlmManager:
 	def __init__(self, database_manager: DatabaseManager):
 		# self.chat_agent_map = {}
 		self.database_manager = database_manager
+		self.async_database_manager = AsyncDatabaseManager(database_manager)
+		self.agent_registry = AgentRegistry(database_manager)
+		self.function_registry = FunctionRegistry(database_manager)
+		self.lm_client_pool = LmClientPool()
+		self.response_cache = ResponseCache()
+		self.semantic_cache = SemanticCache(self._get_llm)
+		self.single_flight = SingleFlight()
+		self.lm_scheduler = LmScheduler(self._get_lm_provider_key_prefix)
+		self.chat_summarizer = ChatSummarizer(database_manager, self._get_llm)
+		self.ingestion_job_manager = IngestionJobManager()
 		self.lmProviderMap: Dict[str, ILmProvider] = {}
 		self.lmProviderMap[LlmProvider.OLLAMA] = LmProviderOllama()
 		self.lmProviderMap[LlmProvider.AZUREOPENAI] = LmProviderAzureOpenAI()
@@ -51,13 +86,34 @@ class LlmManager:
 		self.lmProviderMap[LlmProvider.ANTHROPIC] = LmProviderAnthropic()
 		self.lmProviderMap[LlmProvider.HUGGINGFACE] = LmProviderHuggingFace()
 		self.lmProviderMap[LlmProvider.AWS_BEDROCK] = LmProviderAwsBedrock()
+		self.lm_health_monitor = LmHealthMonitor(list(self.lmProviderMap.values()))
+		self.lm_router = LmRouter(database_manager, self._get_lm_provider, self.lm_health_monitor.isHealthy)
+
+
+	async def start(self):
+		await self.async_database_manager.start()
+		# The sandbox workers start before the first function call
+		await self.function_registry.start()
+		await self.lm_health_monitor.start()
+
+
+	async def stop(self):
+		await self.lm_health_monitor.stop()
+		# Drain the queued chat messages before shutting down
+		await self.async_database_manager.stop()
+		self.function_registry.shutdown()
+		self.ingestion_job_manager.shutdown()
 
 
 	def getLmProviderHealthMap(self):
-		healthMap = {}
-		for provider in self.lmProviderMap.values():
-			healthMap[provider.getId()] = provider.isHealthy()
-		return healthMap
+		return self.lm_health_monitor.getHealthMap()
+
+
+	def get_metrics(self) -> Dict:
+		return {
+			"single_flight": self.single_flight.get_metrics(),
+			"lm_router": self.lm_router.get_metrics(),
+		}
 
 
 	def get_system_config(self) -> SystemConfig:
@@ -72,53 +128,134 @@ class LlmManager:
 		requestFileInfoList: List[RequestFileInfo],
 	) -> AsyncIterable[str]:
 		try:
-			request_info = process_aif_agent_uri(self.database_manager, aif_agent_uri)
-			runnable = self._get_chat_runnable(
+			# Read-your-writes: the previous turn of the session may still be in the write queue
+			await self.async_database_manager.flush_session(aif_session_id)
+
+			# The database and the vector store access is blocking, keep it off the event loop
+			request_info = await asyncio.to_thread(process_aif_agent_uri, self.agent_registry, self.function_registry, aif_agent_uri)
+			prompt_runnable = await asyncio.to_thread(
+				self._get_chat_runnable,
 				input=input,
 				requestFileInfoList=requestFileInfoList,
 				outputFormat=outputFormat,
 				aif_session_id=aif_session_id,
 				request_info=request_info,
 			)
-
-			# if request_info has functions, invoke the request and wait for the response because LM may send back a tool call
+			# The rendered prompt includes the retrieved context and the chat history
+			prompt_value = await prompt_runnable.ainvoke(input)
+
+			# The identical prompts share the cached response, or the upstream stream if they arrive at the same time
+			prompt_key = create_response_cache_key(
+				model_uri=request_info.agent_uri,
+				messages=prompt_value.to_messages(),
+				tools=[create_tool(func) for func in request_info.functions],
+			)
+			response_cache_key = prompt_key if request_info.response_cache_enabled else None
+			if response_cache_key is not None:
+				cached_chunks = self.response_cache.get(response_cache_key)
+				if cached_chunks is not None:
+					for chunk in cached_chunks:
+						yield chunk
+
+					saved = self._add_chat_turn(aif_session_id, aif_agent_uri, input, requestFileInfoList, "".join(cached_chunks))
+					self.chat_summarizer.schedule(aif_session_id, request_info.agent_uri, after=saved)
+					return
+
+			# The semantic cache ignores the context of the conversation, only use it for the first message without files
+			semantic_cache_lookup = None
+			if request_info.semantic_cache_embedding_model_uri and len(requestFileInfoList) == 0:
+				# The prompt may not include the whole history, ask the stored messages of the session
+				is_first_message = not await self.async_database_manager.run(self.database_manager.has_chat_messages, aif_session_id)
+			else:
+				is_first_message = False
+			if is_first_message:
+				semantic_cache_lookup = SemanticCacheLookup(
+					agent_uri=aif_agent_uri,
+					fingerprint=create_semantic_cache_fingerprint(
+						system_prompt=request_info.system_prompt,
+						rag_asset_ids=request_info.aif_rag_asset_ids,
+						model_uri=request_info.agent_uri,
+						embedding_model_uri=request_info.semantic_cache_embedding_model_uri,
+						output_format=outputFormat,
+					),
+					embedding_model_uri=request_info.semantic_cache_embedding_model_uri,
+					question=input,
+				)
+				try:
+					cached_answer, semantic_cache_lookup.embedding = await asyncio.to_thread(
+						self.semantic_cache.lookup,
+						semantic_cache_lookup.agent_uri,
+						semantic_cache_lookup.fingerprint,
+						semantic_cache_lookup.embedding_model_uri,
+						semantic_cache_lookup.question,
+					)
+				except Exception as e:
+					# Serve the request without the cache
+					print(f"Failed to look up the semantic cache: {e}")
+					cached_answer = None
+					semantic_cache_lookup = None
+
+				if cached_answer is not None:
+					yield cached_answer
+
+					saved = self._add_chat_turn(aif_session_id, aif_agent_uri, input, requestFileInfoList, cached_answer)
+					self.chat_summarizer.schedule(aif_session_id, request_info.agent_uri, after=saved)
+					return
+
+			# if request_info has functions, the response may contain tool calls which are processed after the stream
 			if not request_info.functions:
 				response = ""
+				chunks = []
 
-				# iterable = runnable.astream(request.input, config={"callbacks": [DebugPromptHandler()]})	# for debugging
-				iterable = runnable.astream(input)
+				# iterable = model.astream(prompt_value, config={"callbacks": [DebugPromptHandler()]})	# for debugging
+				iterable = self.single_flight.stream(prompt_key, lambda: self._stream_model(request_info.agent_uri, request_info.functions, prompt_value))
 				async for chunk in iterable:
 					response = response + chunk.content
+					chunks.append(chunk.content)
 					yield chunk.content
 
-				self.database_manager.add_chat_message(id=aif_session_id, aif_agent_uri=aif_agent_uri, role=ChatRole.USER, content=input, files=requestFileInfoList)
-				self.database_manager.add_chat_message(id=aif_session_id, aif_agent_uri=aif_agent_uri, role=ChatRole.ASSISTANT, content=response)
-			else:
-				# For function calling, we need the full response to process the tools
-				# invoke_result = runnable.invoke(request.input, config={"callbacks": [DebugPromptHandler()]})	# for debugging
-				invoke_result = runnable.invoke(input)
+				if response_cache_key is not None:
+					self.response_cache.put(response_cache_key, chunks)
+				if semantic_cache_lookup is not None:
+					await self._put_semantic_cache(semantic_cache_lookup, response)
 
+				saved = self._add_chat_turn(aif_session_id, aif_agent_uri, input, requestFileInfoList, response)
+				self.chat_summarizer.schedule(aif_session_id, request_info.agent_uri, after=saved)
+			else:
+				# Stream the text as it arrives and accumulate the chunks, the tool calls are complete once the stream is finished
+				# iterable = model.astream(prompt_value, config={"callbacks": [DebugPromptHandler()]})	# for debugging
+				# Not coalesced, each request runs its own tool calls and they may have side effects
+				iterable = self._stream_model(request_info.agent_uri, request_info.functions, prompt_value)
+				invoke_result = None
 				response = ""
-				# Special case from Anthropic response: invoke_result.content is a list, find the content from the first item
-				if type(invoke_result.content) == list and len(invoke_result.content) > 0:
-					responseText = invoke_result.content[0]["text"]
-				elif invoke_result.content:
-					responseText = invoke_result.content
-				else:
-					responseText = ""
-
-				if len(responseText) > 0:
-					response += responseText
-					yield responseText + RESPONSE_LINEBREAK + RESPONSE_LINEBREAK
-
-				tool_result = processToolsResponse(invoke_result, request_info.functions)
-				if type(tool_result) != str:
-					raise HTTPException(status_code=400, detail="Tool response should be a string")
+				chunks = []
+				async for chunk in iterable:
+					invoke_result = chunk if invoke_result is None else invoke_result + chunk
+					chunkText = _get_content_text(chunk.content)
+					if len(chunkText) > 0:
+						response += chunkText
+						chunks.append(chunkText)
+						yield chunkText
+
+				if invoke_result is None:
+					raise HTTPException(status_code=500, detail="Empty response from the language model")
+
+				has_tool_calls = bool(invoke_result.tool_calls) or "function_call" in invoke_result.additional_kwargs
+				if response_cache_key is not None and not has_tool_calls:
+					# The tool results may change, only the plain text responses are cached
+					self.response_cache.put(response_cache_key, chunks)
+				if semantic_cache_lookup is not None and not has_tool_calls:
+					await self._put_semantic_cache(semantic_cache_lookup, response)
+
+				if len(response) > 0:
+					yield RESPONSE_LINEBREAK + RESPONSE_LINEBREAK
+
+				tool_result = await processToolsResponse(invoke_result, request_info.functions)
 				response += tool_result
 				yield tool_result
 
-				self.database_manager.add_chat_message(id=aif_session_id, aif_agent_uri=aif_agent_uri, role=ChatRole.USER, content=input, files=requestFileInfoList)
-				self.database_manager.add_chat_message(id=aif_session_id, aif_agent_uri=aif_agent_uri, role=ChatRole.ASSISTANT, content=response)
+				saved = self._add_chat_turn(aif_session_id, aif_agent_uri, input, requestFileInfoList, response)
+				self.chat_summarizer.schedule(aif_session_id, request_info.agent_uri, after=saved)
 
 		except Exception as e:
 			if isinstance(e, HTTPException):
@@ -129,6 +266,66 @@ class LlmManager:
 				yield "Sorry, something went wrong"
 
 
+	def _add_chat_turn(self, aif_session_id: str, aif_agent_uri: str, input: str, requestFileInfoList: List[RequestFileInfo], response: str) -> asyncio.Future:
+		# Written behind, the stream is finished without waiting for the commit
+		return self.async_database_manager.enqueue_chat_messages(id=aif_session_id, aif_agent_uri=aif_agent_uri, messages=[
+			ChatHistoryMessage(role=ChatRole.USER.name, content=input, files=requestFileInfoList),
+			ChatHistoryMessage(role=ChatRole.ASSISTANT.name, content=response, files=[]),
+		])
+
+
+	async def _stream_model(self, model_uri: str, functions: List[Callable], prompt_value: PromptValue) -> AsyncIterable[BaseMessageChunk]:
+		# A model alias has several backends, fail over to the next one until the first chunk is sent
+		backend_uris = await asyncio.to_thread(self.lm_router.get_backends, model_uri)
+		prompt_tokens = estimate_prompt_tokens(prompt_value.to_messages())
+		for index, backend_uri in enumerate(backend_uris):
+			has_chunk = False
+			try:
+				try:
+					model = await asyncio.to_thread(self._get_llm, backend_uri, functions)
+				except Exception as e:
+					self.lm_router.record_failure(backend_uri)
+					raise e
+
+				# Wait for the quota of the provider, the slot is held until the stream is finished
+				async with self.lm_scheduler.acquire(backend_uri, prompt_tokens):
+					response_tokens = 0
+					started_at = time.monotonic()
+					try:
+						async for chunk in model.astream(prompt_value):
+							if not has_chunk:
+								has_chunk = True
+								self.lm_router.record_success(backend_uri, time.monotonic() - started_at)
+							response_tokens += estimate_tokens(_get_content_text(chunk.content))
+							yield chunk
+					except Exception as e:
+						self.lm_router.record_failure(backend_uri)
+						raise e
+					finally:
+						self.lm_scheduler.record_tokens(backend_uri, response_tokens)
+				return
+			except Exception as e:
+				if has_chunk or index == len(backend_uris) - 1:
+					raise e
+				print(f"Failed to stream from {backend_uri}, failing over to {backend_uris[index + 1]}: {e}")
+
+
+	async def _put_semantic_cache(self, semantic_cache_lookup: SemanticCacheLookup, answer: str):
+		try:
+			# The embedding of the question is added to the FAISS index, off the event loop like the lookup
+			await asyncio.to_thread(
+				self.semantic_cache.put,
+				agent_uri=semantic_cache_lookup.agent_uri,
+				fingerprint=semantic_cache_lookup.fingerprint,
+				embedding_model_uri=semantic_cache_lookup.embedding_model_uri,
+				question=semantic_cache_lookup.question,
+				embedding=semantic_cache_lookup.embedding,
+				answer=answer,
+			)
+		except Exception as e:
+			print(f"Failed to update the semantic cache: {e}")
+
+
 	def get_chat_history(self, aif_session_id: str) -> ChatHistoryEntity:
 		chat_history = self.database_manager.get_chat_history(aif_session_id)
 		if chat_history is None:
@@ -154,8 +351,6 @@ class LlmManager:
 				input_chain[create_context_id(index)] = ragRetriever
 				ragRetrieverList.append(ragRetriever)
 
-		model = self._get_llm(request_info.agent_uri, request_info.functions)
-
 		review_prompt_template = get_prompt_template(
 			database_manager=self.database_manager,
 			ragRetrieverList=ragRetrieverList,
@@ -164,12 +359,13 @@ class LlmManager:
 			input=input,
 			requestFileInfoList=requestFileInfoList,
 			outputFormat=outputFormat,
+			token_budget=get_prompt_token_budget(request_info.prompt_token_budget),
 		)
 
+		# The model is picked when the rendered prompt is sent, see _stream_model
 		return (
 			input_chain
 			| review_prompt_template
-			| model
 		)
 
 
@@ -178,35 +374,62 @@ class LlmManager:
 		return ListEmbeddingsResponse(embeddings=embedding_metadata_list)
 
 
-	def create_embedding(self, file_dict: Dict[str, str], aif_basemodel_uri: str, name: str | None) -> CreateOrUpdateEmbeddingsResponse:
+	def create_embedding(self, file_dict: Dict[str, BinaryIO], aif_basemodel_uri: str, name: str | None) -> IngestionJobResponse:
+		_check_embedding_model_uri(aif_basemodel_uri)
 		llm: Embeddings = self._get_llm(aif_basemodel_uri, is_embedding=True)
-		document_strs = list(file_dict.values())
-		documents = [Document(page_content=x, metadata={"source": "local"}) for x in document_strs]
 		name = name if name else '-'.join(list(file_dict.keys()))
-		return create_or_update_embeddings(asset_id=None, name=name, basemodel_uri=aif_basemodel_uri, llm=llm, documents=documents, database_manager=self.database_manager)
+
+		def run(job_file_dict: Dict[str, BinaryIO], on_progress: Callable[[int], None]) -> CreateOrUpdateEmbeddingsResponse:
+			return create_or_update_embeddings(
+				asset_id=None,
+				name=name,
+				basemodel_uri=aif_basemodel_uri,
+				llm=llm,
+				# The files are read and split lazily while they are embedded
+				documents=iter_documents(job_file_dict),
+				database_manager=self.database_manager,
+				key_prefix=self._get_lm_provider_key_prefix(aif_basemodel_uri),
+				on_progress=on_progress,
+			)
+		return self.ingestion_job_manager.submit(file_dict, None, run)
 
 
-	def update_embedding(self, file_dict: Dict[str, str], aif_embedding_asset_id: str, name: str | None) -> CreateOrUpdateEmbeddingsResponse:
+	def update_embedding(self, file_dict: Dict[str, BinaryIO], aif_embedding_asset_id: str, name: str | None, remove_sources: List[str] = []) -> IngestionJobResponse:
 		embedding = self.database_manager.load_embeddings_metadata(aif_embedding_asset_id)
 		if not embedding:
 			raise HTTPException(status_code=404, detail="Embedding not found")
 		
 		llm: Embeddings = self._get_llm(embedding.basemodel_uri, is_embedding=True)
 
-		document_strs = list(file_dict.values())
-		if len(document_strs) == 0:
-			documents = None
-		else:
-			documents = [Document(page_content=x, metadata={"source": "local"}) for x in document_strs]
+		def run(job_file_dict: Dict[str, BinaryIO], on_progress: Callable[[int], None]) -> CreateOrUpdateEmbeddingsResponse:
+			response = create_or_update_embeddings(
+				asset_id=embedding.id,
+				name=name if name else embedding.name,
+				basemodel_uri=embedding.basemodel_uri,
+				llm=llm,
+				documents=iter_documents(job_file_dict) if len(job_file_dict) > 0 else None,
+				database_manager=self.database_manager,
+				key_prefix=self._get_lm_provider_key_prefix(embedding.basemodel_uri),
+				# The uploaded files replace their previous version anyway
+				remove_sources=[source for source in remove_sources if source not in job_file_dict],
+				on_progress=on_progress,
+			)
+			# The cached answers may be based on the previous content
+			self.semantic_cache.clear()
+			return response
+		return self.ingestion_job_manager.submit(file_dict, embedding.id, run)
 
-		return create_or_update_embeddings(
-			asset_id=embedding.id,
-			name=name if name else embedding.name,
-			basemodel_uri=embedding.basemodel_uri,
-			llm=llm,
-			documents=documents,
-			database_manager=self.database_manager
-		)		
+
+	def list_ingestion_jobs(self) -> ListIngestionJobsResponse:
+		return ListIngestionJobsResponse(jobs=self.ingestion_job_manager.list())
+
+
+	def get_ingestion_job(self, job_id: str) -> IngestionJobResponse:
+		return self.ingestion_job_manager.get(job_id)
+
+
+	def cancel_ingestion_job(self, job_id: str) -> IngestionJobResponse:
+		return self.ingestion_job_manager.cancel(job_id)
 
 
 	def update_embedding_metadata(self, request: UpdateEmbeddingMetadataRequest, aif_embedding_asset_id: str) -> EmbeddingEntity:
@@ -225,28 +448,44 @@ class LlmManager:
 		if not embedding_metadata:
 			raise HTTPException(status_code=404, detail="Embedding not found")
 		
+		# A running update would save the asset again after it's deleted
+		self.ingestion_job_manager.cancel_asset_jobs(embedding_metadata.id)
+		self.semantic_cache.clear()
 		return delete_embedding(asset_id=embedding_metadata.id, database_manager=self.database_manager)		
 
 
 	def create_embeddings_content(self, request: CreateEmbeddingsRequest, aif_basemodel_uri: str) -> CreateOrUpdateEmbeddingsResponse:
+		_check_embedding_model_uri(aif_basemodel_uri)
 		llm: Embeddings = self._get_llm(aif_basemodel_uri, is_embedding=True)
 		document_strs = [request.input] if isinstance(request.input, str) else request.input
 		documents = [Document(page_content=x, metadata={"source": "local"}) for x in document_strs]
 		name = request.name if request.name else ""
-		return create_or_update_embeddings(asset_id=None, name=name, basemodel_uri=aif_basemodel_uri, llm=llm, documents=documents, database_manager=self.database_manager)
+		return create_or_update_embeddings(
+			asset_id=None,
+			name=name,
+			basemodel_uri=aif_basemodel_uri,
+			llm=llm,
+			documents=documents,
+			database_manager=self.database_manager,
+			key_prefix=self._get_lm_provider_key_prefix(aif_basemodel_uri),
+		)
 
 
 	def list_languagemodels(self, llm_feature: LlmFeature) -> ListLanguageModelsResponse:
 		basemodels: List[LanguageModelInfo] = []
 
 		for provider in self.lmProviderMap.values():
-			if not provider.isHealthy():
+			if not self.lm_health_monitor.isHealthy(provider.getId()):
 				continue
 			basemodels.extend(provider.listLanguageModels(llm_feature))
 
 		return ListLanguageModelsResponse(basemodels=basemodels)
 
 
+	def list_ollama_pull_jobs(self) -> ListOllamaPullJobsResponse:
+		return ListOllamaPullJobsResponse(jobs=self.lmProviderMap[LlmProvider.OLLAMA].listPullJobs())
+
+
 	def listLmProviders(self):
 		providers = [self.lmProviderMap[provider].getLanguageProviderInfo() for provider in self.lmProviderMap]
 		return ListLmProvidersResponse(providers=providers)
@@ -256,6 +495,13 @@ class LlmManager:
 		for provider in self.lmProviderMap.values():
 			if provider.getId() == request.lmProviderId:
 				provider.updateLmProvider(request)
+				# The pooled clients hold the previous credentials
+				self.lm_client_pool.invalidate_provider(provider.getId())
+				# The cached vector stores embed the queries with the client they were loaded with
+				vectorStoreCache.clear()
+				self.lm_health_monitor.requestRefresh()
+				# The limits of the provider may be changed as well
+				self.lm_scheduler.refresh()
 				return self.listLmProviders()
 		raise HTTPException(status_code=404, detail="Unknown language model provider")
 
@@ -264,6 +510,8 @@ class LlmManager:
 
 
 	def create_agent(self, request: CreateAgentRequest) -> CreateOrUpdateAgentResponse:
+		if request.semantic_cache_embedding_model_uri:
+			_check_embedding_model_uri(request.semantic_cache_embedding_model_uri)
 		uuid_value = str(uuid.uuid4())
 		agent_uri = create_aif_agent_uri(uuid_value)
 		model = AgentEntity(
@@ -274,6 +522,9 @@ class LlmManager:
 			system_prompt=request.system_prompt,
 			rag_asset_ids=request.rag_asset_ids if request.rag_asset_ids else [],
 			function_asset_ids=request.function_asset_ids if request.function_asset_ids else [],
+			prompt_token_budget=request.prompt_token_budget,
+			response_cache_enabled=request.response_cache_enabled,
+			semantic_cache_embedding_model_uri=request.semantic_cache_embedding_model_uri,
 		)
 		self.database_manager.save_db_model(model)
 		return CreateOrUpdateAgentResponse(agent_uri=agent_uri)
@@ -282,11 +533,65 @@ class LlmManager:
 	def update_agent(self, id: str, request: UpdateAgentRequest) -> CreateOrUpdateAgentResponse:
 		if not id:
 			raise HTTPException(status_code=400, detail="Model id is required")
-		return self.database_manager.update_agent(id=id, request=request)
+		if request.semantic_cache_embedding_model_uri:
+			_check_embedding_model_uri(request.semantic_cache_embedding_model_uri)
+		response = self.database_manager.update_agent(id=id, request=request)
+		self.agent_registry.invalidate(id)
+		self.semantic_cache.invalidate(response.agent_uri)
+		return response
 
 
 	def delete_agent(self, id: str):
-		return self.database_manager.delete_agent(id=id)
+		response = self.database_manager.delete_agent(id=id)
+		self.agent_registry.invalidate(id)
+		self.semantic_cache.invalidate(create_aif_agent_uri(id))
+		return response
+
+
+	def list_model_aliases(self) -> ListModelAliasesResponse:
+		return ListModelAliasesResponse(aliases=self.database_manager.list_model_aliases())
+
+
+	def create_model_alias(self, request: CreateModelAliasRequest) -> CreateOrUpdateModelAliasResponse:
+		if not MODEL_ALIAS_NAME_PATTERN.fullmatch(request.name):
+			raise HTTPException(status_code=400, detail="Model alias name can only contain letters, digits, '.', '_' and '-'")
+		if len(request.basemodel_uris) == 0:
+			raise HTTPException(status_code=400, detail="Model alias needs at least one base model")
+		self._check_alias_basemodel_uris(request.basemodel_uris)
+
+		alias_uri = create_aif_alias_uri(request.name)
+		if self.database_manager.get_model_alias_by_uri(alias_uri) is not None:
+			raise HTTPException(status_code=409, detail="Model alias already exists")
+
+		model_alias = ModelAliasEntity(
+			id=str(uuid.uuid4()),
+			name=request.name,
+			alias_uri=alias_uri,
+			basemodel_uris=request.basemodel_uris,
+		)
+		self.database_manager.save_db_model(model_alias)
+		return CreateOrUpdateModelAliasResponse(alias_uri=alias_uri)
+
+
+	def update_model_alias(self, id: str, request: UpdateModelAliasRequest) -> CreateOrUpdateModelAliasResponse:
+		if request.basemodel_uris:
+			self._check_alias_basemodel_uris(request.basemodel_uris)
+		response = self.database_manager.update_model_alias(id=id, request=request)
+		self.lm_router.invalidate(response.alias_uri)
+		return response
+
+
+	def delete_model_alias(self, id: str):
+		model_alias = self.database_manager.delete_model_alias(id=id)
+		self.lm_router.invalidate(model_alias.alias_uri)
+
+
+	def _check_alias_basemodel_uris(self, basemodel_uris: List[str]):
+		for basemodel_uri in basemodel_uris:
+			if is_aif_alias_uri(basemodel_uri):
+				raise HTTPException(status_code=400, detail=f"Model alias can't use another model alias {basemodel_uri}")
+			if self._get_lm_provider(basemodel_uri) is None:
+				raise HTTPException(status_code=400, detail=f"No language model provider for {basemodel_uri}")
 
 
 	def list_functions(self):
@@ -327,19 +632,38 @@ class LlmManager:
 	def delete_function(self, id: str):
 		func_metadata = self.database_manager.get_function(id=id)
 		delete_func_file(func_metadata.functions_path, func_metadata.functions_name)
+		self.function_registry.invalidate(id)
 		return self.database_manager.delete_function(id=id)
 
 
+	def _get_lm_provider(self, aif_uri: str) -> ILmProvider | None:
+		for provider in self.lmProviderMap.values():
+			if provider.canHandle(aif_uri):
+				return provider
+		return None
+
+
+	def _get_lm_provider_key_prefix(self, aif_uri: str) -> str | None:
+		provider = self._get_lm_provider(aif_uri)
+		return provider.getKeyPrefix() if provider is not None else None
+
+
 	def _get_llm(self, aif_agent_uri: str, functions: List[Callable] = [], is_embedding = False):
 		try:
+			# No failover outside the chat stream, e.g. the summary uses the preferred backend of an alias
+			aif_agent_uri = self.lm_router.get_backends(aif_agent_uri)[0]
 			for provider in self.lmProviderMap.values():
 				if provider.canHandle(aif_agent_uri):
 					if is_embedding:
-						return provider.getBaseEmbeddingsModel(aif_agent_uri)
+						create_client = lambda: provider.getBaseEmbeddingsModel(aif_agent_uri)
 					else:
-						return provider.getBaseLanguageModel(aif_agent_uri, functions)
+						create_client = lambda: provider.getBaseLanguageModel(aif_agent_uri, functions)
+					return self.lm_client_pool.get_or_create(provider.getId(), aif_agent_uri, functions, is_embedding, create_client)
 		except Exception as e:
-			if isinstance(e, PydanticV1ValidationError):
+			if isinstance(e, HTTPException):
+				# E.g. the model is not ready yet
+				raise e
+			elif isinstance(e, PydanticV1ValidationError):
 				# Very likely come from AWS Bedrock, which includes information for the credentials
 				errorMessage = extraValidationErrorMessage(e)
 				raise HTTPException(status_code=400, detail=errorMessage)
@@ -347,3 +671,16 @@ class LlmManager:
 				raise HTTPException(status_code=400, detail=f"Failed to load model {aif_agent_uri}")
 
 		raise HTTPException(status_code=404, detail="Model not found")
+
+
+def _check_embedding_model_uri(aif_basemodel_uri: str):
+	# The backends of an alias embed into different vector spaces, the vectors of an asset must come from one model
+	if is_aif_alias_uri(aif_basemodel_uri):
+		raise HTTPException(status_code=400, detail="Embeddings need a base model, not a model alias")
+
+
+def _get_content_text(content: str | List) -> str:
+	# Special case from Anthropic response: the content is a list of parts, the tool call arguments are in the non-text parts
+	if isinstance(content, list):
+		return "".join([part if isinstance(part, str) else part.get("text", "") for part in content if isinstance(part, str) or part.get("type", "text") == "text"])
+	return content if content else ""
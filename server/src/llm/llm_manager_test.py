@@ -0,0 +1,186 @@
+import io
+import asyncio
+import pytest
+from fastapi import HTTPException
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.prompt_values import ChatPromptValue
+from langchain_core.runnables import RunnableLambda
+from consts import RESPONSE_LINEBREAK
+from aif_types.aliases import CreateModelAliasRequest, UpdateModelAliasRequest
+from aif_types.chat import ChatHistoryMessage, ChatRole
+from aif_types.languagemodels import UpdateLmProviderRequest
+from database.database_manager import DatabaseManager
+from llm.chat_utils import ProcessAifAgentUriResponse
+from llm.llm_manager import LlmManager
+from llm.vector_store_cache import VectorStoreCache
+from aif_types.llm import LlmProvider
+
+
+def get_weather(city: str) -> str:
+    """
+    Get the weather of a city
+
+    Args:
+        city (str): The name of the city
+    """
+    return f"Sunny in {city}"
+
+
+def _create_tool_call_chunks():
+    # The arguments of the tool call are split across the chunks
+    return [
+        AIMessageChunk(content="Let me check."),
+        AIMessageChunk(content="", tool_call_chunks=[{ "name": "get_weather", "args": '{"city": ', "id": "call-1", "index": 0 }]),
+        AIMessageChunk(content="", tool_call_chunks=[{ "name": None, "args": '"Paris"}', "id": None, "index": 0 }]),
+    ]
+
+
+def describe_llm_manager():
+    @pytest.fixture
+    def llm_manager(tmp_path, monkeypatch):
+        monkeypatch.setattr("database.database_manager.get_assets_path", lambda: str(tmp_path))
+        monkeypatch.setenv("SQLITE_FILE_NAME", "test.db")
+        llm_manager = LlmManager(DatabaseManager())
+        monkeypatch.setattr("llm.llm_manager.process_aif_agent_uri", lambda agent_registry, function_registry, aif_agent_uri: ProcessAifAgentUriResponse(
+            agent_uri="aif://model/a",
+            aif_rag_asset_ids=[],
+            system_prompt=None,
+            functions=[get_weather],
+            response_cache_enabled=True,
+        ))
+        monkeypatch.setattr(llm_manager, "_get_chat_runnable", lambda **kwargs: RunnableLambda(lambda input: ChatPromptValue(messages=[HumanMessage(content=input)])))
+        yield llm_manager
+        llm_manager.function_registry.shutdown()
+        llm_manager.ingestion_job_manager.shutdown()
+
+    def describe_chat():
+        def test_streams_the_text_and_runs_the_tool_calls(llm_manager, monkeypatch):
+            streamed_functions = []
+
+            async def stream_model(model_uri, functions, prompt_value):
+                streamed_functions.append(functions)
+                for chunk in _create_tool_call_chunks():
+                    yield chunk
+            monkeypatch.setattr(llm_manager, "_stream_model", stream_model)
+
+            async def run():
+                chunks = [chunk async for chunk in llm_manager.chat("session-1", "aif://agents/a", "text", "Weather in Paris?", [])]
+                await llm_manager.async_database_manager.stop()
+                return chunks
+
+            chunks = asyncio.run(run())
+            assert chunks == ["Let me check.", RESPONSE_LINEBREAK + RESPONSE_LINEBREAK, "Sunny in Paris"]
+            assert streamed_functions == [[get_weather]]
+            # The tool calls are not shared with the concurrent requests
+            assert llm_manager.single_flight.get_metrics()["upstream_calls"] == 0
+
+            messages = llm_manager.database_manager.get_chat_history_messages("session-1")
+            assert [message.content for message in messages] == ["Weather in Paris?", "Let me check.Sunny in Paris"]
+            # The tool results may change, the response is not cached
+            assert len(llm_manager.response_cache._entries) == 0
+
+        def test_reports_unknown_tools(llm_manager, monkeypatch):
+            async def stream_model(model_uri, functions, prompt_value):
+                yield AIMessageChunk(content="", tool_call_chunks=[{ "name": "get_time", "args": "{}", "id": "call-1", "index": 0 }])
+            monkeypatch.setattr(llm_manager, "_stream_model", stream_model)
+
+            async def run():
+                return [chunk async for chunk in llm_manager.chat("session-1", "aif://agents/a", "text", "What time is it?", [])]
+
+            assert asyncio.run(run()) == ["Function not found"]
+
+        def test_semantic_cache_only_for_the_first_message_of_the_session(llm_manager, monkeypatch):
+            monkeypatch.setattr("llm.llm_manager.process_aif_agent_uri", lambda agent_registry, function_registry, aif_agent_uri: ProcessAifAgentUriResponse(
+                agent_uri="aif://model/a",
+                aif_rag_asset_ids=[],
+                system_prompt=None,
+                functions=[],
+                semantic_cache_embedding_model_uri="aif://model/embedding",
+            ))
+            questions = []
+
+            def lookup(agent_uri, fingerprint, embedding_model_uri, question):
+                questions.append(question)
+                return "Cached answer", [1.0]
+            monkeypatch.setattr(llm_manager.semantic_cache, "lookup", lookup)
+
+            async def run(aif_session_id, input):
+                return [chunk async for chunk in llm_manager.chat(aif_session_id, "aif://agents/a", "text", input, [])]
+
+            async def stream_model(model_uri, functions, prompt_value):
+                yield AIMessageChunk(content="New answer")
+            monkeypatch.setattr(llm_manager, "_stream_model", stream_model)
+
+            llm_manager.database_manager.add_chat_messages("aif://agents/a", "session-1", [
+                ChatHistoryMessage(role=ChatRole.USER.name, content="Hello", files=[]),
+                ChatHistoryMessage(role=ChatRole.ASSISTANT.name, content="Hi", files=[]),
+            ])
+            # The prompt of the fixture has no history, like a history outside of the token budget
+            assert asyncio.run(run("session-1", "Weather in Paris?")) == ["New answer"]
+            assert asyncio.run(run("session-2", "Weather in Paris?")) == ["Cached answer"]
+            assert questions == ["Weather in Paris?"]
+
+        def test_semantic_cache_depends_on_the_output_format(llm_manager, monkeypatch):
+            monkeypatch.setattr("llm.llm_manager.process_aif_agent_uri", lambda agent_registry, function_registry, aif_agent_uri: ProcessAifAgentUriResponse(
+                agent_uri="aif://model/a",
+                aif_rag_asset_ids=[],
+                system_prompt=None,
+                functions=[],
+                semantic_cache_embedding_model_uri="aif://model/embedding",
+            ))
+            fingerprints = []
+
+            def lookup(agent_uri, fingerprint, embedding_model_uri, question):
+                fingerprints.append(fingerprint)
+                return None, [1.0]
+            monkeypatch.setattr(llm_manager.semantic_cache, "lookup", lookup)
+            put_fingerprints = []
+            monkeypatch.setattr(llm_manager.semantic_cache, "put", lambda **kwargs: put_fingerprints.append(kwargs["fingerprint"]))
+
+            async def stream_model(model_uri, functions, prompt_value):
+                yield AIMessageChunk(content="Answer")
+            monkeypatch.setattr(llm_manager, "_stream_model", stream_model)
+
+            async def run(aif_session_id, outputFormat):
+                return [chunk async for chunk in llm_manager.chat(aif_session_id, "aif://agents/a", outputFormat, "Weather in Paris?", [])]
+
+            assert asyncio.run(run("session-1", "text")) == ["Answer"]
+            assert asyncio.run(run("session-2", "markdown")) == ["Answer"]
+            # The answers formatted as text are not served to the markdown requests
+            assert fingerprints[0] != fingerprints[1]
+            assert put_fingerprints == fingerprints
+
+    def describe_model_aliases():
+        def test_create_checks_the_base_models(llm_manager):
+            for basemodel_uri in ["unknown://model", "aif://aliases/other"]:
+                with pytest.raises(HTTPException) as e:
+                    llm_manager.create_model_alias(CreateModelAliasRequest(name="alias", basemodel_uris=["openai://gpt-4o", basemodel_uri]))
+                assert e.value.status_code == 400
+            assert llm_manager.database_manager.list_model_aliases() == []
+
+            alias_uri = llm_manager.create_model_alias(CreateModelAliasRequest(name="alias", basemodel_uris=["openai://gpt-4o", "ollama://llama3"])).alias_uri
+            assert alias_uri == "aif://aliases/alias"
+
+        def test_update_checks_the_base_models(llm_manager):
+            llm_manager.create_model_alias(CreateModelAliasRequest(name="alias", basemodel_uris=["openai://gpt-4o"]))
+            id = llm_manager.database_manager.list_model_aliases()[0].id
+            with pytest.raises(HTTPException) as e:
+                llm_manager.update_model_alias(id, UpdateModelAliasRequest(basemodel_uris=["aif://aliases/alias"]))
+            assert e.value.status_code == 400
+
+        def test_embeddings_need_a_base_model(llm_manager):
+            with pytest.raises(HTTPException) as e:
+                llm_manager.create_embedding({ "a.txt": io.BytesIO(b"hello") }, "aif://aliases/alias", None)
+            assert e.value.status_code == 400
+
+    def describe_update_lm_provider():
+        def test_drops_the_clients_of_the_cached_vector_stores(llm_manager, monkeypatch):
+            provider = llm_manager.lmProviderMap[LlmProvider.OPENAI]
+            monkeypatch.setattr(provider, "updateLmProvider", lambda request: None)
+            monkeypatch.setattr(llm_manager, "listLmProviders", lambda: None)
+            vectorStoreCache = VectorStoreCache(max_bytes=100)
+            monkeypatch.setattr("llm.llm_manager.vectorStoreCache", vectorStoreCache)
+            vectorStoreCache.put("asset-1", "vector-store", 10)
+
+            llm_manager.updateLmProvider(UpdateLmProviderRequest(lmProviderId="openai", properties={ "OPENAI_API_KEY": "new-key" }))
+            assert vectorStoreCache.get("asset-1") is None
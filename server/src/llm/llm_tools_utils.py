@@ -1,8 +1,29 @@
+import os
+import copy
 import json
+import asyncio
 import inspect
-from typing import Any, Callable, List
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
 from docstring_parser import parse
 from fastapi import HTTPException
+from consts import RESPONSE_LINEBREAK
+
+
+DEFAULT_FUNCTION_CALL_TIMEOUT_SECONDS = 30
+DEFAULT_FUNCTION_CALL_MAX_WORKERS = 8
+
+
+# The functions of FunctionRegistry carry their tools by parameter key, created once when the function is loaded
+TOOLS_ATTRIBUTE = "__aif_tools__"
+# "input_schema" is the parameter key of Anthropic
+TOOL_PARAMETER_KEYS = ["parameters", "input_schema"]
+
+# Shared by all the requests for the sync functions, created on first use
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
 
 """
 Sample response:
@@ -28,6 +49,21 @@ Sample response:
 def create_tool(func, overrideParameters: str = None):
     paramKey = overrideParameters if overrideParameters else "parameters"
 
+    tools = getattr(func, TOOLS_ATTRIBUTE, None)
+    if tools is not None and paramKey in tools:
+        # The caller may modify the tool
+        return copy.deepcopy(tools[paramKey])
+    return _create_tool(func, paramKey)
+
+
+def create_tools(func) -> Dict[str, dict]:
+    """
+    The tools of the function by parameter key, see TOOLS_ATTRIBUTE
+    """
+    return { paramKey: _create_tool(func, paramKey) for paramKey in TOOL_PARAMETER_KEYS }
+
+
+def _create_tool(func, paramKey: str):
     def map_type(param_type: str) -> str:
         if param_type == "str":
             return "string"
@@ -62,42 +98,60 @@ def create_tool(func, overrideParameters: str = None):
     return tool
 
 
-def processToolsResponse(invoke_result: Any, functions: List[Callable]):
+async def processToolsResponse(invoke_result: Any, functions: List[Callable]) -> str:
+    """
+    Run all the tool calls of the response concurrently and join their results in the order of the calls
+    """
     if invoke_result.tool_calls: # Ollama, Claude
-        # TODO: only call the first function from tool_calls
-        tool_call = invoke_result.tool_calls[0]
-        func_name = tool_call["name"]
-        arg_dict = tool_call["args"]
-
-        func_callable = None
-        for callable in functions:
-            if callable.__name__ == func_name:
-                func_callable = callable
-                break
-
-        if not func_callable:
-            raise HTTPException(status_code=404, detail="Function not found")
-        
-        response = func_callable(**arg_dict)
-        return response
-
+        calls = [(tool_call["name"], tool_call["args"]) for tool_call in invoke_result.tool_calls]
     elif invoke_result.additional_kwargs and ('function_call' in invoke_result.additional_kwargs): # OpenAI / AzureOpenAI
         func_name = invoke_result.additional_kwargs['function_call']['name']
         arg_str = invoke_result.additional_kwargs['function_call']['arguments']
-        arg_dict = json.loads(arg_str)
+        calls = [(func_name, json.loads(arg_str))]
+    else:
+        return ""
 
-        func_callable = None
-        for callable in functions:
-            if callable.__name__ == func_name:
-                func_callable = callable
-                break
+    # Resolve all the functions first, don't start any call if one of them doesn't exist
+    func_callables = [_find_function(func_name, functions) for func_name, _ in calls]
+    responses = await asyncio.gather(*[_call_function(func_callable, arg_dict) for func_callable, (_, arg_dict) in zip(func_callables, calls)])
+    for response in responses:
+        if type(response) != str:
+            raise HTTPException(status_code=400, detail="Tool response should be a string")
+    return (RESPONSE_LINEBREAK + RESPONSE_LINEBREAK).join(responses)
 
-        if not func_callable:
-            raise HTTPException(status_code=404, detail="Function not found")
-        
-        response = func_callable(**arg_dict)
-        return response
 
-    else:   
-        return ""
+def _find_function(func_name: str, functions: List[Callable]) -> Callable:
+    for callable in functions:
+        if callable.__name__ == func_name:
+            return callable
+    raise HTTPException(status_code=404, detail="Function not found")
+
+
+async def _call_function(func_callable: Callable, arg_dict: Dict[str, Any]) -> Any:
+    if inspect.iscoroutinefunction(func_callable):
+        awaitable = func_callable(**arg_dict)
+    else:
+        # The thread keeps running after the timeout, the pool bounds how many of them there can be
+        awaitable = asyncio.get_running_loop().run_in_executor(_get_executor(), functools.partial(func_callable, **arg_dict))
+
+    try:
+        return await asyncio.wait_for(awaitable, timeout=_get_timeout_seconds())
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Function {func_callable.__name__} timed out")
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_workers = os.environ.get("FUNCTION_CALL_MAX_WORKERS")
+            _executor = ThreadPoolExecutor(
+                max_workers=int(max_workers) if max_workers else DEFAULT_FUNCTION_CALL_MAX_WORKERS,
+                thread_name_prefix="aif-function",
+            )
+        return _executor
+
 
+def _get_timeout_seconds() -> float:
+    timeout_seconds = os.environ.get("FUNCTION_CALL_TIMEOUT_SECONDS")
+    return float(timeout_seconds) if timeout_seconds else DEFAULT_FUNCTION_CALL_TIMEOUT_SECONDS
@@ -0,0 +1,62 @@
+import time
+import asyncio
+import pytest
+from fastapi import HTTPException
+from langchain_core.messages import AIMessage
+from llm.llm_tools_utils import processToolsResponse
+
+
+def slow_add(a: int, b: int):
+    """
+    Add two numbers slowly
+    """
+    time.sleep(0.2)
+    return str(a + b)
+
+
+async def async_echo(text: str):
+    """
+    Echo the text
+    """
+    await asyncio.sleep(0.2)
+    return text
+
+
+def _create_tool_call(name: str, args: dict, id: str):
+    return { "name": name, "args": args, "id": id }
+
+
+def describe_processToolsResponse():
+    def test_runs_the_tool_calls_concurrently_in_order():
+        invoke_result = AIMessage(content="", tool_calls=[
+            _create_tool_call("slow_add", { "a": 1, "b": 2 }, "1"),
+            _create_tool_call("async_echo", { "text": "hello" }, "2"),
+            _create_tool_call("slow_add", { "a": 3, "b": 4 }, "3"),
+        ])
+
+        start = time.monotonic()
+        response = asyncio.run(processToolsResponse(invoke_result, [slow_add, async_echo]))
+        assert response == "3<br /><br />hello<br /><br />7"
+        assert time.monotonic() - start < 0.5
+
+    def test_openai_function_call():
+        invoke_result = AIMessage(content="", additional_kwargs={
+            "function_call": { "name": "slow_add", "arguments": '{"a": 1, "b": 1}' },
+        })
+        assert asyncio.run(processToolsResponse(invoke_result, [slow_add])) == "2"
+
+    def test_no_tool_calls():
+        assert asyncio.run(processToolsResponse(AIMessage(content="hi"), [slow_add])) == ""
+
+    def test_function_not_found():
+        invoke_result = AIMessage(content="", tool_calls=[_create_tool_call("missing", {}, "1")])
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(processToolsResponse(invoke_result, [slow_add]))
+        assert e.value.status_code == 404
+
+    def test_timeout(monkeypatch):
+        monkeypatch.setenv("FUNCTION_CALL_TIMEOUT_SECONDS", "0.05")
+        invoke_result = AIMessage(content="", tool_calls=[_create_tool_call("async_echo", { "text": "hello" }, "1")])
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(processToolsResponse(invoke_result, [async_echo]))
+        assert e.value.status_code == 504
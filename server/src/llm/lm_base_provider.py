@@ -31,6 +31,7 @@ class LmBaseProviderProps(BaseModel):
 class LmBaseProvider(ILmProvider):
     def __init__(self, props: LmBaseProviderProps):
         self.props = props
+        self._healthStatus: bool | None = None     # Updated by the health monitor
 
     def getId(self) -> str:
         return self.props.id
@@ -38,6 +39,13 @@ class LmBaseProvider(ILmProvider):
     def getName(self) -> str:
         return self.props.name
 
+    def getKeyPrefix(self) -> str:
+        return self.props.keyPrefix
+
+    def getWeight(self) -> int:
+        weight = os.environ.get(self.props.keyPrefix + "MODELS_DEFAULT_WEIGHT")
+        return int(weight) if weight else DEFAULT_MODEL_WEIGHT
+
     def isHealthy(self) -> bool:
         key = os.environ.get(self.props.keyPrefix + "API_KEY")
         return key is not None and len(key) > 0
@@ -147,8 +155,13 @@ class LmBaseProvider(ILmProvider):
         raise NotImplementedError("Subclasses must implement this method")
 
 
+    def setHealthStatus(self, healthy: bool):
+        self._healthStatus = healthy
+
+
     def _getStatus(self) -> str:
-        return "available" if self.isHealthy() else "unavailable"
+        healthy = self._healthStatus if self._healthStatus is not None else self.isHealthy()
+        return "available" if healthy else "unavailable"
 
 
     def getLanguageProviderInfo(self) -> LmProviderEntity:
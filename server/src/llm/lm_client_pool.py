@@ -0,0 +1,51 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Tuple
+
+
+DEFAULT_LM_CLIENT_POOL_MAX_SIZE = 64
+
+
+class LmClientPool:
+    """
+    Long-lived language model and embeddings clients, keyed by (provider, model uri, bound functions, is embedding).
+    Reusing the clients keeps their HTTP connection pools alive across requests. The entries of a provider must be
+    invalidated when its credentials or settings change.
+    """
+    def __init__(self, max_size: int | None = None):
+        self._max_size = max_size
+        self._clients: OrderedDict[Tuple, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_max_size(self) -> int:
+        if self._max_size is not None:
+            return self._max_size
+        max_size = os.environ.get("LM_CLIENT_POOL_MAX_SIZE")
+        return int(max_size) if max_size else DEFAULT_LM_CLIENT_POOL_MAX_SIZE
+
+    def get_or_create(self, provider_id: str, model_uri: str, functions: List[Callable], is_embedding: bool, create_client: Callable[[], Any]) -> Any:
+        # The functions are part of the key because they are bound to the client, the pool holds them so their ids are stable
+        key = (provider_id, model_uri, tuple(functions) if functions else (), is_embedding)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+
+        client = create_client()
+
+        with self._lock:
+            self._clients[key] = client
+            while len(self._clients) > self.get_max_size():
+                self._clients.popitem(last=False)
+        return client
+
+    def invalidate_provider(self, provider_id: str):
+        with self._lock:
+            for key in [key for key in self._clients if key[0] == provider_id]:
+                del self._clients[key]
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
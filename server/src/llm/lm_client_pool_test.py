@@ -0,0 +1,58 @@
+from llm.lm_client_pool import LmClientPool
+
+
+class ClientFactory:
+    def __init__(self):
+        self.created = 0
+
+    def __call__(self):
+        self.created += 1
+        return object()
+
+
+def _get_answer():
+    pass
+
+
+def describe_lm_client_pool():
+    def test_reuses_clients():
+        pool = LmClientPool(max_size=4)
+        create_client = ClientFactory()
+        client = pool.get_or_create("openai", "aif://model/a", [], False, create_client)
+        assert pool.get_or_create("openai", "aif://model/a", [], False, create_client) is client
+        assert create_client.created == 1
+
+    def test_key_includes_functions_and_embedding():
+        pool = LmClientPool(max_size=4)
+        create_client = ClientFactory()
+        pool.get_or_create("openai", "aif://model/a", [], False, create_client)
+        pool.get_or_create("openai", "aif://model/a", [_get_answer], False, create_client)
+        pool.get_or_create("openai", "aif://model/a", [], True, create_client)
+        assert create_client.created == 3
+
+    def test_evicts_least_recently_used():
+        pool = LmClientPool(max_size=2)
+        create_client = ClientFactory()
+        client_a = pool.get_or_create("openai", "aif://model/a", [], False, create_client)
+        pool.get_or_create("openai", "aif://model/b", [], False, create_client)
+        pool.get_or_create("openai", "aif://model/a", [], False, create_client)
+        pool.get_or_create("openai", "aif://model/c", [], False, create_client)
+
+        assert pool.get_or_create("openai", "aif://model/a", [], False, create_client) is client_a
+        assert create_client.created == 3
+        pool.get_or_create("openai", "aif://model/b", [], False, create_client)
+        assert create_client.created == 4
+
+    def test_max_size_from_env(monkeypatch):
+        monkeypatch.setenv("LM_CLIENT_POOL_MAX_SIZE", "5")
+        assert LmClientPool().get_max_size() == 5
+
+    def test_invalidate_provider():
+        pool = LmClientPool(max_size=4)
+        create_client = ClientFactory()
+        client_openai = pool.get_or_create("openai", "aif://model/a", [], False, create_client)
+        client_ollama = pool.get_or_create("ollama", "aif://model/b", [], False, create_client)
+
+        pool.invalidate_provider("openai")
+        assert pool.get_or_create("openai", "aif://model/a", [], False, create_client) is not client_openai
+        assert pool.get_or_create("ollama", "aif://model/b", [], False, create_client) is client_ollama
@@ -0,0 +1,93 @@
+import os
+import time
+import asyncio
+from typing import Dict, List
+from llm.i_lm_provider import ILmProvider
+
+
+DEFAULT_LM_HEALTH_CHECK_INTERVAL_SECONDS = 30
+DEFAULT_LM_HEALTH_CHECK_TTL_SECONDS = 60
+DEFAULT_LM_HEALTH_CHECK_TIMEOUT_SECONDS = 5
+
+
+class LmHealthMonitor:
+    """
+    Probe all the providers concurrently in the background and cache their health status, so the request path never
+    waits for a network probe. A read of a status older than the TTL schedules an extra probe.
+    """
+    def __init__(self, providers: List[ILmProvider]):
+        self.providers = providers
+        self._healthMap: Dict[str, bool] = {}
+        self._updatedAt: float | None = None
+        self._task: asyncio.Task | None = None
+        self._refreshTask: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def getHealthMap(self) -> Dict[str, bool]:
+        self._refreshIfExpired()
+        return dict(self._healthMap)
+
+    def isHealthy(self, provider_id: str) -> bool:
+        self._refreshIfExpired()
+        return self._healthMap.get(provider_id, False)
+
+    async def refresh(self):
+        timeout = _getEnvNumber("LM_HEALTH_CHECK_TIMEOUT_SECONDS", DEFAULT_LM_HEALTH_CHECK_TIMEOUT_SECONDS)
+        results = await asyncio.gather(*[self._probe(provider, timeout) for provider in self.providers])
+        for provider, healthy in zip(self.providers, results):
+            self._healthMap[provider.getId()] = healthy
+            if hasattr(provider, "setHealthStatus"):
+                provider.setHealthStatus(healthy)
+        self._updatedAt = time.monotonic()
+
+    def requestRefresh(self):
+        """
+        Schedule a probe without waiting for it, e.g. after the credentials of a provider are updated
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Called from a worker thread, e.g. a sync route handler, hand it over to the loop of the monitor
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self.requestRefresh)
+            return
+        if self._refreshTask is None or self._refreshTask.done():
+            self._refreshTask = asyncio.create_task(self.refresh())
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._refreshTask is not None:
+            self._refreshTask.cancel()
+            self._refreshTask = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(_getEnvNumber("LM_HEALTH_CHECK_INTERVAL_SECONDS", DEFAULT_LM_HEALTH_CHECK_INTERVAL_SECONDS))
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Failed to check the health of the language model providers: {e}")
+
+    async def _probe(self, provider: ILmProvider, timeout: float) -> bool:
+        try:
+            # isHealthy may block on the network, e.g. Ollama
+            return await asyncio.wait_for(asyncio.to_thread(provider.isHealthy), timeout=timeout)
+        except Exception:
+            return False
+
+    def _refreshIfExpired(self):
+        ttl = _getEnvNumber("LM_HEALTH_CHECK_TTL_SECONDS", DEFAULT_LM_HEALTH_CHECK_TTL_SECONDS)
+        if self._updatedAt is None or time.monotonic() - self._updatedAt > ttl:
+            self.requestRefresh()
+
+
+def _getEnvNumber(envVarName: str, default: float) -> float:
+    value = os.environ.get(envVarName)
+    return float(value) if value else default
@@ -0,0 +1,61 @@
+import asyncio
+import time
+from llm.lm_health_monitor import LmHealthMonitor
+
+
+class _MockProvider:
+    def __init__(self, id: str, healthy: bool, delay: float = 0):
+        self.id = id
+        self.healthy = healthy
+        self.delay = delay
+        self.healthStatus = None
+
+    def getId(self) -> str:
+        return self.id
+
+    def isHealthy(self) -> bool:
+        time.sleep(self.delay)
+        if isinstance(self.healthy, Exception):
+            raise self.healthy
+        return self.healthy
+
+    def setHealthStatus(self, healthy: bool):
+        self.healthStatus = healthy
+
+
+def describe_lm_health_monitor():
+    def test_refresh_probes_all_providers():
+        providers = [_MockProvider("p1", True), _MockProvider("p2", False), _MockProvider("p3", Exception("Mock error"))]
+        monitor = LmHealthMonitor(providers)
+        asyncio.run(monitor.refresh())
+        assert monitor.getHealthMap() == { "p1": True, "p2": False, "p3": False }
+        assert providers[0].healthStatus == True and providers[1].healthStatus == False
+
+    def test_refresh_probes_concurrently():
+        providers = [_MockProvider(f"p{i}", True, delay=0.2) for i in range(5)]
+        monitor = LmHealthMonitor(providers)
+        start = time.monotonic()
+        asyncio.run(monitor.refresh())
+        assert time.monotonic() - start < 0.8
+
+    def test_slow_provider_times_out(monkeypatch):
+        monkeypatch.setenv("LM_HEALTH_CHECK_TIMEOUT_SECONDS", "0.1")
+        monitor = LmHealthMonitor([_MockProvider("p1", True, delay=0.5)])
+        asyncio.run(monitor.refresh())
+        assert monitor.isHealthy("p1") == False
+
+    def test_provider_is_unhealthy_until_probed():
+        monitor = LmHealthMonitor([_MockProvider("p1", True)])
+        assert monitor.isHealthy("p1") == False
+
+    def test_stop_cancels_pending_refresh():
+        async def run():
+            monitor = LmHealthMonitor([_MockProvider("p1", True, delay=0.2)])
+            monitor.requestRefresh()
+            refresh_task = monitor._refreshTask
+            await monitor.stop()
+            await asyncio.sleep(0)
+            return refresh_task
+
+        refresh_task = asyncio.run(run())
+        assert refresh_task.cancelled()
@@ -1,5 +1,6 @@
 import os, dotenv
 from typing import List, Callable
+from fastapi import HTTPException
 from langchain_core.language_models.base import BaseLanguageModel
 from langchain_core.embeddings.embeddings import Embeddings
 from langchain_community.chat_models import ChatOllama
@@ -10,7 +11,9 @@ from aif_types.llm import LlmProvider
 from llm.lm_base_provider import LmBaseProvider, LmBaseProviderProps
 from llm.llm_tools_utils import create_tool
 from llm.llm_uri_utils import BaseLlmInfo
-from .model_info.ollama_utils import download_model, get_local_model_map, get_host, health_check
+from aif_types.ollama import OllamaPullJobInfo
+from .model_info.ollama_utils import get_host, health_check
+from .model_info.ollama_model_manager import OllamaModelManager, OllamaUnavailableError, PULL_STATUS_ERROR
 from utils.file_utils import read_json_file
 
 
@@ -23,6 +26,7 @@ class LmProviderOllama(LmBaseProvider):
             jsonFileName="model_info/ollama_models.json",
             keyPrefix="OLLAMA_",
         ))
+        self.modelManager = OllamaModelManager()
 
     def isHealthy(self) -> bool:
         return health_check()    
@@ -75,18 +79,25 @@ class LmProviderOllama(LmBaseProvider):
         self._updateLmProviderStandardFields(dotenv_file, request, self.props.keyPrefix)
 
 
+    def listPullJobs(self) -> List[OllamaPullJobInfo]:
+        return self.modelManager.listPullJobs()
+
+
     def _checkLocalModel(self, baseLlmInfo: BaseLlmInfo):
-        def _get_local_model_map():
-            try:
-                return get_local_model_map()
-            except Exception:
-                return {}
-
-        local_model_map = _get_local_model_map()
-        if baseLlmInfo.model_name not in local_model_map:
-            # Try to download model and retry
-            download_model(baseLlmInfo.model_name)
-
-            local_model_map = _get_local_model_map()
-            if baseLlmInfo.model_name not in local_model_map:
-                raise Exception("Model not downloaded")
+        """
+        Fail fast when the model is not available locally, the model is pulled in the background meanwhile
+        """
+        try:
+            localModelMap = self.modelManager.getLocalModelMap()
+        except OllamaUnavailableError:
+            raise HTTPException(status_code=503, detail="Ollama is unavailable, please check that it's running")
+        if baseLlmInfo.model_name in localModelMap:
+            return
+
+        previous_job = self.modelManager.getPullJob(baseLlmInfo.model_name)
+        job = self.modelManager.pullModel(baseLlmInfo.model_name)
+        if previous_job is not None and previous_job.status == PULL_STATUS_ERROR:
+            raise HTTPException(status_code=503, detail=f"Failed to download model {baseLlmInfo.model_name}: {previous_job.error}, retrying")
+
+        progress = f" ({int(job.completed * 100 / job.total)}%)" if job.total > 0 else ""
+        raise HTTPException(status_code=503, detail=f"Model {baseLlmInfo.model_name} is downloading{progress}, please try again later")
@@ -0,0 +1,20 @@
+import pytest
+from fastapi import HTTPException
+from aif_types.llm import LlmProvider
+from llm.llm_uri_utils import BaseLlmInfo
+from llm.lm_provider_ollama import LmProviderOllama
+
+
+def describe_checkLocalModel():
+    def test_ollama_unavailable(monkeypatch):
+        def mock_get_local_model_map():
+            raise Exception("Connection refused")
+        monkeypatch.setattr("llm.model_info.ollama_model_manager.get_local_model_map", mock_get_local_model_map)
+
+        provider = LmProviderOllama()
+        with pytest.raises(HTTPException) as e:
+            provider._checkLocalModel(BaseLlmInfo(LlmProvider.OLLAMA, "llama3", None))
+        assert e.value.status_code == 503
+        assert "unavailable" in e.value.detail
+        # No pull is started for a model which may well be there
+        assert provider.listPullJobs() == []
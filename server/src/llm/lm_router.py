@@ -0,0 +1,180 @@
+import os
+import time
+import random
+import threading
+from enum import Enum
+from typing import Callable, Dict, List
+from fastapi import HTTPException
+from database.database_manager import DatabaseManager
+from llm.i_lm_provider import ILmProvider
+from utils.aif_utils import is_aif_alias_uri
+
+
+DEFAULT_LM_ROUTER_EWMA_ALPHA = 0.3
+DEFAULT_LM_ROUTER_FAILURE_THRESHOLD = 5
+DEFAULT_LM_ROUTER_OPEN_SECONDS = 30
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"           # The backend is used
+    OPEN = "open"               # The backend failed repeatedly, it's only the last resort
+    HALF_OPEN = "half_open"     # A single probe request decides whether the circuit is closed again
+
+
+class _BackendStats:
+    def __init__(self):
+        self.ewma_ttft_seconds: float | None = None
+        self.ewma_error_rate = 0.0
+        self.consecutive_failures = 0
+        self.state = CircuitState.CLOSED
+        self.opened_at = 0.0
+        self.probe_started_at: float | None = None
+
+
+class LmRouter:
+    """
+    Resolve the model aliases (aif://aliases/{name}) to the order in which their backends are tried, the next backends
+    are used for failover.
+    Each backend has a circuit breaker: it's opened after `LM_ROUTER_FAILURE_THRESHOLD` consecutive failures, and after
+    `LM_ROUTER_OPEN_SECONDS` one request probes it (half-open) by trying it first. Then the available backends come, then
+    the ones of the unhealthy providers, then the ones with an open circuit. The available backends are shuffled by the weight of the
+    provider (`{PREFIX}MODELS_DEFAULT_WEIGHT`) scaled down by the EWMA of the time to first token relative to the fastest
+    backend and by the EWMA of the error rate, so the fastest healthy backend gets most of the traffic.
+    """
+    def __init__(self, database_manager: DatabaseManager, get_lm_provider: Callable[[str], ILmProvider | None], is_healthy: Callable[[str], bool]):
+        self.database_manager = database_manager
+        self.get_lm_provider = get_lm_provider
+        self.is_healthy = is_healthy
+        self._aliases: Dict[str, List[str]] = {}        # Key: alias uri; Value: basemodel uris
+        self._stats: Dict[str, _BackendStats] = {}      # Key: basemodel uri
+        self._lock = threading.Lock()
+        # Bumped by invalidate and clear, an alias read before them is not cached
+        self._generation = 0
+
+    def get_backends(self, model_uri: str) -> List[str]:
+        if not is_aif_alias_uri(model_uri):
+            return [model_uri]
+
+        basemodel_uris = self._get_basemodel_uris(model_uri)
+        probe_backends = []
+        available_backends = []
+        unhealthy_backends = []
+        open_backends = []
+        with self._lock:
+            for basemodel_uri in basemodel_uris:
+                lm_provider = self.get_lm_provider(basemodel_uri)
+                is_healthy = lm_provider is not None and self.is_healthy(lm_provider.getId())
+
+                if not self._is_circuit_closed(basemodel_uri):
+                    # The probe goes first, so the request which claims it actually uses the backend
+                    if is_healthy and self._claim_probe(basemodel_uri):
+                        probe_backends.append(basemodel_uri)
+                    else:
+                        open_backends.append(basemodel_uri)
+                elif is_healthy:
+                    available_backends.append(basemodel_uri)
+                else:
+                    unhealthy_backends.append(basemodel_uri)
+
+            return probe_backends + self._shuffle_by_score(available_backends) + self._shuffle_by_score(unhealthy_backends) + open_backends
+
+    def record_success(self, basemodel_uri: str, ttft_seconds: float):
+        alpha = _get_env_number("LM_ROUTER_EWMA_ALPHA", DEFAULT_LM_ROUTER_EWMA_ALPHA)
+        with self._lock:
+            stats = self._stats.setdefault(basemodel_uri, _BackendStats())
+            stats.ewma_ttft_seconds = ttft_seconds if stats.ewma_ttft_seconds is None else alpha * ttft_seconds + (1 - alpha) * stats.ewma_ttft_seconds
+            stats.ewma_error_rate = (1 - alpha) * stats.ewma_error_rate
+            stats.consecutive_failures = 0
+            stats.state = CircuitState.CLOSED
+            stats.probe_started_at = None
+
+    def record_failure(self, basemodel_uri: str):
+        alpha = _get_env_number("LM_ROUTER_EWMA_ALPHA", DEFAULT_LM_ROUTER_EWMA_ALPHA)
+        with self._lock:
+            stats = self._stats.setdefault(basemodel_uri, _BackendStats())
+            stats.ewma_error_rate = alpha + (1 - alpha) * stats.ewma_error_rate
+            stats.consecutive_failures += 1
+            if stats.state == CircuitState.HALF_OPEN or stats.consecutive_failures >= _get_env_number("LM_ROUTER_FAILURE_THRESHOLD", DEFAULT_LM_ROUTER_FAILURE_THRESHOLD):
+                stats.state = CircuitState.OPEN
+                stats.opened_at = time.monotonic()
+                stats.probe_started_at = None
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                basemodel_uri: {
+                    "ewma_ttft_seconds": stats.ewma_ttft_seconds,
+                    "ewma_error_rate": stats.ewma_error_rate,
+                    "consecutive_failures": stats.consecutive_failures,
+                    "circuit_state": stats.state.value,
+                } for basemodel_uri, stats in self._stats.items()
+            }
+
+    def invalidate(self, alias_uri: str):
+        with self._lock:
+            self._aliases.pop(alias_uri, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._aliases.clear()
+            self._stats.clear()
+            self._generation += 1
+
+    def _get_basemodel_uris(self, alias_uri: str) -> List[str]:
+        with self._lock:
+            basemodel_uris = self._aliases.get(alias_uri)
+            generation = self._generation
+        if basemodel_uris is not None:
+            return basemodel_uris
+
+        # The other requests don't wait for the database
+        model_alias = self.database_manager.get_model_alias_by_uri(alias_uri)
+        if model_alias is None or len(model_alias.basemodel_uris) == 0:
+            raise HTTPException(status_code=404, detail="Model alias not found")
+        with self._lock:
+            if generation == self._generation:
+                self._aliases[alias_uri] = model_alias.basemodel_uris
+        return model_alias.basemodel_uris
+
+    def _is_circuit_closed(self, basemodel_uri: str) -> bool:
+        stats = self._stats.get(basemodel_uri)
+        return stats is None or stats.state == CircuitState.CLOSED
+
+    def _claim_probe(self, basemodel_uri: str) -> bool:
+        stats = self._stats[basemodel_uri]
+        now = time.monotonic()
+        open_seconds = _get_env_number("LM_ROUTER_OPEN_SECONDS", DEFAULT_LM_ROUTER_OPEN_SECONDS)
+        if stats.state == CircuitState.OPEN and now - stats.opened_at >= open_seconds:
+            stats.state = CircuitState.HALF_OPEN
+
+        # Only one probe at a time, a probe which never reported back (e.g. cancelled) expires
+        if stats.state == CircuitState.HALF_OPEN and (stats.probe_started_at is None or now - stats.probe_started_at >= open_seconds):
+            stats.probe_started_at = now
+            return True
+        return False
+
+    def _shuffle_by_score(self, basemodel_uris: List[str]) -> List[str]:
+        ttfts = [self._stats[uri].ewma_ttft_seconds for uri in basemodel_uris if uri in self._stats and self._stats[uri].ewma_ttft_seconds]
+        fastest_ttft = min(ttfts) if len(ttfts) > 0 else None
+
+        # Weighted random order without replacement: sort by random() ^ (1 / weight)
+        keys = {}
+        for basemodel_uri in basemodel_uris:
+            lm_provider = self.get_lm_provider(basemodel_uri)
+            weight = lm_provider.getWeight() if lm_provider is not None else 0
+
+            stats = self._stats.get(basemodel_uri)
+            if stats is not None:
+                # The backends without measurements yet keep their weight, so they are explored
+                if stats.ewma_ttft_seconds and fastest_ttft is not None:
+                    weight *= (fastest_ttft / stats.ewma_ttft_seconds) ** 2
+                weight *= 1 - stats.ewma_error_rate
+
+            keys[basemodel_uri] = random.random() ** (1.0 / weight) if weight > 0 else -1
+        return sorted(basemodel_uris, key=lambda basemodel_uri: keys[basemodel_uri], reverse=True)
+
+
+def _get_env_number(envVarName: str, default: float) -> float:
+    value = os.environ.get(envVarName)
+    return float(value) if value else default
@@ -0,0 +1,159 @@
+import time
+import pytest
+from unittest import mock
+from fastapi import HTTPException
+from aif_types.aliases import ModelAliasEntity
+from llm.lm_router import LmRouter
+
+
+class FakeLmProvider:
+    def __init__(self, id: str, weight: int):
+        self.id = id
+        self.weight = weight
+
+    def getId(self) -> str:
+        return self.id
+
+    def getWeight(self) -> int:
+        return self.weight
+
+
+def describe_lm_router():
+    @pytest.fixture
+    def providers():
+        return { "openai": FakeLmProvider("openai", 300), "azureopenai": FakeLmProvider("azureopenai", 100), "ollama": FakeLmProvider("ollama", 100) }
+
+    def _create_router(providers, basemodel_uris, unhealthy_provider_ids=[]):
+        database_manager = mock.MagicMock()
+        database_manager.get_model_alias_by_uri.return_value = ModelAliasEntity(
+            id="alias-1",
+            name="gpt",
+            alias_uri="aif://aliases/gpt",
+            basemodel_uris=basemodel_uris,
+        )
+        return LmRouter(
+            database_manager,
+            lambda uri: providers.get(uri.split("://")[0]),
+            lambda provider_id: provider_id not in unhealthy_provider_ids,
+        )
+
+    def test_non_alias_uri(providers):
+        router = _create_router(providers, [])
+        assert router.get_backends("openai://gpt-4o") == ["openai://gpt-4o"]
+        router.database_manager.get_model_alias_by_uri.assert_not_called()
+
+    def test_distributes_by_weight(providers):
+        router = _create_router(providers, ["openai://gpt-4o", "azureopenai://gpt-4o"])
+        first_backends = [router.get_backends("aif://aliases/gpt")[0] for _ in range(2000)]
+        # 300 : 100
+        assert 0.7 < first_backends.count("openai://gpt-4o") / len(first_backends) < 0.8
+        router.database_manager.get_model_alias_by_uri.assert_called_once()
+
+    def test_unhealthy_backends_are_last(providers):
+        router = _create_router(providers, ["openai://gpt-4o", "azureopenai://gpt-4o", "ollama://llama3.1"], unhealthy_provider_ids=["openai"])
+        for _ in range(20):
+            backends = router.get_backends("aif://aliases/gpt")
+            assert backends[-1] == "openai://gpt-4o"
+            assert set(backends[:2]) == { "azureopenai://gpt-4o", "ollama://llama3.1" }
+
+    def test_alias_not_found(providers):
+        router = _create_router(providers, [])
+        router.database_manager.get_model_alias_by_uri.return_value = None
+        with pytest.raises(HTTPException) as e:
+            router.get_backends("aif://aliases/missing")
+        assert e.value.status_code == 404
+
+    def test_reads_the_alias_outside_the_lock(providers):
+        router = _create_router(providers, ["openai://gpt-4o"])
+        model_alias = router.database_manager.get_model_alias_by_uri.return_value
+
+        def get_model_alias_by_uri(alias_uri):
+            assert not router._lock.locked()
+            return model_alias
+        router.database_manager.get_model_alias_by_uri.side_effect = get_model_alias_by_uri
+        assert router.get_backends("aif://aliases/gpt") == ["openai://gpt-4o"]
+
+    def test_invalidate(providers):
+        router = _create_router(providers, ["openai://gpt-4o"])
+        router.get_backends("aif://aliases/gpt")
+        router.invalidate("aif://aliases/gpt")
+        router.get_backends("aif://aliases/gpt")
+        assert router.database_manager.get_model_alias_by_uri.call_count == 2
+
+    def test_does_not_cache_an_alias_read_before_invalidate(providers):
+        router = _create_router(providers, ["openai://gpt-4o"])
+        model_alias = router.database_manager.get_model_alias_by_uri.return_value
+
+        def get_model_alias_by_uri_and_update(alias_uri):
+            # The alias is updated before the read returns
+            router.invalidate(alias_uri)
+            return model_alias
+        router.database_manager.get_model_alias_by_uri.side_effect = get_model_alias_by_uri_and_update
+        assert router.get_backends("aif://aliases/gpt") == ["openai://gpt-4o"]
+
+        router.database_manager.get_model_alias_by_uri.side_effect = None
+        router.database_manager.get_model_alias_by_uri.return_value = model_alias.model_copy(update={ "basemodel_uris": ["ollama://llama3.1"] })
+        assert router.get_backends("aif://aliases/gpt") == ["ollama://llama3.1"]
+
+
+def describe_lm_router_scoring():
+    @pytest.fixture
+    def router(monkeypatch):
+        monkeypatch.setenv("LM_ROUTER_FAILURE_THRESHOLD", "2")
+        monkeypatch.setenv("LM_ROUTER_OPEN_SECONDS", "0.05")
+        providers = { "openai": FakeLmProvider("openai", 100), "azureopenai": FakeLmProvider("azureopenai", 100) }
+        database_manager = mock.MagicMock()
+        database_manager.get_model_alias_by_uri.return_value = ModelAliasEntity(
+            id="alias-1",
+            name="gpt",
+            alias_uri="aif://aliases/gpt",
+            basemodel_uris=["openai://gpt-4o", "azureopenai://gpt-4o"],
+        )
+        return LmRouter(database_manager, lambda uri: providers.get(uri.split("://")[0]), lambda provider_id: True)
+
+    def test_prefers_the_fastest_backend(router):
+        for _ in range(5):
+            router.record_success("openai://gpt-4o", 0.2)
+            router.record_success("azureopenai://gpt-4o", 1.0)
+        first_backends = [router.get_backends("aif://aliases/gpt")[0] for _ in range(1000)]
+        assert first_backends.count("openai://gpt-4o") / len(first_backends) > 0.9
+
+    def test_opens_the_circuit_after_repeated_failures(router):
+        router.record_failure("openai://gpt-4o")
+        router.record_failure("openai://gpt-4o")
+        assert router.get_metrics()["openai://gpt-4o"]["circuit_state"] == "open"
+        for _ in range(20):
+            assert router.get_backends("aif://aliases/gpt") == ["azureopenai://gpt-4o", "openai://gpt-4o"]
+
+    def test_half_open_probe_closes_the_circuit_on_success(router):
+        router.record_failure("openai://gpt-4o")
+        router.record_failure("openai://gpt-4o")
+        time.sleep(0.06)
+
+        # Only one request probes the backend, it tries it first
+        probes = [router.get_backends("aif://aliases/gpt") for _ in range(20)]
+        assert probes[0] == ["openai://gpt-4o", "azureopenai://gpt-4o"]
+        assert all(backends == ["azureopenai://gpt-4o", "openai://gpt-4o"] for backends in probes[1:])
+        assert router.get_metrics()["openai://gpt-4o"]["circuit_state"] == "half_open"
+
+        router.record_success("openai://gpt-4o", 0.5)
+        assert router.get_metrics()["openai://gpt-4o"]["circuit_state"] == "closed"
+
+    def test_no_probe_for_an_unhealthy_provider(router, monkeypatch):
+        router.record_failure("openai://gpt-4o")
+        router.record_failure("openai://gpt-4o")
+        time.sleep(0.06)
+        monkeypatch.setattr(router, "is_healthy", lambda provider_id: provider_id != "openai")
+        assert router.get_backends("aif://aliases/gpt") == ["azureopenai://gpt-4o", "openai://gpt-4o"]
+
+        # The probe is still available once the provider is healthy
+        monkeypatch.setattr(router, "is_healthy", lambda provider_id: True)
+        assert router.get_backends("aif://aliases/gpt")[0] == "openai://gpt-4o"
+
+    def test_half_open_probe_failure_opens_the_circuit_again(router):
+        router.record_failure("openai://gpt-4o")
+        router.record_failure("openai://gpt-4o")
+        time.sleep(0.06)
+        router.get_backends("aif://aliases/gpt")
+        router.record_failure("openai://gpt-4o")
+        assert router.get_metrics()["openai://gpt-4o"]["circuit_state"] == "open"
@@ -0,0 +1,161 @@
+import os
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Tuple
+from fastapi import HTTPException
+
+
+DEFAULT_LM_SCHEDULER_QUEUE_TIMEOUT_SECONDS = 60
+
+
+class TokenBucket:
+    """
+    Bucket of `capacity` tokens refilled over a minute. A request reserves its tokens right away, even if the bucket
+    goes negative, and waits until the bucket is back to zero, so the waiting requests are served in order.
+    """
+    def __init__(self, capacity_per_minute: int):
+        self.capacity = capacity_per_minute
+        self._tokens = float(capacity_per_minute)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Reserve the tokens and return the seconds to wait before using them
+        """
+        if amount > self.capacity:
+            raise ValueError(f"Can't reserve {amount} tokens from a bucket of {self.capacity}")
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return 0 if self._tokens >= 0 else -self._tokens * 60 / self.capacity
+
+    def refund(self, amount: float):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens + amount, self.capacity)
+
+    def consume(self, amount: float):
+        """
+        Take the tokens without waiting, e.g. the tokens of a response which are only known afterwards
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._updated_at) * self.capacity / 60, self.capacity)
+        self._updated_at = now
+
+
+class _ModelLane:
+    def __init__(self, max_concurrency: int, rpm: int, tpm: int):
+        self.limits = (max_concurrency, rpm, tpm)
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self.request_bucket = TokenBucket(rpm) if rpm > 0 else None
+        self.token_bucket = TokenBucket(tpm) if tpm > 0 else None
+
+
+class LmScheduler:
+    """
+    Keep the requests of each model within the quota of its provider instead of failing with 429: at most
+    `{PREFIX}MAX_CONCURRENCY` requests in flight, `{PREFIX}RPM` requests and `{PREFIX}TPM` tokens per minute, where
+    PREFIX is the key prefix of the provider, e.g. "AZURE_OPENAI_". The limits apply to each model separately, 0 or
+    unset means no limit. A request waits in the queue up to `LM_SCHEDULER_QUEUE_TIMEOUT_SECONDS`, a request with more
+    tokens than `{PREFIX}TPM` is rejected right away.
+    """
+    def __init__(self, get_key_prefix: Callable[[str], str | None]):
+        self.get_key_prefix = get_key_prefix
+        self._lanes: Dict[str, _ModelLane] = {}     # Key: model uri
+
+    @asynccontextmanager
+    async def acquire(self, model_uri: str, estimated_tokens: int) -> AsyncIterator[None]:
+        lane = self._get_lane(model_uri)
+        deadline = time.monotonic() + _get_env_number("LM_SCHEDULER_QUEUE_TIMEOUT_SECONDS", DEFAULT_LM_SCHEDULER_QUEUE_TIMEOUT_SECONDS)
+
+        if lane.semaphore is not None:
+            try:
+                await asyncio.wait_for(lane.semaphore.acquire(), timeout=max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                raise _create_busy_exception(model_uri)
+
+        try:
+            await self._wait_for_bucket(lane.request_bucket, 1, deadline, model_uri)
+            try:
+                await self._wait_for_bucket(lane.token_bucket, estimated_tokens, deadline, model_uri)
+            except (HTTPException, asyncio.CancelledError):
+                # The request is not sent, give its slot of the request quota back
+                if lane.request_bucket is not None:
+                    lane.request_bucket.refund(1)
+                raise
+            yield
+        finally:
+            if lane.semaphore is not None:
+                lane.semaphore.release()
+
+    def record_tokens(self, model_uri: str, tokens: int):
+        """
+        Count the tokens of a response against the token quota
+        """
+        lane = self._lanes.get(model_uri)
+        if lane is not None and lane.token_bucket is not None:
+            lane.token_bucket.consume(tokens)
+
+    def refresh(self):
+        """
+        Apply the changed limits. Only the lanes whose limits changed are replaced, the others keep counting their
+        requests in flight
+        """
+        for model_uri, lane in list(self._lanes.items()):
+            if self._get_limits(model_uri) != lane.limits:
+                self._lanes.pop(model_uri, None)
+
+    def _get_lane(self, model_uri: str) -> _ModelLane:
+        lane = self._lanes.get(model_uri)
+        if lane is None:
+            lane = _ModelLane(*self._get_limits(model_uri))
+            self._lanes[model_uri] = lane
+        return lane
+
+    def _get_limits(self, model_uri: str) -> Tuple[int, int, int]:
+        """
+        Return the max concurrency, rpm and tpm of the model
+        """
+        key_prefix = self.get_key_prefix(model_uri)
+        if key_prefix is None:
+            return 0, 0, 0
+        return (
+            int(_get_env_number(key_prefix + "MAX_CONCURRENCY", 0)),
+            int(_get_env_number(key_prefix + "RPM", 0)),
+            int(_get_env_number(key_prefix + "TPM", 0)),
+        )
+
+    async def _wait_for_bucket(self, bucket: TokenBucket | None, amount: float, deadline: float, model_uri: str):
+        if bucket is None:
+            return
+        if amount > bucket.capacity:
+            # It would never fit into the quota per minute
+            raise HTTPException(status_code=413, detail=f"The request is larger than the quota of model {model_uri}")
+
+        wait_seconds = bucket.reserve(amount)
+        if time.monotonic() + wait_seconds > deadline:
+            bucket.refund(amount)
+            raise _create_busy_exception(model_uri)
+        if wait_seconds > 0:
+            try:
+                await asyncio.sleep(wait_seconds)
+            except asyncio.CancelledError:
+                bucket.refund(amount)
+                raise
+
+
+def _create_busy_exception(model_uri: str) -> HTTPException:
+    return HTTPException(status_code=429, detail=f"Model {model_uri} is busy, please try again later")
+
+
+def _get_env_number(envVarName: str, default: float) -> float:
+    value = os.environ.get(envVarName)
+    return float(value) if value else default
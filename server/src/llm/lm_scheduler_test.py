@@ -0,0 +1,143 @@
+import time
+import asyncio
+import pytest
+from fastapi import HTTPException
+from llm.lm_scheduler import LmScheduler, TokenBucket
+
+
+def describe_token_bucket():
+    def test_reserve_within_capacity():
+        bucket = TokenBucket(60)
+        assert bucket.reserve(30) == 0
+        assert bucket.reserve(30) == 0
+
+    def test_reserve_beyond_capacity_waits_for_the_refill():
+        bucket = TokenBucket(60)
+        bucket.reserve(60)
+        # 1 token per second
+        assert bucket.reserve(2) == pytest.approx(2, abs=0.1)
+
+    def test_reserve_more_than_capacity():
+        with pytest.raises(ValueError):
+            TokenBucket(60).reserve(61)
+
+    def test_refund():
+        bucket = TokenBucket(60)
+        bucket.reserve(60)
+        bucket.refund(30)
+        assert bucket.reserve(30) == 0
+        assert bucket.reserve(1) > 0
+
+
+def describe_lm_scheduler():
+    def test_limits_the_requests_in_flight(monkeypatch):
+        monkeypatch.setenv("TEST_MAX_CONCURRENCY", "2")
+        scheduler = LmScheduler(lambda model_uri: "TEST_")
+        in_flight = []
+        max_in_flight = []
+
+        async def request():
+            async with scheduler.acquire("test://model", 10):
+                in_flight.append(1)
+                max_in_flight.append(len(in_flight))
+                await asyncio.sleep(0.02)
+                in_flight.pop()
+
+        async def run():
+            await asyncio.gather(*[request() for _ in range(5)])
+
+        asyncio.run(run())
+        assert max(max_in_flight) == 2
+
+    def test_refresh_keeps_the_requests_in_flight(monkeypatch):
+        monkeypatch.setenv("TEST_MAX_CONCURRENCY", "1")
+        monkeypatch.setenv("LM_SCHEDULER_QUEUE_TIMEOUT_SECONDS", "0.01")
+        scheduler = LmScheduler(lambda model_uri: "TEST_")
+
+        async def run():
+            async with scheduler.acquire("test://model", 10):
+                lane = scheduler._get_lane("test://model")
+                # The limits didn't change, the request in flight still counts
+                scheduler.refresh()
+                assert scheduler._get_lane("test://model") is lane
+                with pytest.raises(HTTPException) as e:
+                    async with scheduler.acquire("test://model", 10):
+                        pass
+                assert e.value.status_code == 429
+
+                monkeypatch.setenv("TEST_MAX_CONCURRENCY", "2")
+                scheduler.refresh()
+                assert scheduler._get_lane("test://model").limits == (2, 0, 0)
+
+        asyncio.run(run())
+
+    def test_waits_for_the_request_quota(monkeypatch):
+        monkeypatch.setenv("TEST_RPM", "600")     # 10 requests per second
+        scheduler = LmScheduler(lambda model_uri: "TEST_")
+
+        async def request():
+            async with scheduler.acquire("test://model", 10):
+                pass
+
+        async def run():
+            await asyncio.gather(*[request() for _ in range(601)])
+
+        start = time.monotonic()
+        asyncio.run(run())
+        assert time.monotonic() - start >= 0.09
+
+    def test_rejects_after_the_queue_timeout(monkeypatch):
+        monkeypatch.setenv("TEST_TPM", "60")
+        monkeypatch.setenv("LM_SCHEDULER_QUEUE_TIMEOUT_SECONDS", "1")
+        scheduler = LmScheduler(lambda model_uri: "TEST_")
+
+        async def run():
+            async with scheduler.acquire("test://model", 60):
+                pass
+            # The next 60 tokens are only available in a minute
+            async with scheduler.acquire("test://model", 60):
+                pass
+
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(run())
+        assert e.value.status_code == 429
+
+    def test_timeout_gives_the_request_quota_back(monkeypatch):
+        monkeypatch.setenv("TEST_RPM", "60")
+        monkeypatch.setenv("TEST_TPM", "60")
+        monkeypatch.setenv("LM_SCHEDULER_QUEUE_TIMEOUT_SECONDS", "1")
+        scheduler = LmScheduler(lambda model_uri: "TEST_")
+
+        async def run():
+            async with scheduler.acquire("test://model", 60):
+                pass
+            for _ in range(3):
+                with pytest.raises(HTTPException) as e:
+                    async with scheduler.acquire("test://model", 60):
+                        pass
+                assert e.value.status_code == 429
+
+        asyncio.run(run())
+        # Only the request which was let through counts
+        assert scheduler._lanes["test://model"].request_bucket._tokens == pytest.approx(59, abs=0.1)
+
+    def test_rejects_requests_larger_than_the_quota(monkeypatch):
+        monkeypatch.setenv("TEST_TPM", "60")
+        scheduler = LmScheduler(lambda model_uri: "TEST_")
+
+        async def run():
+            async with scheduler.acquire("test://model", 61):
+                pass
+
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(run())
+        assert e.value.status_code == 413
+
+    def test_no_limits_for_unknown_provider():
+        scheduler = LmScheduler(lambda model_uri: None)
+
+        async def run():
+            async with scheduler.acquire("unknown://model", 1000000):
+                pass
+
+        asyncio.run(run())
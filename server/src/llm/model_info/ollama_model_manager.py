@@ -0,0 +1,114 @@
+import os
+import time
+import threading
+from typing import Dict, List
+from aif_types.ollama import OllamaModelInfo, OllamaPullJobInfo
+from .ollama_utils import get_local_model_map, pull_model
+
+
+DEFAULT_OLLAMA_MODEL_MAP_TTL_SECONDS = 30
+
+PULL_STATUS_SUCCESS = "success"
+PULL_STATUS_ERROR = "error"
+
+
+class OllamaUnavailableError(Exception):
+    pass
+
+
+class OllamaModelManager:
+    """
+    Keep the local model map of Ollama with a TTL and pull the missing models in the background.
+    After the TTL, the map is refreshed in the background while the previous one is still returned.
+    A failed refresh is not cached, the next read asks Ollama again.
+    """
+    def __init__(self):
+        self._localModelMap: Dict[str, OllamaModelInfo] | None = None
+        self._updatedAt: float = 0
+        self._refreshing = False
+        self._pullJobs: Dict[str, OllamaPullJobInfo] = {}   # Key: model name
+        self._lock = threading.Lock()
+
+    def getLocalModelMap(self) -> Dict[str, OllamaModelInfo]:
+        """
+        Raise OllamaUnavailableError when the model map can't be read from Ollama
+        """
+        localModelMap = self._localModelMap
+        if localModelMap is None:
+            return self.refreshLocalModelMap()
+        if time.monotonic() - self._updatedAt > self._getTtl():
+            self._refreshInBackground()
+        return localModelMap
+
+    def refreshLocalModelMap(self) -> Dict[str, OllamaModelInfo]:
+        try:
+            localModelMap = get_local_model_map()
+        except Exception as e:
+            with self._lock:
+                self._localModelMap = None
+            raise OllamaUnavailableError(str(e))
+        with self._lock:
+            self._localModelMap = localModelMap
+            self._updatedAt = time.monotonic()
+        return localModelMap
+
+    def getPullJob(self, model_name: str) -> OllamaPullJobInfo | None:
+        return self._pullJobs.get(model_name)
+
+    def listPullJobs(self) -> List[OllamaPullJobInfo]:
+        return list(self._pullJobs.values())
+
+    def pullModel(self, model_name: str) -> OllamaPullJobInfo:
+        """
+        Start pulling the model unless it's being pulled, the failed pulls are restarted
+        """
+        with self._lock:
+            job = self._pullJobs.get(model_name)
+            if job is not None and job.status != PULL_STATUS_ERROR:
+                return job
+
+            job = OllamaPullJobInfo(model_name=model_name, status="starting")
+            self._pullJobs[model_name] = job
+
+        threading.Thread(target=self._runPullJob, args=(job,), daemon=True).start()
+        return job
+
+    def _runPullJob(self, job: OllamaPullJobInfo):
+        try:
+            for progress in pull_model(job.model_name):
+                job.status = progress.get("status", job.status)
+                job.completed = progress.get("completed", job.completed)
+                job.total = progress.get("total", job.total)
+        except Exception as e:
+            job.status = PULL_STATUS_ERROR
+            job.error = str(e)
+            return
+
+        job.status = PULL_STATUS_SUCCESS
+        try:
+            self.refreshLocalModelMap()
+        except OllamaUnavailableError:
+            pass
+        with self._lock:
+            # The model is in the local model map now
+            self._pullJobs.pop(job.model_name, None)
+
+    def _refreshInBackground(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self.refreshLocalModelMap()
+            except OllamaUnavailableError as e:
+                print(f"Failed to refresh the Ollama model map: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _getTtl(self) -> float:
+        ttl = os.environ.get("OLLAMA_MODEL_MAP_TTL_SECONDS")
+        return float(ttl) if ttl else DEFAULT_OLLAMA_MODEL_MAP_TTL_SECONDS
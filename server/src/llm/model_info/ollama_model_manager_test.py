@@ -0,0 +1,81 @@
+import time
+import pytest
+from aif_types.ollama import OllamaModelInfo
+from llm.model_info.ollama_model_manager import OllamaModelManager, OllamaUnavailableError, PULL_STATUS_ERROR
+
+
+def describe_ollama_model_manager():
+    @pytest.fixture
+    def local_models(monkeypatch):
+        local_models = {}
+        calls = []
+        def mock_get_local_model_map():
+            calls.append(1)
+            return dict(local_models)
+        monkeypatch.setattr("llm.model_info.ollama_model_manager.get_local_model_map", mock_get_local_model_map)
+        return local_models, calls
+
+    def test_local_model_map_is_cached(local_models):
+        models, calls = local_models
+        models["model1"] = _create_model_info("model1")
+        manager = OllamaModelManager()
+        assert "model1" in manager.getLocalModelMap()
+        assert "model1" in manager.getLocalModelMap()
+        assert len(calls) == 1
+
+    def test_local_model_map_is_refreshed_after_ttl(local_models, monkeypatch):
+        monkeypatch.setenv("OLLAMA_MODEL_MAP_TTL_SECONDS", "0")
+        models, calls = local_models
+        manager = OllamaModelManager()
+        assert "model1" not in manager.getLocalModelMap()
+        models["model1"] = _create_model_info("model1")
+        manager.getLocalModelMap()
+        _wait_until(lambda: "model1" in manager.getLocalModelMap())
+
+    def test_failure_is_not_cached(local_models, monkeypatch):
+        models, calls = local_models
+        def mock_get_local_model_map():
+            calls.append(1)
+            raise Exception("Connection refused")
+        monkeypatch.setattr("llm.model_info.ollama_model_manager.get_local_model_map", mock_get_local_model_map)
+
+        manager = OllamaModelManager()
+        with pytest.raises(OllamaUnavailableError):
+            manager.getLocalModelMap()
+        with pytest.raises(OllamaUnavailableError):
+            manager.getLocalModelMap()
+        assert len(calls) == 2
+
+    def test_pull_model(local_models, monkeypatch):
+        models, _ = local_models
+        def mock_pull_model(model_name: str):
+            yield { "status": "downloading", "completed": 50, "total": 100 }
+            models[model_name] = _create_model_info(model_name)
+        monkeypatch.setattr("llm.model_info.ollama_model_manager.pull_model", mock_pull_model)
+
+        manager = OllamaModelManager()
+        manager.pullModel("model1")
+        _wait_until(lambda: "model1" in manager.getLocalModelMap())
+        assert manager.getPullJob("model1") is None
+
+    def test_pull_model_failure(local_models, monkeypatch):
+        def mock_pull_model(model_name: str):
+            raise Exception("Mock error")
+            yield
+        monkeypatch.setattr("llm.model_info.ollama_model_manager.pull_model", mock_pull_model)
+
+        manager = OllamaModelManager()
+        manager.pullModel("model1")
+        _wait_until(lambda: manager.getPullJob("model1").status == PULL_STATUS_ERROR)
+        assert manager.getPullJob("model1").error == "Mock error"
+
+
+def _create_model_info(id: str) -> OllamaModelInfo:
+    return OllamaModelInfo(name=id, id=id, size=1, modified_at="2021-01-01T00:00:00Z")
+
+
+def _wait_until(condition, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
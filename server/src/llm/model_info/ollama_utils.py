@@ -1,9 +1,14 @@
+import json
 import requests
+from typing import Iterator
 from aif_types.ollama import OllamaModelInfo
 from llm.llm_uri_utils import remove_ollama_tag_latest
 from server_config import serverConfig
 
 
+HEALTH_CHECK_TIMEOUT_SECONDS = 3
+
+
 def get_host() -> str:
     """
     Ollama is running in the host machine, however, we prefer host.docker.internal because we only recommend running the server within a Docker container.
@@ -14,7 +19,7 @@ def get_host() -> str:
 def health_check() -> bool:
     url = f"{get_host()}"
     try:
-        response = requests.get(url)
+        response = requests.get(url, timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
     except Exception:
         return False
     return response.status_code == 200
@@ -45,10 +50,19 @@ def get_local_model_map() -> dict[str, OllamaModelInfo]:
         raise e
 
 
-def download_model(model_name: str) -> bool:
+def pull_model(model_name: str) -> Iterator[dict]:
+    """
+    Pull the model and yield the progress from Ollama, e.g. { "status": "downloading", "completed": 123, "total": 456 }
+    """
     url = f"{get_host()}/api/pull"
-    try:
-        response = requests.post(url, json={ "model": model_name})
-        return response.status_code == 200
-    except Exception:
-        return False
+    with requests.post(url, json={ "model": model_name, "stream": True }, stream=True) as response:
+        if response.status_code != 200:
+            raise Exception(f"Failed to pull Ollama model {model_name}")
+
+        for line in response.iter_lines():
+            if not line:
+                continue
+            progress = json.loads(line)
+            if "error" in progress:
+                raise Exception(progress["error"])
+            yield progress
@@ -6,7 +6,6 @@ import requests_mock
 from .ollama_utils import (
     health_check,
     get_local_model_map,
-    download_model,
     list_models,
 )
 from aif_types.llm import LlmProvider
@@ -62,18 +61,6 @@ def test_get_local_model_map_success():
             and result["test_model2"].version == None
 
 
-def test_download_model():
-    with requests_mock.Mocker() as mock:
-        mock.post("http://host.docker.internal:11434/api/pull", status_code=200)
-        result = download_model("test_model")
-        assert result == True
-
-    with requests_mock.Mocker() as mock:
-        mock.post("http://host.docker.internal:11434/api/pull", status_code=400)
-        result = download_model("test_model")
-        assert result == False
-
-
 # def describe_list_models_for_all():
 #     @pytest.fixture(autouse=True)
 #     def setup(monkeypatch):
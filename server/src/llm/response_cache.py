@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List
+from langchain_core.messages import BaseMessage
+
+
+DEFAULT_RESPONSE_CACHE_MAX_ENTRIES = 1024
+DEFAULT_RESPONSE_CACHE_TTL_SECONDS = 3600
+
+
+class _ResponseCacheEntry:
+    def __init__(self, chunks: List[str], expires_at: float):
+        self.chunks = chunks
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    LRU cache of the chat responses keyed by the rendered prompt, see `create_response_cache_key`.
+    The responses are stored as the streamed chunks so a hit is replayed as a stream. The entries expire after
+    `RESPONSE_CACHE_TTL_SECONDS`, and at most `RESPONSE_CACHE_MAX_ENTRIES` are kept (0 disables the cache).
+    """
+    def __init__(self, max_entries: int | None = None, ttl_seconds: float | None = None):
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, _ResponseCacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_max_entries(self) -> int:
+        if self._max_entries is not None:
+            return self._max_entries
+        max_entries = os.environ.get("RESPONSE_CACHE_MAX_ENTRIES")
+        return int(max_entries) if max_entries else DEFAULT_RESPONSE_CACHE_MAX_ENTRIES
+
+    def get_ttl_seconds(self) -> float:
+        if self._ttl_seconds is not None:
+            return self._ttl_seconds
+        ttl_seconds = os.environ.get("RESPONSE_CACHE_TTL_SECONDS")
+        return float(ttl_seconds) if ttl_seconds else DEFAULT_RESPONSE_CACHE_TTL_SECONDS
+
+    def get(self, key: str) -> List[str] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry.chunks
+
+    def put(self, key: str, chunks: List[str]):
+        max_entries = self.get_max_entries()
+        if max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = _ResponseCacheEntry(list(chunks), time.monotonic() + self.get_ttl_seconds())
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def create_response_cache_key(model_uri: str, messages: List[BaseMessage], tools: List[dict]) -> str:
+    """
+    Hash of the resolved model, the rendered prompt messages (system prompt, retrieved context, history and input) and
+    the tool schema
+    """
+    key_dict = {
+        "model_uri": model_uri,
+        "messages": [{ "type": message.type, "content": message.content } for message in messages],
+        "tools": tools,
+    }
+    return hashlib.sha256(json.dumps(key_dict, sort_keys=True, default=str).encode("utf-8")).hexdigest()
@@ -0,0 +1,42 @@
+import time
+from langchain_core.messages import HumanMessage, SystemMessage
+from llm.response_cache import ResponseCache, create_response_cache_key
+
+
+def describe_response_cache():
+    def test_get_and_put():
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        assert cache.get("a") is None
+        cache.put("a", ["Hello", " world"])
+        assert cache.get("a") == ["Hello", " world"]
+
+    def test_evicts_least_recently_used():
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        cache.put("a", ["a"])
+        cache.put("b", ["b"])
+        cache.get("a")
+        cache.put("c", ["c"])
+        assert cache.get("a") == ["a"]
+        assert cache.get("b") is None
+        assert cache.get("c") == ["c"]
+
+    def test_expires_entries():
+        cache = ResponseCache(max_entries=2, ttl_seconds=0.01)
+        cache.put("a", ["a"])
+        time.sleep(0.02)
+        assert cache.get("a") is None
+
+    def test_disabled():
+        cache = ResponseCache(max_entries=0, ttl_seconds=60)
+        cache.put("a", ["a"])
+        assert cache.get("a") is None
+
+
+def describe_create_response_cache_key():
+    def test_key_depends_on_model_prompt_and_tools():
+        messages = [SystemMessage(content="Context: a"), HumanMessage(content=[{ "type": "text", "text": "Hi" }])]
+        key = create_response_cache_key("aif://model/a", messages, [])
+        assert key == create_response_cache_key("aif://model/a", list(messages), [])
+        assert key != create_response_cache_key("aif://model/b", messages, [])
+        assert key != create_response_cache_key("aif://model/a", [SystemMessage(content="Context: b"), messages[1]], [])
+        assert key != create_response_cache_key("aif://model/a", messages, [{ "name": "get_weather" }])
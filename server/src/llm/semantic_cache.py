@@ -0,0 +1,132 @@
+import os
+import uuid
+import json
+import hashlib
+import threading
+import numpy as np
+from collections import deque
+from typing import Callable, Deque, Dict, List, Tuple
+from pydantic import BaseModel
+from langchain_community.vectorstores.faiss import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+
+DEFAULT_SEMANTIC_CACHE_SIMILARITY_THRESHOLD = 0.95
+DEFAULT_SEMANTIC_CACHE_MAX_ENTRIES = 1000
+
+
+class SemanticCacheLookup(BaseModel):
+    agent_uri: str
+    fingerprint: str
+    embedding_model_uri: str
+    question: str
+    embedding: List[float] | None = None
+
+
+class _SemanticCacheIndex:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.vector_store: FAISS | None = None
+        self.doc_ids: Deque[str] = deque()
+        self.lock = threading.Lock()
+
+
+class SemanticCache:
+    """
+    Per-agent in-memory FAISS index of the previous (question, answer) pairs. The question is embedded with the embedding
+    model chosen by the agent, and the answer of the most similar question is reused when the cosine similarity is at
+    least `SEMANTIC_CACHE_SIMILARITY_THRESHOLD`. Each index keeps the latest `SEMANTIC_CACHE_MAX_ENTRIES` pairs.
+    An index is dropped when the fingerprint of its agent changes, see `create_semantic_cache_fingerprint`.
+
+    The indexes are not embedding assets: they only live in memory, hold the answer in the metadata, and evict the
+    oldest pairs, so they use the langchain FAISS store directly instead of the asset files and chunk manifest of llm.assets.
+    """
+    def __init__(self, get_llm: Callable):
+        self.get_llm = get_llm
+        self._indexes: Dict[str, _SemanticCacheIndex] = {}     # Key: agent uri
+        self._lock = threading.Lock()
+
+    def lookup(self, agent_uri: str, fingerprint: str, embedding_model_uri: str, question: str) -> Tuple[str | None, List[float]]:
+        """
+        Return the cached answer or None, and the embedding of the question for `put`
+        """
+        # Normalized so the inner product is the cosine similarity
+        embedding = _normalize(self.get_llm(embedding_model_uri, is_embedding=True).embed_query(question))
+
+        index = self._get_index(agent_uri, fingerprint)
+        with index.lock:
+            if index.vector_store is None:
+                return None, embedding
+            docs_and_scores = index.vector_store.similarity_search_with_score_by_vector(embedding, k=1)
+
+        if len(docs_and_scores) > 0:
+            doc, score = docs_and_scores[0]
+            if score >= _get_similarity_threshold():
+                return doc.metadata["answer"], embedding
+        return None, embedding
+
+    def put(self, agent_uri: str, fingerprint: str, embedding_model_uri: str, question: str, embedding: List[float], answer: str):
+        index = self._get_index(agent_uri, fingerprint)
+        doc_id = uuid.uuid4().hex
+        with index.lock:
+            if index.vector_store is None:
+                index.vector_store = FAISS.from_embeddings(
+                    text_embeddings=[(question, embedding)],
+                    embedding=self.get_llm(embedding_model_uri, is_embedding=True),
+                    metadatas=[{ "answer": answer }],
+                    ids=[doc_id],
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+                )
+            else:
+                index.vector_store.add_embeddings(text_embeddings=[(question, embedding)], metadatas=[{ "answer": answer }], ids=[doc_id])
+            index.doc_ids.append(doc_id)
+
+            max_entries = _get_max_entries()
+            if len(index.doc_ids) > max_entries:
+                index.vector_store.delete([index.doc_ids.popleft() for _ in range(len(index.doc_ids) - max_entries)])
+
+    def invalidate(self, agent_uri: str):
+        with self._lock:
+            self._indexes.pop(agent_uri, None)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def _get_index(self, agent_uri: str, fingerprint: str) -> _SemanticCacheIndex:
+        with self._lock:
+            index = self._indexes.get(agent_uri)
+            if index is None or index.fingerprint != fingerprint:
+                index = _SemanticCacheIndex(fingerprint)
+                self._indexes[agent_uri] = index
+            return index
+
+
+def create_semantic_cache_fingerprint(system_prompt: str | None, rag_asset_ids: List[str] | str | None, model_uri: str, embedding_model_uri: str, output_format: str) -> str:
+    """
+    The cached answers are only valid for the same system prompt, RAG assets, models and output format
+    """
+    fingerprint_dict = {
+        "system_prompt": system_prompt,
+        "rag_asset_ids": rag_asset_ids,
+        "model_uri": model_uri,
+        "embedding_model_uri": embedding_model_uri,
+        "output_format": output_format,
+    }
+    return hashlib.sha256(json.dumps(fingerprint_dict, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _normalize(embedding: List[float]) -> List[float]:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return (vector / norm).tolist() if norm > 0 else vector.tolist()
+
+
+def _get_similarity_threshold() -> float:
+    threshold = os.environ.get("SEMANTIC_CACHE_SIMILARITY_THRESHOLD")
+    return float(threshold) if threshold else DEFAULT_SEMANTIC_CACHE_SIMILARITY_THRESHOLD
+
+
+def _get_max_entries() -> int:
+    max_entries = os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES")
+    return int(max_entries) if max_entries else DEFAULT_SEMANTIC_CACHE_MAX_ENTRIES
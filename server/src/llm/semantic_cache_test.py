@@ -0,0 +1,65 @@
+from typing import List
+from langchain_core.embeddings import Embeddings
+from llm.semantic_cache import SemanticCache, create_semantic_cache_fingerprint
+
+
+class KeywordEmbeddings(Embeddings):
+    """
+    One dimension per keyword, enough to tell the similar questions apart
+    """
+    KEYWORDS = ["weather", "today", "price", "ticket"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [1.0 if keyword in text.lower() else 0.0 for keyword in self.KEYWORDS]
+
+
+def describe_semantic_cache():
+    def _create_cache() -> SemanticCache:
+        return SemanticCache(lambda uri, is_embedding=False: KeywordEmbeddings())
+
+    def test_serves_the_answer_of_a_similar_question():
+        cache = _create_cache()
+        answer, embedding = cache.lookup("aif://agents/a", "f1", "aif://embedding", "What's the weather today?")
+        assert answer is None
+        cache.put("aif://agents/a", "f1", "aif://embedding", "What's the weather today?", embedding, "Sunny")
+
+        assert cache.lookup("aif://agents/a", "f1", "aif://embedding", "Weather today, please")[0] == "Sunny"
+        assert cache.lookup("aif://agents/a", "f1", "aif://embedding", "Ticket price?")[0] is None
+        assert cache.lookup("aif://agents/b", "f1", "aif://embedding", "Weather today, please")[0] is None
+
+    def test_drops_the_answers_when_the_fingerprint_changes():
+        cache = _create_cache()
+        _, embedding = cache.lookup("aif://agents/a", "f1", "aif://embedding", "weather today")
+        cache.put("aif://agents/a", "f1", "aif://embedding", "weather today", embedding, "Sunny")
+        assert cache.lookup("aif://agents/a", "f2", "aif://embedding", "weather today")[0] is None
+        assert cache.lookup("aif://agents/a", "f1", "aif://embedding", "weather today")[0] is None
+
+    def test_keeps_the_latest_entries(monkeypatch):
+        monkeypatch.setenv("SEMANTIC_CACHE_MAX_ENTRIES", "1")
+        cache = _create_cache()
+        _, weather_embedding = cache.lookup("aif://agents/a", "f1", "aif://embedding", "weather")
+        cache.put("aif://agents/a", "f1", "aif://embedding", "weather", weather_embedding, "Sunny")
+        _, price_embedding = cache.lookup("aif://agents/a", "f1", "aif://embedding", "price")
+        cache.put("aif://agents/a", "f1", "aif://embedding", "price", price_embedding, "$10")
+        assert cache.lookup("aif://agents/a", "f1", "aif://embedding", "weather")[0] is None
+        assert cache.lookup("aif://agents/a", "f1", "aif://embedding", "price")[0] == "$10"
+
+    def test_invalidate():
+        cache = _create_cache()
+        _, embedding = cache.lookup("aif://agents/a", "f1", "aif://embedding", "weather")
+        cache.put("aif://agents/a", "f1", "aif://embedding", "weather", embedding, "Sunny")
+        cache.invalidate("aif://agents/a")
+        assert cache.lookup("aif://agents/a", "f1", "aif://embedding", "weather")[0] is None
+
+
+def describe_create_semantic_cache_fingerprint():
+    def test_fingerprint_depends_on_the_agent_settings():
+        fingerprint = create_semantic_cache_fingerprint("Be brief", ["asset-1"], "aif://model", "aif://embedding", "text")
+        assert fingerprint == create_semantic_cache_fingerprint("Be brief", ["asset-1"], "aif://model", "aif://embedding", "text")
+        assert fingerprint != create_semantic_cache_fingerprint("Be verbose", ["asset-1"], "aif://model", "aif://embedding", "text")
+        assert fingerprint != create_semantic_cache_fingerprint("Be brief", ["asset-2"], "aif://model", "aif://embedding", "text")
+        assert fingerprint != create_semantic_cache_fingerprint("Be brief", ["asset-1"], "aif://model-2", "aif://embedding", "text")
+        assert fingerprint != create_semantic_cache_fingerprint("Be brief", ["asset-1"], "aif://model", "aif://embedding", "markdown")
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.condition = asyncio.Condition()
+        self.task: asyncio.Task | None = None
+
+
+class SingleFlight:
+    """
+    Share one upstream stream between the concurrent requests with the same key. The chunks are fanned out to all the
+    subscribers, a late subscriber replays the chunks received so far. The upstream stream is cancelled when all the
+    subscribers are gone.
+    """
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._upstream_calls = 0
+        self._coalesced_requests = 0
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "upstream_calls": self._upstream_calls,
+            # Each of them is a provider call saved
+            "coalesced_requests": self._coalesced_requests,
+            "in_flight": len(self._flights),
+        }
+
+    async def stream(self, key: str, create_iterable: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(key, flight, create_iterable))
+            self._upstream_calls += 1
+        else:
+            self._coalesced_requests += 1
+
+        flight.subscribers += 1
+        try:
+            index = 0
+            while True:
+                async with flight.condition:
+                    await flight.condition.wait_for(lambda: index < len(flight.chunks) or flight.done)
+                    chunks = flight.chunks[index:]
+                    done = flight.done
+
+                for chunk in chunks:
+                    yield chunk
+                index += len(chunks)
+
+                if done and index == len(flight.chunks):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def _run(self, key: str, flight: _Flight, create_iterable: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for chunk in create_iterable():
+                async with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+        except asyncio.CancelledError as e:
+            flight.error = e
+            # The subscribers are notified in finally, the task still ends as cancelled
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            # The later requests start a new flight
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            async with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
@@ -0,0 +1,83 @@
+import asyncio
+from llm.single_flight import SingleFlight
+
+
+def describe_single_flight():
+    def test_shares_one_upstream_stream():
+        single_flight = SingleFlight()
+        upstream_calls = []
+
+        async def create_iterable():
+            upstream_calls.append(1)
+            for chunk in ["a", "b", "c"]:
+                await asyncio.sleep(0.01)
+                yield chunk
+
+        async def consume(delay: float):
+            await asyncio.sleep(delay)
+            return [chunk async for chunk in single_flight.stream("key", create_iterable)]
+
+        async def run():
+            return await asyncio.gather(consume(0), consume(0), consume(0.015))
+
+        results = asyncio.run(run())
+        # The late subscriber replays the chunks received before it joined
+        assert results == [["a", "b", "c"]] * 3
+        assert len(upstream_calls) == 1
+        assert single_flight.get_metrics() == { "upstream_calls": 1, "coalesced_requests": 2, "in_flight": 0 }
+
+    def test_different_keys_and_later_requests_are_not_shared():
+        single_flight = SingleFlight()
+
+        async def create_iterable():
+            yield "a"
+
+        async def run():
+            await asyncio.gather(*[_collect(single_flight.stream(key, create_iterable)) for key in ["k1", "k2"]])
+            await _collect(single_flight.stream("k1", create_iterable))
+
+        asyncio.run(run())
+        assert single_flight.get_metrics()["upstream_calls"] == 3
+
+    def test_error_is_raised_to_all_subscribers():
+        single_flight = SingleFlight()
+
+        async def create_iterable():
+            yield "a"
+            raise ValueError("upstream failed")
+
+        async def run():
+            return await asyncio.gather(*[_collect(single_flight.stream("key", create_iterable)) for _ in range(2)], return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert all(isinstance(result, ValueError) for result in results)
+
+    def test_cancels_the_upstream_when_all_subscribers_are_gone():
+        single_flight = SingleFlight()
+        cancelled = []
+
+        async def create_iterable():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "a"
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        async def run():
+            iterable = single_flight.stream("key", create_iterable)
+            assert await iterable.__anext__() == "a"
+            task = single_flight._flights["key"].task
+            await iterable.aclose()
+            await asyncio.sleep(0.05)
+            return task
+
+        task = asyncio.run(run())
+        assert cancelled == [1]
+        assert task.cancelled()
+        assert single_flight.get_metrics()["in_flight"] == 0
+
+
+async def _collect(iterable):
+    return [chunk async for chunk in iterable]
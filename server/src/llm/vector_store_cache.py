@@ -0,0 +1,103 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict
+from langchain_core.vectorstores import VectorStore
+
+
+DEFAULT_VECTOR_STORE_CACHE_MAX_MB = 1024
+
+
+class _VectorStoreCacheEntry:
+    def __init__(self, vector_store: VectorStore, size: int):
+        self.vector_store = vector_store
+        self.size = size
+
+
+class VectorStoreCache:
+    """
+    Process-wide LRU cache of loaded vector stores, keyed by embedding asset id.
+    The size of each entry is the size of its index files on disk, the least recently used entries are evicted when the
+    total size exceeds the memory budget (env var `VECTOR_STORE_CACHE_MAX_MB`, 0 disables the cache).
+    """
+    def __init__(self, max_bytes: int | None = None):
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[str, _VectorStoreCacheEntry] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._loading_locks: Dict[str, threading.Lock] = {}
+        # Bumped by invalidate and clear, a store loaded before them is not cached
+        self._generation = 0
+
+    def get_max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        max_mb = os.environ.get("VECTOR_STORE_CACHE_MAX_MB")
+        return int(max_mb if max_mb else DEFAULT_VECTOR_STORE_CACHE_MAX_MB) * 1024 * 1024
+
+    def get_total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, asset_id: str) -> VectorStore | None:
+        with self._lock:
+            entry = self._entries.get(asset_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(asset_id)
+            return entry.vector_store
+
+    def put(self, asset_id: str, vector_store: VectorStore, size: int):
+        max_bytes = self.get_max_bytes()
+        with self._lock:
+            self._remove(asset_id)
+            if size > max_bytes:
+                # Larger than the whole budget, don't evict everything else for it
+                return
+
+            self._entries[asset_id] = _VectorStoreCacheEntry(vector_store, size)
+            self._total_bytes += size
+            while self._total_bytes > max_bytes:
+                oldest_asset_id = next(iter(self._entries))
+                self._remove(oldest_asset_id)
+
+    def get_or_load(self, asset_id: str, size: int, loader: Callable[[], VectorStore]) -> VectorStore:
+        vector_store = self.get(asset_id)
+        if vector_store is not None:
+            return vector_store
+
+        # Only one thread loads a given asset, the others wait and reuse the result
+        with self._lock:
+            loading_lock = self._loading_locks.setdefault(asset_id, threading.Lock())
+
+        with loading_lock:
+            vector_store = self.get(asset_id)
+            if vector_store is None:
+                generation = self._generation
+                vector_store = loader()
+                with self._lock:
+                    is_current = generation == self._generation
+                if is_current:
+                    self.put(asset_id, vector_store, size)
+
+        with self._lock:
+            self._loading_locks.pop(asset_id, None)
+        return vector_store
+
+    def invalidate(self, asset_id: str):
+        with self._lock:
+            self._generation += 1
+            self._remove(asset_id)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _remove(self, asset_id: str):
+        entry = self._entries.pop(asset_id, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+
+
+vectorStoreCache = VectorStoreCache()
@@ -0,0 +1,59 @@
+from llm.vector_store_cache import VectorStoreCache
+
+
+def describe_vector_store_cache():
+    def test_get_returns_cached_vector_store():
+        cache = VectorStoreCache(max_bytes=100)
+        vector_store = object()
+        cache.put("asset-1", vector_store, 10)
+        assert cache.get("asset-1") is vector_store
+        assert cache.get("asset-2") is None
+
+    def test_evicts_least_recently_used():
+        cache = VectorStoreCache(max_bytes=100)
+        cache.put("asset-1", "vs-1", 40)
+        cache.put("asset-2", "vs-2", 40)
+        cache.get("asset-1")
+        cache.put("asset-3", "vs-3", 40)
+        assert cache.get("asset-1") == "vs-1"
+        assert cache.get("asset-2") is None
+        assert cache.get("asset-3") == "vs-3"
+        assert cache.get_total_bytes() == 80
+
+    def test_skips_entries_larger_than_budget():
+        cache = VectorStoreCache(max_bytes=100)
+        cache.put("asset-1", "vs-1", 40)
+        cache.put("asset-2", "vs-2", 200)
+        assert cache.get("asset-1") == "vs-1"
+        assert cache.get("asset-2") is None
+
+    def test_get_or_load_calls_loader_once():
+        cache = VectorStoreCache(max_bytes=100)
+        calls = []
+        def loader():
+            calls.append(1)
+            return "vs-1"
+        assert cache.get_or_load("asset-1", 10, loader) == "vs-1"
+        assert cache.get_or_load("asset-1", 10, loader) == "vs-1"
+        assert len(calls) == 1
+
+    def test_invalidate():
+        cache = VectorStoreCache(max_bytes=100)
+        cache.put("asset-1", "vs-1", 40)
+        cache.invalidate("asset-1")
+        assert cache.get("asset-1") is None
+        assert cache.get_total_bytes() == 0
+
+    def test_max_bytes_from_env(monkeypatch):
+        monkeypatch.setenv("VECTOR_STORE_CACHE_MAX_MB", "2")
+        assert VectorStoreCache().get_max_bytes() == 2 * 1024 * 1024
+
+    def test_does_not_cache_a_store_loaded_before_clear():
+        cache = VectorStoreCache(max_bytes=100)
+
+        def loader():
+            # E.g. the credentials of the provider are updated meanwhile
+            cache.clear()
+            return "vs-1"
+        assert cache.get_or_load("asset-1", 10, loader) == "vs-1"
+        assert cache.get("asset-1") is None
@@ -11,6 +11,10 @@ server_metadata_tags = [
         "name": "agents",
         "description": "Agents API CRUD",
     },
+    {
+        "name": "aliases",
+        "description": "Model aliases API CRUD",
+    },
     {
         "name": "embeddings",
         "description": "Embeddings API CRUD",
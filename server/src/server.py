@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 import argparse
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.requests import Request
 from fastapi.staticfiles import StaticFiles
@@ -18,23 +19,34 @@ parser.add_argument('--hotreload', help='Auto reload for debugging', default=Fal
 parser.add_argument('--localserver', help='Run server without docker', default=False, type=bool, required=False)
 args = parser.parse_args()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await llm_manager.start()
+    yield
+    await llm_manager.stop()
+
+
 app = FastAPI(
     title="AiFoundry Server",
     version="1.0",
     description="A simple api server for LLMs",
     openapi_tags=server_metadata_tags,
+    lifespan=lifespan,
 )
 
 # if args.debug:
 #     app.mount("/static", StaticFiles(directory="static"), name="static")
 
-serverConfig.setup(args)
+# The spawned child processes, e.g. the workers of the function sandbox, import this file again as "__mp_main__"
+if __name__ != "__mp_main__":
+    serverConfig.setup(args)
 
-database_manager = DatabaseManager()
-llm_manager = LlmManager(database_manager)
+    database_manager = DatabaseManager()
+    llm_manager = LlmManager(database_manager)
 
-setup_controllers(app, llm_manager, args.debug, args.authoring)
-setup_error_handlers(app, args.debug)
+    setup_controllers(app, llm_manager, args.debug, args.authoring)
+    setup_error_handlers(app, args.debug)
 
 if __name__ == "__main__":
     import uvicorn
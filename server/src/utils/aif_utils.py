@@ -6,3 +6,11 @@ def create_aif_agent_uri(uuid: str):
 
 def is_aif_agent_uri(uri: str):
     return uri.startswith(aif_agents_prefix)
+
+aif_aliases_prefix = f"{aif_protocol}aliases/"
+
+def create_aif_alias_uri(name: str):
+    return f"{aif_aliases_prefix}{name}"
+
+def is_aif_alias_uri(uri: str):
+    return uri.startswith(aif_aliases_prefix)
@@ -1,6 +1,6 @@
 import os
 from os.path import expanduser
-from consts import AIFOUNDRY_LOCAL_SERVER_FOLDER_NAME, ASSETS_FOLDER_NAME, EMBEDDINGS_FOLDER_NAME, FUNCTIONS_FOLDER_NAME
+from consts import AIFOUNDRY_LOCAL_SERVER_FOLDER_NAME, ASSETS_FOLDER_NAME, BLOBS_FOLDER_NAME, EMBEDDINGS_FOLDER_NAME, FUNCTIONS_FOLDER_NAME
 from server_config import serverConfig
 
 
@@ -15,3 +15,7 @@ def get_functions_asset_path() -> str:
 
 def get_embeddings_asset_path() -> str:
     return os.path.join(get_assets_path(), EMBEDDINGS_FOLDER_NAME)
+
+
+def get_blobs_asset_path() -> str:
+    return os.path.join(get_assets_path(), BLOBS_FOLDER_NAME)
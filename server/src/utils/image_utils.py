@@ -1,8 +1,11 @@
 import base64
 from io import BytesIO
 
-def convert_to_base64(pil_image, format):
+def convert_to_bytes(pil_image, format) -> bytes:
     buffered = BytesIO()
     pil_image.save(buffered, format=format)
-    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    return buffered.getvalue()
+
+def convert_to_base64(pil_image, format):
+    img_str = base64.b64encode(convert_to_bytes(pil_image, format)).decode("utf-8")
     return img_str
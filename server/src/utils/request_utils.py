@@ -3,7 +3,8 @@ from fastapi import UploadFile
 from PIL import Image
 from aif_types.common import RequestFileInfo
 from consts import IMAGE_EXTENSION_INFO
-from utils.image_utils import convert_to_base64
+from utils.image_utils import convert_to_bytes
+from database.blob_store import blobStore
 
 
 async def createRequestFileInfo(file: UploadFile) -> RequestFileInfo | None:
@@ -18,5 +19,6 @@ async def createRequestFileInfo(file: UploadFile) -> RequestFileInfo | None:
     image = Image.open(io.BytesIO(image_data))
     image = image.convert("RGB")
     mime_type = IMAGE_EXTENSION_INFO[fileExt]["mime_type"]
-    content = convert_to_base64(image, IMAGE_EXTENSION_INFO[fileExt]["format"])
-    return RequestFileInfo(file_name=file.filename, mine_type=mime_type, file_buffer=content)
+    content = convert_to_bytes(image, IMAGE_EXTENSION_INFO[fileExt]["format"])
+    blob_id = blobStore.put(content)
+    return RequestFileInfo(file_name=file.filename, mine_type=mime_type, blob_id=blob_id)
@@ -0,0 +1,61 @@
+import os
+from typing import List
+from langchain_core.messages import BaseMessage
+from aif_types.common import RequestFileInfo
+
+
+DEFAULT_PROMPT_TOKEN_BUDGET = 8000
+DEFAULT_RAG_CONTEXT_TOKEN_RESERVE = 1500
+
+# Rough numbers which are good enough to fit the prompt into the budget, no need to run the tokenizer of each model
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+IMAGE_TOKENS = 765      # OpenAI high detail 1024x1024 image
+
+
+def estimate_tokens(text: str | None) -> int:
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(content: str | None, files: List[RequestFileInfo] = []) -> int:
+    return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content) + IMAGE_TOKENS * len(files)
+
+
+def estimate_prompt_tokens(messages: List[BaseMessage]) -> int:
+    """
+    Tokens of the rendered prompt, the content of a message is either text or a list of text and image parts
+    """
+    tokens = 0
+    for message in messages:
+        tokens += MESSAGE_OVERHEAD_TOKENS
+        if isinstance(message.content, str):
+            tokens += estimate_tokens(message.content)
+        else:
+            for part in message.content:
+                if isinstance(part, str):
+                    tokens += estimate_tokens(part)
+                elif part.get("type") == "image_url":
+                    tokens += IMAGE_TOKENS
+                else:
+                    tokens += estimate_tokens(part.get("text"))
+    return tokens
+
+
+def get_prompt_token_budget(agent_token_budget: int | None = None) -> int:
+    if agent_token_budget:
+        return agent_token_budget
+    return _get_env_int("PROMPT_TOKEN_BUDGET", DEFAULT_PROMPT_TOKEN_BUDGET)
+
+
+def get_rag_context_token_reserve() -> int:
+    """
+    The retrieved documents are only known when the chain runs, reserve the space for each retriever
+    """
+    return _get_env_int("RAG_CONTEXT_TOKEN_RESERVE", DEFAULT_RAG_CONTEXT_TOKEN_RESERVE)
+
+
+def _get_env_int(envVarName: str, default: int) -> int:
+    value = os.environ.get(envVarName)
+    return int(value) if value else default
@@ -0,0 +1,33 @@
+from langchain_core.messages import HumanMessage, SystemMessage
+from aif_types.common import RequestFileInfo
+from utils.token_utils import IMAGE_TOKENS, MESSAGE_OVERHEAD_TOKENS, estimate_message_tokens, estimate_prompt_tokens, estimate_tokens, get_prompt_token_budget, get_rag_context_token_reserve
+
+
+def describe_estimate_tokens():
+    def test_rounds_up():
+        assert estimate_tokens(None) == 0
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("abc") == 1
+        assert estimate_tokens("abcde") == 2
+
+    def test_message_with_files():
+        files = [RequestFileInfo(file_name="a.png", mine_type="image/png")]
+        assert estimate_message_tokens("abcd", files) == MESSAGE_OVERHEAD_TOKENS + 1 + IMAGE_TOKENS
+
+    def test_prompt_with_text_and_image_parts():
+        messages = [
+            SystemMessage(content="abcdefgh"),
+            HumanMessage(content=[{ "type": "text", "text": "abcd" }, { "type": "image_url", "image_url": { "url": "data:" } }]),
+        ]
+        assert estimate_prompt_tokens(messages) == 2 * MESSAGE_OVERHEAD_TOKENS + 2 + 1 + IMAGE_TOKENS
+
+
+def describe_budgets():
+    def test_agent_budget_overrides_env(monkeypatch):
+        monkeypatch.setenv("PROMPT_TOKEN_BUDGET", "100")
+        assert get_prompt_token_budget() == 100
+        assert get_prompt_token_budget(50) == 50
+
+    def test_rag_context_token_reserve(monkeypatch):
+        monkeypatch.setenv("RAG_CONTEXT_TOKEN_RESERVE", "10")
+        assert get_rag_context_token_reserve() == 10